@@ -0,0 +1,419 @@
+import random
+import time
+from collections.abc import Iterable
+from functools import partial
+from itertools import count
+from typing import Any, Literal
+
+from pygame import Color
+
+from roboarena.server.bullets import BulletSystem
+from roboarena.server.entity import (
+    ActiveRemoteValue,
+    CalculatedValue,
+    ServerDoorEntity,
+    ServerEnemyRobot,
+    ServerPlayerRobot,
+)
+from roboarena.shared.block import block_id, floor
+from roboarena.shared.chunk import Chunk, ChunkedLevel
+from roboarena.shared.constants import NetworkConstants
+from roboarena.shared.entity import Bullet, Entity
+from roboarena.shared.game import GameState, OutOfLevelError
+from roboarena.shared.types import (
+    Marker,
+    PygameColor,
+    StartFrameEvent,
+    Time,
+)
+from roboarena.shared.util import EventTarget, change_exception, exceqt
+from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.table_printer import print_table
+from roboarena.shared.utils.vector import Vector
+
+SIZE = 100
+"""Edge length of the level the entities are spread over"""
+CHUNK = 25
+DOORS = 50
+PLAYERS = 10
+BULLETS = [10, 100, 1000]
+FRAMES = 3
+DT = NetworkConstants.SERVER_TIMESTEP / NetworkConstants.SERVER_FRAMES_PER_TIMESTEP
+QUERIES = 10_000
+
+
+class BenchGame(GameState):
+    """Just enough of the server game to tick bullets"""
+
+    linear: bool = False
+    """Whether to scan all entities as before the spatial grid"""
+    per_block: bool = False
+    """Whether to look up each block as before the occupancy bitmaps"""
+
+    def __init__(self) -> None:
+        self.env = "server"
+        self.entities = {}
+        self.events = EventTarget()
+        self.level = ChunkedLevel(CHUNK)
+        for x in range(-1, SIZE // CHUNK + 1):
+            for y in range(-1, SIZE // CHUNK + 1):
+                blocks = bytes([block_id(floor)] * CHUNK**2)
+                self.level.stamp(Chunk(Vector(x, y), CHUNK, blocks))
+
+    def collidingEntities(self, collider: Rect | Entity) -> Iterable[Entity]:
+        if not self.linear:
+            return super().collidingEntities(collider)
+        rect = collider.collision.hitbox if isinstance(collider, Entity) else collider
+        return (
+            _
+            for _ in self.entities.values()
+            if _.collision.hitbox.overlaps(rect) and _ is not collider
+        )
+
+    def blocking(
+        self, collider: Rect | Entity, mode: Literal["robot"] | Literal["bullet"]
+    ) -> bool:
+        if not self.per_block:
+            return super().blocking(collider, mode)
+        return any(
+            (mode == "robot" and e.blocks_robot)
+            or (mode == "bullet" and e.blocks_bullet)
+            for e in self.collidingEntities(collider)
+        ) or any(
+            (mode == "robot" and b.blocks_robot)
+            or (mode == "bullet" and b.blocks_bullet)
+            for b in self.colliding_blocks(collider).values()
+        )
+
+    def sweep_blocking(
+        self,
+        collider: Rect | Entity,
+        motion: Vector[float],
+        mode: Literal["robot"] | Literal["bullet"],
+    ) -> float | None:
+        """Fraction of the motion at which an entity/a rect moving along it
+        is first blocked, None if it is not, see `blocking`."""
+        rect = collider.collision.hitbox if isinstance(collider, Entity) else collider
+        hits = [
+            t
+            for t, e in self.sweeping_entities(collider, motion)
+            if (mode == "robot" and e.blocks_robot)
+            or (mode == "bullet" and e.blocks_bullet)
+        ]
+        with change_exception(KeyError, OutOfLevelError):
+            if (t := self.level.sweep(rect, motion, mode)) is not None:
+                hits.append(t)
+        return min(hits, default=None)
+
+    def sweeping_entities(
+        self, collider: Rect | Entity, motion: Vector[float]
+    ) -> Iterable[tuple[float, Entity]]:
+        """Entities an entity/a rect moving along the motion collides with and
+        the fraction of the motion at which it first does."""
+        rect = collider.collision.hitbox if isinstance(collider, Entity) else collider
+        moved = rect.tramslate(motion)
+        top_left = Vector(min(rect.left, moved.left), min(rect.top, moved.top))
+        bottom_right = Vector(
+            max(rect.right, moved.right), max(rect.bottom, moved.bottom)
+        )
+        for entity in self.entity_grid.query(Rect(top_left, bottom_right - top_left)):
+            if entity is collider:
+                continue
+            t = rect.sweep(motion, entity.collision.hitbox)
+            if t is not None:
+                yield t, entity
+
+    def dispatch(self, *args: Any) -> None:
+        pass
+
+    def mark(self, *args: Any) -> None:
+        pass
+
+    def delete_entity(self, *args: Any) -> None:
+        pass
+
+    def create_entity(self, *args: Any) -> None:
+        pass
+
+
+class SweptBullet(Bullet):
+    """The bullet as an entity, before `BulletSystem`"""
+
+    ServerPlayerBulletPositionCtx = tuple[Time]
+    _game: BenchGame
+    _position: CalculatedValue[Vector[float], ServerPlayerBulletPositionCtx]
+    _velocity: ActiveRemoteValue[Vector[float]]
+    _strength: int
+    _hit_last_tick: set[Entity]
+
+    def __init__(
+        self,
+        game: BenchGame,
+        friendly: bool,
+        position: Vector[float],
+        velocity: Vector[float],
+        strength: int,
+    ) -> None:
+        super().__init__(game, friendly)
+        self._game = game  # type: ignore
+        self._position = CalculatedValue(  # type: ignore
+            position,
+            lambda pos, ctx: self.move(pos, ctx[0], None),
+            partial(self._game.dispatch, self, "position"),
+        )
+        self._velocity = ActiveRemoteValue(  # type: ignore
+            velocity,
+            partial(self._game.dispatch, self, "velocity"),
+        )
+        self._strength = strength
+        self._hit_last_tick = set()
+
+    def tick(self, dt: Time, t: Time):
+        """Move along the velocity up to the first block or entity blocking it,
+        hitting the targets on the way. Swept, so dt may be a whole update."""
+        position = self.position
+        motion = self._velocity.get() * dt
+        blocked: float | None = None
+        with exceqt(OutOfLevelError, lambda: self._game.delete_entity(self)):
+            blocked = self._game.sweep_blocking(self, motion, "bullet")
+
+        target_type = ServerEnemyRobot if self.friendly else ServerPlayerRobot
+        hit_this_tick = set[Entity]()
+        for at, entity in self._game.sweeping_entities(self, motion):
+            if blocked is not None and at > blocked:
+                continue
+            self._game.mark(Marker(position + motion * at, PygameColor.green()))
+            if not isinstance(entity, target_type):
+                continue
+            hit_this_tick.add(entity)
+            if entity not in self._hit_last_tick:
+                entity.health.hit(self._strength)
+        self._hit_last_tick = hit_this_tick
+
+        self._position.tick((dt if blocked is None else dt * blocked,))
+        if blocked is not None:
+            self._game.mark(Marker(self.position, PygameColor.light_grey()))
+            self._game.delete_entity(self)
+
+
+class PointBullet(SweptBullet):
+    """The bullet before the swept collisions, checked at its new position"""
+
+    def tick(self, dt: Time, t: Time):
+        self._position.tick((dt,))
+        if self._game.blocking(self, "bullet"):
+            return self._game.delete_entity(self)
+        target_type = ServerEnemyRobot if self.friendly else ServerPlayerRobot
+        hit_this_tick = set[Entity]()
+        for entity in self._game.collidingEntities(self):
+            if not isinstance(entity, target_type):
+                continue
+            hit_this_tick.add(entity)
+            if entity not in self._hit_last_tick:
+                entity.health.hit(self._strength)
+        self._hit_last_tick = hit_this_tick
+
+
+def random_position() -> Vector[float]:
+    return Vector(random.uniform(0, SIZE), random.uniform(0, SIZE))
+
+
+def random_bullet() -> tuple[Vector[float], Vector[float]]:
+    velocity = Vector(random.uniform(-1, 1), random.uniform(-1, 1)) * 6
+    # far enough from the edges to stay in the level while ticking
+    position = random_position() * 0.9 + SIZE * 0.05
+    return position, velocity
+
+
+def populate(
+    game: BenchGame, bullets: int, bullet: type[SweptBullet] | None = PointBullet
+) -> None:
+    """Doors, players and the bullets as entities unless bullet is None"""
+    game.entities = {}
+    for i in range(DOORS):
+        game.entities[i] = ServerDoorEntity(game, random_position(), True)
+    for i in range(DOORS, DOORS + PLAYERS):
+        motion = (random_position(), Vector(1.0, 0.0))
+        player = ServerPlayerRobot(game, 10**9, motion, Color(0, 0, 0), print)  # type: ignore
+        game.entities[i] = player  # type: ignore
+    if bullet is None:
+        return
+    for i in range(DOORS + PLAYERS, DOORS + PLAYERS + bullets):
+        position, velocity = random_bullet()
+        friendly = i % 2 == 0
+        game.entities[i] = bullet(game, friendly, position, velocity, 1)  # type: ignore
+
+
+def tick_seconds(game: BenchGame) -> float:
+    """Seconds per frame ticking all entities, as `Server._loop` does"""
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        game.events.dispatch(StartFrameEvent())
+        game.index_entities()
+        for entity in game.entities.values():
+            entity.tick(DT, 0)
+            game.index_entity(entity)
+    return (time.perf_counter() - start) / FRAMES
+
+
+def update_seconds(game: BenchGame, frames: int) -> float:
+    """Seconds per server update split into frames, bullets as `PointBullet`
+    needed 3 frames not to skip over thin blocks"""
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        for _ in range(frames):
+            game.events.dispatch(StartFrameEvent())
+            game.index_entities()
+            for entity in game.entities.values():
+                entity.tick(NetworkConstants.SERVER_TIMESTEP / frames, 0)
+                game.index_entity(entity)
+    return (time.perf_counter() - start) / FRAMES
+
+
+def compare_swept() -> None:
+    rows: list[list[Any]] = [
+        ["bullets", "3 point ms", "swept ms", "speedup"],
+        ["__sep"],
+    ]
+    game = BenchGame()
+    for bullets in BULLETS:
+        random.seed(bullets)
+        populate(game, bullets, PointBullet)
+        points = update_seconds(game, 3)
+        random.seed(bullets)
+        populate(game, bullets, SweptBullet)
+        swept = update_seconds(game, 1)
+        rows.append(
+            [
+                bullets,
+                f"{points * 1000:.2f}",
+                f"{swept * 1000:.2f}",
+                f"{points / swept:.1f}",
+            ]
+        )
+    print_table(rows)
+
+
+def compare_bullet_system() -> None:
+    """Bullets as entities against `BulletSystem`, each one step per update"""
+    rows: list[list[Any]] = [
+        ["bullets", "entities ms", "system ms", "speedup"],
+        ["__sep"],
+    ]
+    game = BenchGame()
+    for bullets in BULLETS:
+        random.seed(bullets)
+        populate(game, bullets, SweptBullet)
+        entities = update_seconds(game, 1)
+        random.seed(bullets)
+        populate(game, bullets, None)
+        system = BulletSystem(game, count(DOORS + PLAYERS))  # type: ignore
+        for i in range(bullets):
+            position, velocity = random_bullet()
+            system.create(i % 2 == 0, position, velocity, 1)
+        system.tick(0)
+        start = time.perf_counter()
+        for _ in range(FRAMES):
+            game.events.dispatch(StartFrameEvent())
+            game.index_entities()
+            system.tick(NetworkConstants.SERVER_TIMESTEP)
+        system_seconds = (time.perf_counter() - start) / FRAMES
+        rows.append(
+            [
+                bullets,
+                f"{entities * 1000:.2f}",
+                f"{system_seconds * 1000:.2f}",
+                f"{entities / system_seconds:.1f}",
+            ]
+        )
+    print_table(rows)
+
+
+def compare_tick_time() -> None:
+    rows: list[list[Any]] = [
+        ["bullets", "linear ms", "grid ms", "speedup"],
+        ["__sep"],
+    ]
+    game = BenchGame()
+    for bullets in BULLETS:
+        random.seed(bullets)
+        game.linear = True
+        populate(game, bullets)
+        linear = tick_seconds(game)
+        random.seed(bullets)
+        game.linear = False
+        populate(game, bullets)
+        grid = tick_seconds(game)
+        rows.append(
+            [
+                bullets,
+                f"{linear * 1000:.2f}",
+                f"{grid * 1000:.2f}",
+                f"{linear / grid:.1f}",
+            ]
+        )
+    print_table(rows)
+
+
+def compare_blocking() -> None:
+    rows: list[list[Any]] = [
+        ["bullets", "per block ms", "bitmap ms", "speedup"],
+        ["__sep"],
+    ]
+    game = BenchGame()
+    for bullets in BULLETS:
+        random.seed(bullets)
+        game.per_block = True
+        populate(game, bullets)
+        per_block = tick_seconds(game)
+        random.seed(bullets)
+        game.per_block = False
+        populate(game, bullets)
+        bitmap = tick_seconds(game)
+        rows.append(
+            [
+                bullets,
+                f"{per_block * 1000:.2f}",
+                f"{bitmap * 1000:.2f}",
+                f"{per_block / bitmap:.1f}",
+            ]
+        )
+    print_table(rows)
+
+
+def compare_block_queries() -> None:
+    """Only the blocks part of `GameState.blocking`, for new rects as moves do"""
+    rows: list[list[Any]] = [
+        ["rect size", "per block us", "bitmap us", "speedup"],
+        ["__sep"],
+    ]
+    game = BenchGame()
+    for size in [0.2, 0.9, 2.5]:
+        rects = [
+            Rect(random_position() * 0.9, Vector(size, size)) for _ in range(QUERIES)
+        ]
+        start = time.perf_counter()
+        for rect in rects:
+            any(b.blocks_robot for b in game.colliding_blocks(rect).values())
+        per_block = (time.perf_counter() - start) / QUERIES
+        start = time.perf_counter()
+        for rect in rects:
+            game.level.blocked(rect, "robot")
+        bitmap = (time.perf_counter() - start) / QUERIES
+        rows.append(
+            [
+                size,
+                f"{per_block * 1e6:.1f}",
+                f"{bitmap * 1e6:.1f}",
+                f"{per_block / bitmap:.1f}",
+            ]
+        )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    compare_bullet_system()
+    compare_swept()
+    compare_block_queries()
+    compare_blocking()
+    compare_tick_time()
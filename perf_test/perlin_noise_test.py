@@ -6,7 +6,10 @@ from typing import Tuple
 import numpy as np
 from numpy.typing import NDArray
 
+from roboarena.shared.constants import PerlinNoiseConstants
 from roboarena.shared.utils.perf_tester import PerformanceTester
+from roboarena.shared.utils.perlin_nose import perlin_noise_spot, perlin_noise_tiles
+from roboarena.shared.utils.vector import Vector
 
 TupleVector = Tuple[float, float]
 TupleVectorInt = Tuple[int, int]
@@ -167,6 +170,50 @@ def perlin_noise_mp_inv(
     return colors
 
 
+TILE_SIZE = 25
+
+
+def tile_noise_scalar(top_lefts: list[Vector[int]]) -> list[float]:
+    """The noise of whole tiles one `perlin_noise_spot` call per block, as
+    `LevelGenerator` evaluated it before"""
+    return [
+        perlin_noise_spot(
+            top_left + Vector(x, y),
+            PerlinNoiseConstants.gridsize,
+            PerlinNoiseConstants.num_octaves,
+        )
+        for top_left in top_lefts
+        for y in range(TILE_SIZE)
+        for x in range(TILE_SIZE)
+    ]
+
+
+def tile_noise_batch(top_lefts: list[Vector[int]]) -> NDArray[np.double]:
+    return perlin_noise_tiles(
+        top_lefts,
+        TILE_SIZE,
+        PerlinNoiseConstants.gridsize,
+        PerlinNoiseConstants.num_octaves,
+    )
+
+
+def compare_tile_noise() -> None:
+    """The noise of 1 and 16 tiles, as generated per `generate_around` call"""
+    for tiles in [1, 16]:
+        print(f"\n{tiles} tiles of {TILE_SIZE}x{TILE_SIZE} blocks")
+
+        def gen_tiles(tiles: int = tiles) -> list[Vector[int]]:
+            return [
+                PerlinNoiseConstants.offset + Vector(*gen_data()) * TILE_SIZE
+                for _ in range(tiles)
+            ]
+
+        perf_tester = PerformanceTester(50, gen_tiles)
+        perf_tester.add_function("scalar", tile_noise_scalar, id)
+        perf_tester.add_function("numpy", tile_noise_batch, id)
+        perf_tester.compare_performance()
+
+
 def gen_data() -> tuple[int, int]:
     k = 100
     return random.randint(-k, k), random.randint(-k, k)
@@ -177,6 +224,7 @@ def id[T](x: T) -> T:
 
 
 if __name__ == "__main__":
+    compare_tile_noise()
     print("")
     s = 1000
     fr = 10
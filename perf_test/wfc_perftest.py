@@ -0,0 +1,303 @@
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import product
+from typing import Any
+
+from roboarena.server.level_generation.tileset import tileset
+from roboarena.server.level_generation.wfc import (
+    WFC,
+    Direction,
+    MinEntropyStore,
+    Tileset,
+    WFCFactory,
+)
+from roboarena.server.level_generation.wfc_numpy import NumpyWFC
+from roboarena.server.level_generation.wfc_sharded import ShardedWFC
+from roboarena.shared.types import PossibleTiles, TilePosition
+from roboarena.shared.util import nonzero
+from roboarena.shared.utils.table_printer import print_table
+from roboarena.shared.utils.vector import Vector
+
+STORE_SIZES = [10_000, 100_000]
+POPS = 1_000
+WALK_STEPS = 40
+"""Windows collapsed one after another, like a player walking"""
+WINDOW = 3
+"""Apothem of a window in tiles"""
+WALKS = 5
+TILESET_SIZES = [8, 16, 32, 64]
+LOOKUPS = 100_000
+PLAYERS = 8
+"""Players far apart, each collapsing its window in the same call"""
+PLAYER_STEPS = 5
+WORKERS = [1, 2, 4, 8]
+APOTHEMS = [16, 8, 4, 2]
+BUDGETS = [0, 64]
+RULE_DENSITY = 0.3
+"""Probability of two tiles being allowed next to each other"""
+
+
+class SortedMinEntropyStore:
+    """The previous store, sorting the buckets and copying one on each pop"""
+
+    def __init__(self) -> None:
+        self._entropies: dict[int, set[TilePosition]] = defaultdict(set)
+
+    def add(self, position: TilePosition, entropy: int) -> None:
+        self._entropies[entropy].add(position)
+
+    def update(self, position: TilePosition, old_entropy: int, new_entropy: int):
+        self._entropies[old_entropy].remove(position)
+        self._entropies[new_entropy].add(position)
+
+    def pop_min(self) -> TilePosition:
+        for _, ps in sorted(self._entropies.items(), key=lambda _: _[0]):
+            if len(ps) == 0:
+                continue
+            selected = random.choice(tuple(ps))
+            ps.remove(selected)
+            return selected
+        raise Exception("Cannot pop from Empty store.")
+
+
+def pops_per_second(store: Any, size: int, constrained: int) -> float:
+    """Pops from a store filled with unconstrained positions, of which the
+    propagation constrained some, i.e. the frontier of the collapsed area"""
+    max_entropy = tileset.to_wfc().tiles - 1
+    for i in range(size):
+        store.add(Vector(i, 0), max_entropy)
+    for i in range(constrained):
+        store.update(Vector(i, 0), max_entropy, max_entropy - 1)
+    start = time.perf_counter()
+    for _ in range(POPS):
+        store.pop_min()
+    return POPS / (time.perf_counter() - start)
+
+
+def compare_pop_min() -> None:
+    rows: list[list[Any]] = [
+        ["positions", "constrained", "sorted pops/s", "bucketed pops/s", "speedup"],
+        ["__sep"],
+    ]
+    for size in STORE_SIZES:
+        for constrained in [POPS, size // 10]:
+            sorted_rate = pops_per_second(SortedMinEntropyStore(), size, constrained)
+            bucketed_rate = pops_per_second(MinEntropyStore(), size, constrained)
+            rows.append(
+                [
+                    size,
+                    constrained,
+                    f"{sorted_rate:.0f}",
+                    f"{bucketed_rate:.0f}",
+                    f"{bucketed_rate / sorted_rate:.2f}",
+                ]
+            )
+    print_table(rows)
+
+
+def walk(
+    sorted_store: bool, ts: Tileset | None = None, engine: WFCFactory = WFC.from_map
+) -> list[tuple[int, int, float]]:
+    """Map size, tiles collapsed and seconds of each step"""
+    wfc: Any = engine(ts or tileset.to_wfc(), {Vector(0, 0): 1}, 0)
+    if sorted_store:
+        wfc._entropy_store = SortedMinEntropyStore()  # type: ignore
+        wfc._entropy_store.add(Vector(0, 0), 1)
+    steps = list[tuple[int, int, float]]()
+    for step in range(WALK_STEPS):
+        window = [
+            Vector(step + x, y)
+            for x in range(-WINDOW, WINDOW + 1)
+            for y in range(-WINDOW, WINDOW + 1)
+        ]
+        start = time.perf_counter()
+        collapsed = len(list(wfc.collapse(window)))
+        map_size = len(wfc.map) if isinstance(wfc, WFC) else wfc._allocated.sum()
+        steps.append((map_size, collapsed, time.perf_counter() - start))
+    return steps
+
+
+def compare_collapse_throughput() -> None:
+    rows: list[list[Any]] = [
+        ["map size", "sorted tiles/s", "bucketed tiles/s", "speedup"],
+        ["__sep"],
+    ]
+    sorted_walks = [walk(True) for _ in range(WALKS)]
+    bucketed_walks = [walk(False) for _ in range(WALKS)]
+    quarter = WALK_STEPS // 4
+    for i in range(0, WALK_STEPS, quarter):
+        map_size = bucketed_walks[0][i + quarter - 1][0]
+        rates = [
+            sum(n for steps in walks for _, n, _ in steps[i : i + quarter])
+            / sum(t for steps in walks for _, _, t in steps[i : i + quarter])
+            for walks in (sorted_walks, bucketed_walks)
+        ]
+        rows.append(
+            [
+                map_size,
+                f"{rates[0]:.0f}",
+                f"{rates[1]:.0f}",
+                f"{rates[1] / rates[0]:.2f}",
+            ]
+        )
+    print_table(rows)
+
+
+def random_tileset(tiles: int) -> Tileset:
+    """Tileset with random rules, tile 0 is the fallback"""
+    pairs = [(a, b) for a in range(1, tiles) for b in range(1, tiles)]
+    return Tileset(
+        tiles,
+        frozenset(p for p in pairs if random.random() < RULE_DENSITY),
+        frozenset(p for p in pairs if random.random() < RULE_DENSITY),
+    )
+
+
+def compare_engines() -> None:
+    rows: list[list[Any]] = [
+        ["tiles", "dict tiles/s", "numpy tiles/s", "speedup"],
+        ["__sep"],
+    ]
+    tilesets = [("game", tileset.to_wfc())]
+    tilesets += [(str(n), random_tileset(n)) for n in TILESET_SIZES]
+    for name, ts in tilesets:
+        rates = list[float]()
+        for engine in [WFC.from_map, NumpyWFC.from_map]:
+            steps = walk(False, ts, engine)
+            rates.append(sum(n for _, n, _ in steps) / sum(t for _, _, t in steps))
+        rows.append(
+            [name, f"{rates[0]:.0f}", f"{rates[1]:.0f}", f"{rates[1] / rates[0]:.2f}"]
+        )
+    print_table(rows)
+
+
+def propagation_by_poss(
+    tiles: PossibleTiles, dir: Direction, by_tile: dict[Direction, list[int]]
+) -> PossibleTiles:
+    """The previous uncached lookup, a union over the possible tiles"""
+    prop = 0
+    for tile in nonzero(tiles):
+        prop |= by_tile[dir][tile]
+    return prop
+
+
+def compare_propagation_lookup() -> None:
+    rows: list[list[Any]] = [
+        ["tiles", "union lookups/s", "table lookups/s", "speedup", "table KiB"],
+        ["__sep"],
+    ]
+    tilesets = [("game", tileset.to_wfc())]
+    tilesets += [(str(n), random_tileset(n)) for n in TILESET_SIZES]
+    for name, ts in tilesets:
+        compiled = ts.compile()
+        by_tile = {
+            dir: [compiled.possible(1 << t, dir) for t in range(ts.tiles)]
+            for dir in Direction
+        }
+        masks = [random.getrandbits(ts.tiles) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for mask in masks:
+            propagation_by_poss(mask, Direction.RIGHT, by_tile)
+        union = LOOKUPS / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for mask in masks:
+            compiled.possible(mask, Direction.RIGHT)
+        table = LOOKUPS / (time.perf_counter() - start)
+        rows.append(
+            [
+                name,
+                f"{union:.0f}",
+                f"{table:.0f}",
+                f"{table / union:.2f}",
+                f"{compiled.nbytes() / 1024:.0f}",
+            ]
+        )
+    print_table(rows)
+
+
+def walk_players(executor: Executor | None) -> float:
+    """Seconds to collapse the windows of all players in each step"""
+    wfc = ShardedWFC(tileset.to_wfc(), executor=executor)
+    start = time.perf_counter()
+    for step in range(PLAYER_STEPS):
+        wfc.collapse(
+            Vector(player * 100 + step + x, y)
+            for player in range(PLAYERS)
+            for x in range(-WINDOW, WINDOW + 1)
+            for y in range(-WINDOW, WINDOW + 1)
+        )
+    return time.perf_counter() - start
+
+
+def compare_sharded() -> None:
+    print(f"{multiprocessing.cpu_count()} cpus, {PLAYERS} players")
+    rows: list[list[Any]] = [["workers", "seconds", "speedup"], ["__sep"]]
+    serial = walk_players(None)
+    rows.append(["serial", f"{serial:.2f}", "1.00"])
+    for workers in WORKERS:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, context) as executor:
+            # start the workers before measuring
+            list(executor.map(abs, range(workers)))
+            seconds = walk_players(executor)
+        rows.append([workers, f"{seconds:.2f}", f"{serial / seconds:.2f}"])
+    print_table(rows)
+
+
+def compare_backtracking() -> None:
+    rows: list[list[Any]] = [
+        [
+            "tiles",
+            "apothem",
+            "budget",
+            "map",
+            "seconds",
+            "contradictions",
+            "backtracks",
+            "max depth",
+            "requested fallbacks",
+        ],
+        ["__sep"],
+    ]
+    random.seed(0)
+    tilesets = [("game", tileset.to_wfc()), ("16", random_tileset(16))]
+    for (name, ts), apothem, budget in product(tilesets, APOTHEMS, BUDGETS):
+        wfc = WFC.from_map(ts, {Vector(0, 0): 1}, 0, budget, apothem)
+        fallbacks = 0
+        start = time.perf_counter()
+        for step in range(WALK_STEPS):
+            window = [
+                Vector(step + x, y)
+                for x in range(-WINDOW, WINDOW + 1)
+                for y in range(-WINDOW, WINDOW + 1)
+            ]
+            wfc.collapse(window)
+            fallbacks += sum(wfc.tile(pos) == 0 for pos in window if pos.x == step)
+        seconds = time.perf_counter() - start
+        stats = wfc.stats
+        rows.append(
+            [
+                name,
+                apothem,
+                budget,
+                len(wfc.map),
+                f"{seconds:.2f}",
+                f"{stats.contradiction_rate:.2%}",
+                stats.backtracks,
+                stats.max_depth,
+                fallbacks,
+            ]
+        )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    compare_backtracking()
+    compare_sharded()
+    compare_propagation_lookup()
+    compare_pop_min()
+    compare_collapse_throughput()
+    compare_engines()
@@ -0,0 +1,158 @@
+import pickle
+import random
+from functools import cache
+from typing import Any
+
+from pygame import Color
+
+from roboarena.server.level_generation.level_generator import LevelGenerator
+from roboarena.server.level_generation.tileset import tileset
+from roboarena.server.replication import Replication
+from roboarena.shared import wire
+from roboarena.shared.block import all_blocks
+from roboarena.shared.chunk import Chunk
+from roboarena.shared.types import (
+    ClientGameEvent,
+    ClientInputEvent,
+    EventType,
+    Input,
+    ServerEntityEvent,
+    ServerGameEvent,
+    ServerLevelChunkEvent,
+    ServerLevelUpdateEvent,
+    basic_weapon,
+)
+from roboarena.shared.util import square_space_around
+from roboarena.shared.utils.perf_tester import PerformanceTester
+from roboarena.shared.utils.table_printer import print_table
+from roboarena.shared.utils.vector import Vector
+
+ROBOTS = 10
+BULLETS = 50
+TILE_BLOCKS = 25 * 25
+
+
+def random_vector() -> Vector[float]:
+    return Vector(random.uniform(-500, 500), random.uniform(-500, 500))
+
+
+def gen_tick() -> list[EventType]:
+    """Events one client receives and sends during a busy server tick"""
+    ack = random.randint(0, 100_000)
+    events: list[Any] = []
+    for entity in range(ROBOTS):
+        events.append(ServerEntityEvent(entity, "motion", (random_vector(),) * 2))
+        events.append(ServerEntityEvent(entity, "health", random.randint(0, 100)))
+    for entity in range(ROBOTS, ROBOTS + BULLETS):
+        events.append(ServerEntityEvent(entity, "position", random_vector()))
+    events.append(ServerEntityEvent(0, "color", Color(0, 255, 0)))
+    events.append(ServerEntityEvent(0, "weapon", basic_weapon))
+    msgs: list[EventType] = [ServerGameEvent(ack, e) for e in events]
+    mouse = random_vector()
+    msgs.append(
+        ClientGameEvent(
+            1, ack, ClientInputEvent(Input(0.016, *[True] * 6, mouse), 0.016), ack
+        )
+    )
+    return msgs
+
+
+def gen_level_update() -> list[EventType]:
+    x0, y0 = random.randint(-100, 100) * 25, random.randint(-100, 100) * 25
+    update = [
+        (Vector(x0 + x, y0 + y), random.choice(all_blocks))
+        for x in range(25)
+        for y in range(25)
+    ]
+    return [ServerGameEvent(0, ServerLevelUpdateEvent(update))]
+
+
+@cache
+def generated_level() -> list[Chunk]:
+    level_gen = LevelGenerator(tileset)
+    return level_gen.generate(square_space_around(Vector(0, 0), 100))
+
+
+def gen_level_chunk() -> list[EventType]:
+    """The same blocks as `gen_level_update`, but generated and as chunk"""
+    chunk = random.choice(generated_level())
+    return [ServerGameEvent(0, ServerLevelChunkEvent(chunk.position, chunk.blocks))]
+
+
+def moved(events: list[Any]) -> list[Any]:
+    """Events of the next tick, robots and bullets moved a bit, rest unchanged"""
+    step = Vector(0.25, -0.5)
+    next_events = list[Any]()
+    for event in events:
+        match event:
+            case ServerEntityEvent(entity, "motion", (position, velocity)):
+                motion = (position + step, velocity)
+                next_events.append(ServerEntityEvent(entity, "motion", motion))
+            case ServerEntityEvent(entity, "position", position):
+                next_events.append(
+                    ServerEntityEvent(entity, "position", position + step)
+                )
+            case _:
+                next_events.append(event)
+    return next_events
+
+
+def encode_all(encode: Any, msgs: list[EventType]) -> list[bytes]:
+    return [encode(msg) for msg in msgs]
+
+
+def decode_all(decode: Any, frames: list[bytes]) -> list[EventType]:
+    return [decode(frame) for frame in frames]
+
+
+def compare_sizes() -> None:
+    rows: list[list[Any]] = [["", "pickle", "wire", "ratio"], ["__sep"]]
+    for name, msgs in [
+        ("tick", gen_tick()),
+        ("level update", gen_level_update()),
+        ("level chunk", gen_level_chunk()),
+    ]:
+        pickled = sum(len(pickle.dumps(msg)) for msg in msgs)
+        encoded = sum(len(wire.encode(msg)) for msg in msgs)
+        rows.append([f"bytes per {name}", pickled, encoded, f"{pickled / encoded:.2f}"])
+    events = [msg.event for msg in gen_tick() if isinstance(msg, ServerGameEvent)]
+    replication = Replication(0)
+    snapshots = [("snapshot", replication.snapshot(0, events))]
+    replication.on_ack(0)
+    snapshots.append(("delta snapshot", replication.snapshot(0, moved(events))))
+    for name, snapshot in snapshots:
+        pickled, encoded = len(pickle.dumps(snapshot)), len(wire.encode(snapshot))
+        rows.append([f"bytes per {name}", pickled, encoded, f"{pickled / encoded:.2f}"])
+    print_table(rows)
+
+
+def compare_throughput(gen_data: Any) -> None:
+    perf_tester = PerformanceTester(200, gen_data)
+    perf_tester.add_function(
+        "pickle.encode", lambda msgs: encode_all(pickle.dumps, msgs), id
+    )
+    perf_tester.add_function(
+        "wire.encode", lambda msgs: encode_all(wire.encode, msgs), id
+    )
+    perf_tester.add_function(
+        "pickle.decode",
+        lambda frames: decode_all(pickle.loads, frames),
+        lambda msgs: encode_all(pickle.dumps, msgs),
+    )
+    perf_tester.add_function(
+        "wire.decode",
+        lambda frames: decode_all(wire.decode, frames),
+        lambda msgs: encode_all(wire.encode, msgs),
+    )
+    perf_tester.compare_performance()
+
+
+def id[T](x: T) -> T:
+    return x
+
+
+if __name__ == "__main__":
+    compare_throughput(gen_tick)
+    compare_throughput(gen_level_update)
+    compare_throughput(gen_level_chunk)
+    compare_sizes()
@@ -21,15 +21,19 @@ from roboarena.client.keys import load_keys
 from roboarena.client.master_mixer import MasterMixer
 from roboarena.client.menu.endscreen import Endscreen
 from roboarena.client.menu.main_menu import MainMenu
+from roboarena.client.replication import Replication
+from roboarena.shared.chunk import Chunk, ChunkedLevel, chunks_overlapping
 from roboarena.shared.constants import (
     CameraPositionConstants,
     ClientConstants,
+    LevelGenerationConstants,
     NetworkConstants,
     UserEvents,
 )
 from roboarena.shared.custom_threading import Atom
 from roboarena.shared.game import GameState as SharedGameState
 from roboarena.shared.game_ui import GameUI
+from roboarena.shared.interest import interest_area
 from roboarena.shared.network import Arrived, IpV4, Network, Receiver
 from roboarena.shared.rendering.renderer import GameRenderer
 from roboarena.shared.time import PreciseClock, get_time
@@ -40,6 +44,7 @@ from roboarena.shared.types import (
     ClientGameEventType,
     ClientId,
     ClientInputEvent,
+    ClientLevelRequestEvent,
     ClientLobbyReadyEvent,
     Counter,
     EntityId,
@@ -53,21 +58,24 @@ from roboarena.shared.types import (
     ServerEntityEvent,
     ServerGameEndEvent,
     ServerGameEvent,
+    ServerGameEventType,
     ServerGameStartEvent,
+    ServerLevelChunkEvent,
     ServerLevelUpdateEvent,
     ServerMarkerEvent,
     ServerMarkVectEvent,
+    ServerSnapshotEvent,
     ServerSpawnBulletEvent,
     ServerSpawnDoorEvent,
     ServerSpawnRobotEvent,
     StartFrameEvent,
+    TilePosition,
     Time,
 )
 from roboarena.shared.util import EventTarget, Stoppable, Stopped, counter
 from roboarena.shared.utils.vector import Vector
 
 if TYPE_CHECKING:
-    from roboarena.server.level_generation.level_generator import Level
     from roboarena.shared.types import ClientEntityType
 
 
@@ -151,6 +159,7 @@ class GameState(SharedGameState):
     master_mixer: MasterMixer
     _ambience_sound: AmbienceSound
     _ack: Counter
+    _replication: Replication
     _client_id: ClientId
     _entity_id: EntityId
     _entity: ClientInputHandler
@@ -158,7 +167,10 @@ class GameState(SharedGameState):
     entities: dict[EntityId, "ClientEntityType"]
     markers: deque[Marker]
     markersvect: deque[MarkerVect]
-    level: "Level"
+    level: ChunkedLevel
+    _chunk_size: int
+    _requested_chunks: set[TilePosition]
+    """Chunks requested from the server, received or not"""
     _camera_pos: CameraPosition
 
     def __init__(
@@ -175,6 +187,7 @@ class GameState(SharedGameState):
         self._renderer = GameRenderer(screen, self)
         self.master_mixer = master_mixer
         self._ack = counter()
+        self._replication = Replication()
         self._client_id = client_id
         self._entity_id = start.client_entity
         self.entities = {}  # type: ignore
@@ -184,13 +197,17 @@ class GameState(SharedGameState):
 
         self._logger.debug(f"initialize with t_start: {t_start}, start: {start}")
 
-        self.level = start.level
+        self._chunk_size = start.chunk_size
+        self.level = ChunkedLevel(self._chunk_size)
+        self._requested_chunks = set()
+        for chunk in start.chunks:
+            self.level.stamp(Chunk(chunk.chunk, self._chunk_size, chunk.blocks))
+            self._requested_chunks.add(chunk.chunk)
 
         for spawn in start.entities:
             if spawn.id != start.client_entity:
-                self.handle(
-                    t_start,
-                    ServerGameEvent(NetworkConstants.INITIAL_ACKNOLEDGEMENT, spawn),
+                self.handle_game_event(
+                    t_start, NetworkConstants.INITIAL_ACKNOLEDGEMENT, spawn
                 )
                 continue
             # initialize client entity
@@ -211,18 +228,26 @@ class GameState(SharedGameState):
         self._camera_pos = CameraPosition(self._entity.position)
 
     def handle(self, t_msg: Time, msg: EventType) -> None | Ended:
-        if isinstance(msg, ServerGameEndEvent):
-            return Ended(round(self._entity.position.length()))
-        if not isinstance(msg, ServerGameEvent):
-            self._logger.error(f"Unexpected event: {msg}")
-            raise ValueError(f"Unexpected event: {msg}")
-        last_ack, event = msg.last_ack, msg.event
-
+        match msg:
+            case ServerGameEndEvent():
+                return Ended(round(self._entity.position.length()))
+            case ServerSnapshotEvent(last_ack):
+                for game_event in self._replication.resolve(msg):
+                    self.handle_game_event(t_msg, last_ack, game_event)
+            case ServerGameEvent(last_ack, game_event):
+                self.handle_game_event(t_msg, last_ack, game_event)
+            case _:
+                self._logger.error(f"Unexpected event: {msg}")
+                raise ValueError(f"Unexpected event: {msg}")
+
+    def handle_game_event(
+        self, t_msg: Time, last_ack: Acknoledgement, event: ServerGameEventType
+    ) -> None:
         match event:
             case ServerEntityEvent(id, name, payload):
                 if id not in self.entities:
                     return
-                self.entities[id].on_server(name, payload, msg.last_ack, t_msg)
+                self.entities[id].on_server(name, payload, last_ack, t_msg)
             case ServerSpawnRobotEvent(id, health, motion, color, weapon):
                 entity = ClientEnemyRobot(
                     self, health, motion, color, weapon, last_ack, t_msg
@@ -232,14 +257,14 @@ class GameState(SharedGameState):
                 entity = ClientDoorEntity(self, position, open)
                 self.entities[id] = entity
             case ServerSpawnBulletEvent(id, friendly, position, velocity):
-                entity = ClientBullet(
-                    self, friendly, position, velocity, msg.last_ack, t_msg
-                )
+                entity = ClientBullet(self, friendly, position, velocity, t_msg)
                 self.entities[id] = entity
             case ServerDeleteEntityEvent(id):
                 del self.entities[id]
             case ServerLevelUpdateEvent(update):
                 self.level |= update
+            case ServerLevelChunkEvent(chunk, blocks):
+                self.level.stamp(Chunk(chunk, self._chunk_size, blocks))
             case ServerMarkerEvent(markers):
                 self.markers += markers
             case ServerMarkVectEvent(markers):
@@ -248,10 +273,25 @@ class GameState(SharedGameState):
     def dispatch(self, event: ClientGameEventType) -> Acknoledgement:
         ack = next(self._ack)
         self._client.dispatch(
-            ClientGameEvent(self._client_id, ack, event),
+            ClientGameEvent(
+                self._client_id, ack, event, self._replication.last_snapshot
+            ),
         )
         return ack
 
+    def request_chunks(self, camera_position: Vector[float], t: Time) -> None:
+        """Request the level chunks around the camera not requested yet and
+        freeze those not visited for a while"""
+        area = interest_area(camera_position)
+        chunks = set(chunks_overlapping(area, self._chunk_size))
+        self.level.visit(chunks, t)
+        self.level.freeze(t - LevelGenerationConstants.FREEZE_AFTER)
+        chunks -= self._requested_chunks
+        if len(chunks) == 0:
+            return
+        self._requested_chunks |= chunks
+        self.dispatch(ClientLevelRequestEvent(chunks))
+
     def set_keys(self) -> None:
         self._keys = load_keys()
 
@@ -293,13 +333,16 @@ class GameState(SharedGameState):
                 if isinstance(handle_result, Ended):
                     self.master_mixer.stop_all()
                     return handle_result
+            self.index_entities()
 
             input = self.get_input(dt)
             ack = self.dispatch(ClientInputEvent(input, dt))
             self._entity.on_input(input, dt, ack, t)
+            self.index_entity(self._entity)
 
             for _, entity in self.entities.items():
                 entity.tick(dt, t)
+                self.index_entity(entity)
 
             # pygame event handling
             for e in event.get():
@@ -312,6 +355,7 @@ class GameState(SharedGameState):
 
             # rendering
             camers_pos = self._camera_pos.update(self._entity.position)
+            self.request_chunks(camers_pos, t)
             self._renderer.render(camera_position=camers_pos)
             # self._logger.debug("Rendered")
 
@@ -362,6 +406,8 @@ class Client(Stoppable):
             while client_id is None:
                 if self.stopped.get():
                     return Stopped()
+                if not self.receiver.wait(timeout=NetworkConstants.WAIT_TIMEOUT):
+                    continue
                 arrived = self.network.receive_one(self.ip)
                 if arrived is None:
                     continue
@@ -383,6 +429,8 @@ class Client(Stoppable):
             while start is None:
                 if self.stopped.get():
                     return Stopped()
+                if not self.receiver.wait(timeout=NetworkConstants.WAIT_TIMEOUT):
+                    continue
                 arrived = self.network.receive_one(self.ip)
                 if arrived is None:
                     continue
@@ -412,4 +460,5 @@ class Client(Stoppable):
             # last_score = game_result.score
 
     def stop(self) -> None:
-        return self.stopped.set(True)
+        self.stopped.set(True)
+        self.receiver.interrupt()
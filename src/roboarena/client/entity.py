@@ -163,36 +163,6 @@ class InterpolatedValue[T, Ctx](Value[T]):
         return self.value
 
 
-class ExtrapolatedValue[T, Ctx](Value[T]):
-    _last_snapshot: tuple[Acknoledgement, Time, T]
-    _extrapolate: Callable[[T, Time, Ctx], T]
-    _value: T
-
-    def __init__(
-        self,
-        value: T,
-        last_ack: Acknoledgement,
-        t_ack: Time,
-        extrapolate: Callable[[T, Time, Ctx], T],
-    ) -> None:
-        super().__init__()
-        self._last_snapshot = (last_ack, t_ack, value)
-        self._extrapolate = extrapolate
-        self._value = value
-
-    def tick(self, t: Time, ctx: Ctx) -> None:
-        dt = t - self._last_snapshot[1]
-        self._value = self._extrapolate(self._last_snapshot[2], dt, ctx)
-
-    def on_server(self, value: T, last_ack: Acknoledgement, t_ack: Time) -> None:
-        if last_ack < self._last_snapshot[0]:
-            return
-        self._last_snapshot = (last_ack, t_ack, value)
-
-    def get(self) -> T:
-        return self._value
-
-
 @define
 class PassiveRemoteValue[T](Value[T]):
     value: T
@@ -263,8 +233,17 @@ class ClientWeapon(SharedWeapon):
 
 
 class ClientBullet(Bullet, ClientEntity):
-    _position: ExtrapolatedValue[Vector[float], None]
+    """Simulated from its spawn event alone, no entity events are sent for it.
+
+    Moves in a straight line from the spawn until deleted by the server,
+    stopping at the first block blocking bullets until then.
+    """
+
+    _logger = logging.getLogger(f"{__name__}.ClientBullet")
+    _position: PassiveRemoteValue[Vector[float]]
     _velocity: PassiveRemoteValue[Vector[float]]
+    _spawn: tuple[Time, Vector[float]]
+    _blocked: bool
 
     def __init__(
         self,
@@ -272,12 +251,13 @@ class ClientBullet(Bullet, ClientEntity):
         friendly: bool,
         position: Vector[float],
         velocity: Vector[float],
-        last_ack: Acknoledgement,
-        t_ack: Time,
+        t_spawn: Time,
     ) -> None:
         super().__init__(game, friendly)
-        self._position = ExtrapolatedValue(position, last_ack, t_ack, self.move)  # type: ignore
+        self._position = PassiveRemoteValue(position)  # type: ignore
         self._velocity = PassiveRemoteValue(velocity)  # type: ignore
+        self._spawn = (t_spawn, position)
+        self._blocked = False
 
     def on_server(
         self,
@@ -286,18 +266,21 @@ class ClientBullet(Bullet, ClientEntity):
         last_ack: Acknoledgement,
         t_ack: Time,
     ):
-        match event_name, event:
-            case "position", Vector(float(), float()):
-                _event: Vector[float] = event
-                self._position.on_server(_event, last_ack, t_ack)
-            case "velocity", Vector(float(), float()):
-                _event: Vector[float] = event
-                self._velocity.on_server(_event)
-            case _:
-                raise ValueError("entity: invalid event")
+        self._logger.warning(f"ignored event: {event_name}")
 
     def tick(self, dt: Time, t: Time):
-        self._position.tick(t, None)
+        if self._blocked:
+            return
+        t_spawn, spawn = self._spawn
+        position = self.position
+        motion = self.move(spawn, t - t_spawn, None) - position
+        try:
+            at = self._game.level.sweep(self.collision.hitbox, motion, "bullet")
+        except KeyError:
+            # the chunk is not received yet, the server deletes bullets there
+            at = None
+        self._blocked = at is not None
+        self._position.value = position + motion * (1.0 if at is None else at)
 
 
 @dataclass(frozen=True)
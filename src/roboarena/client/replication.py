@@ -0,0 +1,88 @@
+import logging
+from collections import deque
+from collections.abc import Iterator
+
+from roboarena.shared.constants import NetworkConstants
+from roboarena.shared.replication import patch, replicated_fields
+from roboarena.shared.types import (
+    EntityId,
+    EventName,
+    Quantized,
+    ServerDeleteEntityEvent,
+    ServerEntityDeltaEvent,
+    ServerEntityEvent,
+    ServerGameEventType,
+    ServerSnapshotEvent,
+    SnapshotId,
+)
+
+
+def _trim(history: deque[tuple[SnapshotId, Quantized]], baseline: SnapshotId) -> None:
+    """Drop values superseded as of the baseline"""
+    while len(history) >= 2 and history[1][0] <= baseline:
+        history.popleft()
+
+
+class Replication:
+    """Restores the replicated entity fields delta compressed by the server.
+
+    Keeps the received values of each field since the latest baseline,
+    as the server refers to the last acknowledged snapshot, not the last sent.
+    """
+
+    _logger = logging.getLogger(f"{__name__}.Replication")
+    last_snapshot: SnapshotId
+    _history: dict[EntityId, dict[EventName, deque[tuple[SnapshotId, Quantized]]]]
+    """Received values of each field, oldest first"""
+
+    def __init__(self) -> None:
+        self.last_snapshot = NetworkConstants.INITIAL_ACKNOLEDGEMENT
+        self._history = {}
+
+    def resolve(self, snapshot: ServerSnapshotEvent) -> Iterator[ServerGameEventType]:
+        """Events of the snapshot with deltas replaced by full values"""
+        self.last_snapshot = max(self.last_snapshot, snapshot.id)
+        for event in snapshot.events:
+            match event:
+                case ServerEntityDeltaEvent(entity, name, diff):
+                    old = self._baseline(entity, name, snapshot.baseline)
+                    if old is None:
+                        self._logger.error(f"no baseline for {event}")
+                        continue
+                    new = patch(old, diff)
+                    self._record(entity, name, snapshot.id, new)
+                    value = replicated_fields[name].dequantize(new)
+                    yield ServerEntityEvent(entity, name, value)
+                case ServerEntityEvent(entity, name, value) if (
+                    name in replicated_fields
+                ):
+                    new = replicated_fields[name].quantize(value)
+                    self._record(entity, name, snapshot.id, new)
+                    yield event
+                case ServerDeleteEntityEvent(entity):
+                    self._history.pop(entity, None)
+                    yield event
+                case _:
+                    yield event
+
+    def _record(
+        self, entity: EntityId, name: EventName, snapshot: SnapshotId, q: Quantized
+    ) -> None:
+        fields = self._history.setdefault(entity, {})
+        history = fields.setdefault(name, deque())
+        history.append((snapshot, q))
+        # the server sends full values instead of deltas to older baselines
+        _trim(history, snapshot - NetworkConstants.MAX_UNACKNOLEDGED_SNAPSHOTS)
+
+    def _baseline(
+        self, entity: EntityId, name: EventName, baseline: SnapshotId
+    ) -> Quantized | None:
+        """Value of the field as of the baseline snapshot"""
+        history = self._history.get(entity, {}).get(name)
+        if history is None:
+            return None
+        # the server never refers to older baselines again
+        _trim(history, baseline)
+        if history[0][0] > baseline:
+            return None
+        return history[0][1]
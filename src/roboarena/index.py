@@ -4,10 +4,19 @@ from threading import Thread
 
 from roboarena.client.client import Client, QuitEvent
 from roboarena.server.server import Server
+from roboarena.shared import wire
 from roboarena.shared.constants import NetworkConstants
 from roboarena.shared.network import Network
+from roboarena.shared.socket_network import Address, SocketNetwork
 from roboarena.shared.types import EventType
-from roboarena.shared.util import stopAll
+from roboarena.shared.util import gen_id, stopAll
+
+
+def address(value: str) -> Address:
+    """Parse [HOST:]PORT"""
+    host, _, port = value.rpartition(":")
+    return (host or NetworkConstants.DEFAULT_HOST, int(port))
+
 
 """ Command line argument parsing
 """
@@ -24,6 +33,19 @@ arg_parser.add_argument(
     choices=["debug", "info", "warning", "error", "critical"],
 )
 arg_parser.add_argument("-lf", "--logfile", nargs=1)
+mode = arg_parser.add_mutually_exclusive_group()
+mode.add_argument(
+    "--serve",
+    type=address,
+    metavar="[HOST:]PORT",
+    help="run a dedicated headless server accepting clients on this address",
+)
+mode.add_argument(
+    "--connect",
+    type=address,
+    metavar="[HOST:]PORT",
+    help="run only the client and connect to a dedicated server",
+)
 args = arg_parser.parse_args()
 
 """ Logging
@@ -37,18 +59,42 @@ else:
     logging.basicConfig(level=loglevel)
 logger = logging.getLogger(__name__)
 
-network = Network[EventType](0)
-logger.info("initialized network")
+if args.serve:
+    network = SocketNetwork[EventType](
+        NetworkConstants.SERVER_IP, wire.encode, wire.decode
+    )
+    logger.info(f"listening on {network.listen(args.serve)}")
+    server = Server(network, NetworkConstants.SERVER_IP)
+    try:
+        server.loop()
+    except KeyboardInterrupt:
+        server.stop()
+    network.close()
+    logger.info("stoppped server")
+elif args.connect:
+    client_ip = gen_id([NetworkConstants.SERVER_IP])
+    network = SocketNetwork[EventType](client_ip, wire.encode, wire.decode)
+    network.connect(args.connect)
+    logger.info(f"connected to server at {args.connect}")
+
+    client = Client(network, client_ip)
+    client.events.add_listener(QuitEvent, lambda e: stopAll(client))
+    client.loop()
+    network.close()
+    logger.info("stopped client")
+else:
+    network = Network[EventType](0)
+    logger.info("initialized network")
 
-server = Server(network, NetworkConstants.SERVER_IP)
-server_thread = Thread(target=lambda: server.loop())
-server_thread.start()
-logger.info("started server")
+    server = Server(network, NetworkConstants.SERVER_IP)
+    server_thread = Thread(target=lambda: server.loop())
+    server_thread.start()
+    logger.info("started server")
 
-client = Client(network, 0x00000001)
-client.events.add_listener(QuitEvent, lambda e: stopAll(client, server))
-client.loop()
-logger.info("stopped client")
+    client = Client(network, 0x00000001)
+    client.events.add_listener(QuitEvent, lambda e: stopAll(client, server))
+    client.loop()
+    logger.info("stopped client")
 
-server_thread.join()
-logger.info("stoppped server")
+    server_thread.join()
+    logger.info("stoppped server")
@@ -0,0 +1,330 @@
+"""All bullets of the server as arrays, moved and hit tested at once.
+
+Bullets share the ids of the entities, the clients spawn them as entities.
+"""
+
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy.typing import NDArray
+
+from roboarena.server.entity import ServerEnemyRobot, ServerPlayerRobot
+from roboarena.shared.constants import TextureSize
+from roboarena.shared.entity import Entity
+from roboarena.shared.types import (
+    EntityId,
+    Marker,
+    PygameColor,
+    ServerSpawnBulletEvent,
+    Time,
+)
+from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.vector import Vector
+
+if TYPE_CHECKING:
+    from roboarena.server.server import GameState
+
+type FloatArray = NDArray[np.double]
+type IntArray = NDArray[np.int64]
+type BoolArray = NDArray[np.bool_]
+
+HALF_SIZE = np.array(TextureSize.BULLET_TEXTURE.to_tuple()) / 2
+
+
+def sweep_times(
+    lo: FloatArray,
+    hi: FloatArray,
+    motion: FloatArray,
+    other_lo: FloatArray,
+    other_hi: FloatArray,
+) -> FloatArray:
+    """`Rect.sweep` for arrays of rects by their corners, the last axis x, y,
+    the other axes broadcast. inf where the rects do not overlap."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t0 = (other_lo - hi) / motion
+        t1 = (other_hi - lo) / motion
+    # without motion along an axis the rects overlap along it always or never
+    still = motion == 0
+    overlapping = (lo <= other_hi) & (hi >= other_lo)
+    enter = np.where(still, np.where(overlapping, -np.inf, np.inf), np.fmin(t0, t1))
+    leave = np.where(still, np.where(overlapping, np.inf, -np.inf), np.fmax(t0, t1))
+    enter = np.maximum(np.maximum(enter[..., 0], enter[..., 1]), 0)
+    leave = np.minimum(np.minimum(leave[..., 0], leave[..., 1]), 1)
+    return np.where(enter <= leave, enter, np.inf)
+
+
+class BulletSystem:
+    """The bullets as a structure of arrays, one row per bullet.
+
+    Bullets created during an update are added after the next `tick`, as
+    entities are after each frame.
+    """
+
+    _game: "GameState"
+    _ids: Iterator[EntityId]
+    ids: IntArray
+    """Increasing, as ids are never reused"""
+    positions: FloatArray
+    """Centers, shape (n, 2)"""
+    velocities: FloatArray
+    """In units/second, shape (n, 2)"""
+    friendly: BoolArray
+    """True if shot by player, False if shot by enemy"""
+    strength: IntArray
+    _hits: dict[EntityId, set[Entity]]
+    """The targets the bullets touched last tick, hit only once in a row"""
+    _created: list[tuple[bool, Vector[float], Vector[float], int]]
+    _chunks: dict[tuple[int, int], tuple[int, BoolArray]]
+    """By chunk its bitmap of the blocks blocking bullets and as array"""
+
+    def __init__(self, game: "GameState", ids: Iterator[EntityId]) -> None:
+        self._game = game
+        self._ids = ids
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.positions = np.zeros((0, 2))
+        self.velocities = np.zeros((0, 2))
+        self.friendly = np.zeros(0, dtype=np.bool_)
+        self.strength = np.zeros(0, dtype=np.int64)
+        self._hits = {}
+        self._created = []
+        self._chunks = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, id: EntityId) -> bool:
+        i = np.searchsorted(self.ids, id)
+        return bool(i < len(self.ids) and self.ids[i] == id)
+
+    def create(
+        self,
+        friendly: bool,
+        position: Vector[float],
+        velocity: Vector[float],
+        strength: int,
+    ) -> None:
+        self._created.append((friendly, position, velocity, strength))
+
+    def tick(self, dt: Time) -> list[EntityId]:
+        """Move all bullets up to the first block or entity blocking them,
+        hitting the targets on the way. Returns the ids of the deleted."""
+        if len(self) > 0:
+            deleted = self._move(dt)
+        else:
+            deleted = []
+        self._add_created()
+        return deleted
+
+    def in_area(self, area: Rect, friendly: bool | None = None) -> list[EntityId]:
+        """The bullets within the area, only friendly/unfriendly if given"""
+        x, y = self.positions[:, 0], self.positions[:, 1]
+        inside = (area.left <= x) & (x <= area.right)
+        inside &= (area.top <= y) & (y <= area.bottom)
+        if friendly is not None:
+            inside &= self.friendly == friendly
+        return self.ids[inside].tolist()
+
+    def position(self, id: EntityId) -> Vector[float]:
+        x, y = self.positions[self._index(id)].tolist()
+        return Vector(x, y)
+
+    def to_event(self, id: EntityId) -> ServerSpawnBulletEvent:
+        i = self._index(id)
+        x, y = self.positions[i].tolist()
+        vx, vy = self.velocities[i].tolist()
+        friendly = bool(self.friendly[i])
+        return ServerSpawnBulletEvent(id, friendly, Vector(x, y), Vector(vx, vy))
+
+    def _index(self, id: EntityId) -> int:
+        if id not in self:
+            raise KeyError(id)
+        return int(np.searchsorted(self.ids, id))
+
+    def _move(self, dt: Time) -> list[EntityId]:
+        motion = self.velocities * dt
+        lo, hi = self.positions - HALF_SIZE, self.positions + HALF_SIZE
+        blocked = self._block_times(lo, hi, motion)
+
+        entities, rows, columns, times = self._contacts(lo, hi, motion)
+        blocks = np.array([e.blocks_bullet for e in entities], dtype=np.bool_)
+        blocking = blocks[columns]
+        np.minimum.at(blocked, rows[blocking], times[blocking])
+
+        robots = np.array(
+            [isinstance(e, ServerEnemyRobot | ServerPlayerRobot) for e in entities],
+            dtype=np.bool_,
+        )
+        touching = robots[columns]
+        self._hit(
+            entities,
+            rows[touching],
+            columns[touching],
+            times[touching],
+            motion,
+            blocked,
+        )
+
+        self.positions += motion * np.minimum(blocked, 1)[:, None]
+        stopped = blocked <= 1
+        deleted = self.ids[stopped].tolist()
+        self._game.mark(
+            [
+                Marker(Vector(x, y), PygameColor.light_grey())
+                for x, y in self.positions[stopped].tolist()
+            ]
+        )
+        for id in deleted:
+            self._hits.pop(id, None)
+        self._keep(~stopped)
+        return deleted
+
+    def _hit(
+        self,
+        entities: list[Entity],
+        rows: IntArray,
+        columns: IntArray,
+        times: FloatArray,
+        motion: FloatArray,
+        blocked: FloatArray,
+    ) -> None:
+        """Hit the targets touched before being blocked, the damage of all
+        bullets summed per target. The columns are robots among the entities."""
+        enemy = np.array([isinstance(e, ServerEnemyRobot) for e in entities])
+        touched = times <= blocked[rows]
+        touched &= self.friendly[rows] == enemy[columns]
+        rows, columns, times = rows[touched], columns[touched], times[touched]
+        points = self.positions[rows] + motion[rows] * times[:, None]
+        damage = np.zeros(len(entities), dtype=np.int64)
+        hits = dict[EntityId, set[Entity]]()
+        markers = list[Marker]()
+        for i, j, (x, y) in zip(rows.tolist(), columns.tolist(), points.tolist()):
+            id, robot = int(self.ids[i]), entities[j]
+            hits.setdefault(id, set()).add(robot)
+            if robot not in self._hits.get(id, ()):
+                damage[j] += self.strength[i]
+                markers.append(Marker(Vector(x, y), PygameColor.green()))
+        self._hits = hits
+        for j in np.nonzero(damage)[0]:
+            entities[j].health.hit(int(damage[j]))  # type: ignore
+        self._game.mark(markers)
+
+    def _contacts(
+        self, lo: FloatArray, hi: FloatArray, motion: FloatArray
+    ) -> tuple[list[Entity], IntArray, IntArray, FloatArray]:
+        """The entities near any bullet and the bullets, rows, touching them,
+        columns, within the motion at the fraction of the motion they first do.
+
+        Only the entities in the cells of the entity grid around the bounds of
+        each motion are tested."""
+        grid = self._game.entity_grid
+        first, last = np.minimum(lo, lo + motion), np.maximum(hi, hi + motion)
+        bounds = np.concatenate([first, last], axis=1) / grid.cell_size
+        entities = list[Entity]()
+        indices = dict[Entity, int]()
+        rows, columns = list[int](), list[int]()
+        for i, (left, top, right, bottom) in enumerate(
+            np.floor(bounds).astype(np.int64).tolist()
+        ):
+            for entity in grid.query_cells((left, top, right, bottom)):
+                j = indices.setdefault(entity, len(entities))
+                if j == len(entities):
+                    entities.append(entity)
+                rows.append(i)
+                columns.append(j)
+        if len(entities) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return entities, empty, empty, np.zeros(0)
+        hitboxes = [e.collision.hitbox for e in entities]
+        other_lo = np.array([(h.left, h.top) for h in hitboxes])
+        other_hi = np.array([(h.right, h.bottom) for h in hitboxes])
+        row, column = np.array(rows), np.array(columns)
+        times = sweep_times(
+            lo[row], hi[row], motion[row], other_lo[column], other_hi[column]
+        )
+        touching = np.isfinite(times)
+        return entities, row[touching], column[touching], times[touching]
+
+    def _block_times(
+        self, lo: FloatArray, hi: FloatArray, motion: FloatArray
+    ) -> FloatArray:
+        """Fraction of the motion at which each bullet first overlaps a block
+        blocking it, inf if it does not. Blocks not in the level block.
+
+        The bullets are grouped by the blocks their motion spans, so a fast
+        bullet does not widen the blocks tested for all."""
+        first = np.floor(np.minimum(lo, lo + motion)).astype(np.int64)
+        last = np.floor(np.maximum(hi, hi + motion)).astype(np.int64)
+        spans = last - first + 1
+        _, inverse, counts = np.unique(
+            (spans[:, 0] << 32) + spans[:, 1], return_inverse=True, return_counts=True
+        )
+        times = np.empty(len(lo))
+        groups = np.split(np.argsort(inverse, kind="stable"), np.cumsum(counts)[:-1])
+        for rows in groups:
+            span_x, span_y = spans[rows[0]].tolist()
+            xs = first[rows, None, None, 0] + np.arange(span_x)[None, None, :]
+            ys = first[rows, None, None, 1] + np.arange(span_y)[None, :, None]
+            xs, ys = np.broadcast_arrays(xs, ys)
+            cells = np.stack([xs, ys], axis=-1).astype(np.double)
+            group_times = sweep_times(
+                lo[rows, None, None],
+                hi[rows, None, None],
+                motion[rows, None, None],
+                cells,
+                cells + 1,
+            )
+            group_times[~self._blocked(xs, ys)] = np.inf
+            times[rows] = group_times.min(axis=(1, 2))
+        return times
+
+    def _blocked(self, xs: IntArray, ys: IntArray) -> BoolArray:
+        """Whether the blocks block bullets, by chunk as there are few"""
+        size = self._game.level.size
+        chunk_xs, chunk_ys = xs // size, ys // size
+        # unique in one dimension, chunks are far closer than 2**32 blocks
+        keys = (chunk_xs << 32) + chunk_ys
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        chunks = zip(chunk_xs.ravel()[first].tolist(), chunk_ys.ravel()[first].tolist())
+        occupancy = np.stack([self._chunk_blocked(x, y) for x, y in chunks])
+        offsets = (ys - chunk_ys * size) * size + (xs - chunk_xs * size)
+        return occupancy[inverse.reshape(xs.shape), offsets]
+
+    def _chunk_blocked(self, x: int, y: int) -> BoolArray:
+        size = self._game.level.size
+        try:
+            bitmap = self._game.level.chunk_occupancy(x, y)[1]
+        except KeyError:
+            return np.ones(size * size, dtype=np.bool_)
+        cached = self._chunks.get((x, y))
+        if cached is not None and cached[0] == bitmap:
+            return cached[1]
+        bits = np.frombuffer(
+            bitmap.to_bytes((size * size + 7) // 8, "little"), np.uint8
+        )
+        blocked = np.unpackbits(bits, bitorder="little")[: size * size].astype(np.bool_)
+        self._chunks[(x, y)] = (bitmap, blocked)
+        return blocked
+
+    def _keep(self, rows: BoolArray) -> None:
+        self.ids = self.ids[rows]
+        self.positions = self.positions[rows]
+        self.velocities = self.velocities[rows]
+        self.friendly = self.friendly[rows]
+        self.strength = self.strength[rows]
+
+    def _add_created(self) -> None:
+        if len(self._created) == 0:
+            return
+        created, self._created = self._created, []
+        ids = [next(self._ids) for _ in created]
+        friendly, positions, velocities, strength = zip(*created)
+        self.ids = np.concatenate([self.ids, ids])
+        self.positions = np.concatenate(
+            [self.positions, [(p.x, p.y) for p in positions]]
+        )
+        self.velocities = np.concatenate(
+            [self.velocities, [(v.x, v.y) for v in velocities]]
+        )
+        self.friendly = np.concatenate([self.friendly, friendly])
+        self.strength = np.concatenate([self.strength, strength])
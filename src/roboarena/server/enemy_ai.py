@@ -2,6 +2,7 @@ import math
 import random
 from collections import defaultdict, deque
 from collections.abc import Iterable
+from itertools import chain
 from typing import TYPE_CHECKING, Callable, Mapping, Optional
 
 import numpy as np
@@ -10,7 +11,6 @@ from numpy.typing import NDArray
 from roboarena.server.level_generation.level_generator import BlockPosition
 from roboarena.server.level_generation.wfc import Direction
 from roboarena.shared.constants import PlayerConstants
-from roboarena.shared.entity import Bullet
 from roboarena.shared.types import EntityId, Motion
 from roboarena.shared.util import get_min_max
 from roboarena.shared.utils.search import astar
@@ -171,15 +171,15 @@ class EnemyAi:
             map(lambda x: x[1], self._game.players)
         )
 
-        for entity in entities:
+        bullets = self._room.friendly_bullets
+        for entity_pos, is_bullet in chain(
+            ((e.position, False) for e in entities), ((b, True) for b in bullets)
+        ):
             factor = 1.5
-            entity_pos = entity.position
             distance_vector = current_pos - entity_pos
             distance = distance_vector.length()
-            if isinstance(entity, Bullet):
+            if is_bullet:
                 factor = 1 * self._difficulty
-                if not entity.friendly:
-                    continue
                 repulsion_force += distance_vector
                 distance_vector = (
                     Matrix2d.rot_matrix(random.uniform(0, math.pi)) * distance_vector
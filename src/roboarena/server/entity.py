@@ -8,7 +8,6 @@ from attrs import define, field
 
 from roboarena.server.enemy_ai import EnemyAi
 from roboarena.shared.entity import (
-    Bullet,
     DoorEntity,
     EnemyRobot,
     EnemyRobotMoveCtx,
@@ -18,7 +17,6 @@ from roboarena.shared.entity import (
     SharedWeapon,
     Value,
 )
-from roboarena.shared.game import OutOfLevelError
 from roboarena.shared.types import (
     ChangedEvent,
     Color,
@@ -26,12 +24,9 @@ from roboarena.shared.types import (
     Dispatch,
     EntityId,
     Input,
-    Marker,
     Motion,
     Position,
-    PygameColor,
     ServerEntityType,
-    ServerSpawnBulletEvent,
     ServerSpawnDoorEvent,
     ServerSpawnRobotEvent,
     ShotEvent,
@@ -40,7 +35,7 @@ from roboarena.shared.types import (
     Weapon,
     basic_weapon,
 )
-from roboarena.shared.util import EventTarget, exceqt
+from roboarena.shared.util import EventTarget
 from roboarena.shared.utils.vector import Vector
 
 if TYPE_CHECKING:
@@ -148,14 +143,12 @@ class ServerWeapon(SharedWeapon):
         # if time.time() - self._last_shot < self._weapon.wepaon_cooldown:
         #     return
         # self._last_shot = time.time()
-        bullet = ServerBullet(
-            self._game,
+        self._game.bullets.create(
             self.friendly,
             self._entity.position,
             direction.normalize() * self._weapon.bullet_speed,
             self._weapon.bullet_strength,
         )
-        self._game.create_entity(bullet)
         self._game.dispatch(self._entity, "weapon_shot", ShotEvent())
         self.events.dispatch(ShotEvent())
 
@@ -170,63 +163,6 @@ class ServerWeapon(SharedWeapon):
         return self._weapon
 
 
-class ServerBullet(Bullet):
-    ServerPlayerBulletPositionCtx = tuple[Time]
-    _game: "GameState"
-    _position: CalculatedValue[Vector[float], ServerPlayerBulletPositionCtx]
-    _velocity: ActiveRemoteValue[Vector[float]]
-    _strength: int
-    _hit_last_tick: set[Entity]
-
-    def __init__(
-        self,
-        game: "GameState",
-        friendly: bool,
-        position: Vector[float],
-        velocity: Vector[float],
-        strength: int,
-    ) -> None:
-        super().__init__(game, friendly)
-        self._game = game  # type: ignore
-        self._position = CalculatedValue(  # type: ignore
-            position,
-            lambda pos, ctx: self.move(pos, ctx[0], None),
-            partial(self._game.dispatch, self, "position"),
-        )
-        self._velocity = ActiveRemoteValue(  # type: ignore
-            velocity,
-            partial(self._game.dispatch, self, "velocity"),
-        )
-        self._strength = strength
-        self._hit_last_tick = set()
-
-    def tick(self, dt: Time, t: Time):
-        self._position.tick((dt,))
-        with exceqt(OutOfLevelError, lambda: self._game.delete_entity(self)):
-            blocked = any(
-                b.blocks_bullet for b in self._game.colliding_blocks(self).values()
-            ) or any(e.blocks_bullet for e in self._game.collidingEntities(self))
-            if blocked:
-                self._game.mark(Marker(self.position, PygameColor.light_grey()))
-                return self._game.delete_entity(self)
-
-        target_type = ServerEnemyRobot if self.friendly else ServerPlayerRobot
-        hit_this_tick = set[Entity]()
-        for entity in self._game.collidingEntities(self):
-            self._game.mark(Marker(self.position, PygameColor.green()))
-            if not isinstance(entity, target_type):
-                continue
-            hit_this_tick.add(entity)
-            if entity not in self._hit_last_tick:
-                entity.health.hit(self._strength)
-        self._hit_last_tick = hit_this_tick
-
-    def to_event(self, entity_id: EntityId) -> ServerSpawnBulletEvent:
-        return ServerSpawnBulletEvent(
-            entity_id, self.friendly, self._position.get(), self._velocity.get()
-        )
-
-
 class ServerPlayerRobot(PlayerRobot, ServerInputHandler):
     _game: "GameState"
     health: HealthController
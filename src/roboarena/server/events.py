@@ -1,5 +1,5 @@
 # from abc import ABC, abstractmethod
-from collections.abc import Iterable
+from collections.abc import Collection
 
 from roboarena.shared.types import EventName
 
@@ -27,12 +27,15 @@ from roboarena.shared.types import EventName
 class EventBuffer[T]:  # (EventTarget[T])
     """Prevents resending of same events by collecting only the last one."""
 
-    events: dict[EventName, T] = {}
+    events: dict[EventName, T]
+
+    def __init__(self) -> None:
+        self.events = {}
 
     def dispatch(self, type: EventName, value: T) -> None:
         self.events[type] = value
 
-    def collect(self) -> Iterable[T]:
+    def collect(self) -> Collection[T]:
         events = self.events.values()
         self.events = {}
         return events
@@ -0,0 +1,18 @@
+from dataclasses import dataclass, field
+
+from roboarena.shared.types import EntityId, TilePosition
+from roboarena.shared.utils.rect import Rect
+
+
+@dataclass
+class Interest:
+    """What one client receives events for.
+
+    Entities are those in the area of interest, see `shared.interest`.
+    Level chunks are requested by the client itself.
+    """
+
+    area: Rect
+    entities: set[EntityId] = field(default_factory=set)
+    requested_chunks: set[TilePosition] = field(default_factory=set)
+    """Requested chunks, which are sent once generated"""
@@ -1,16 +1,34 @@
 import logging
-from collections.abc import Iterable, Sequence
+import random
+from collections.abc import Collection, Iterable, Sequence
 from dataclasses import dataclass
+from functools import cached_property
 from typing import TYPE_CHECKING, Any, Callable, TypeGuard
 
+import numpy as np
 from more_itertools import iterate, take
+from numpy.typing import NDArray
 
 import roboarena.server.level_generation.wfc as wfc
-from roboarena.shared.block import crate, floor_room
+from roboarena.shared.block import (
+    block_id,
+    crate,
+    floor_door,
+    floor_room,
+    floor_room_spawn,
+    room_blocks,
+)
+from roboarena.shared.chunk import Chunk, RoomLayout
 from roboarena.shared.constants import PerlinNoiseConstants
-from roboarena.shared.types import BlockPosition, Level, LevelUpdate
-from roboarena.shared.util import enumerate2d_vec, neighbours_horiz, neighbours_vert
-from roboarena.shared.utils.perlin_nose import perlin_noise_spot
+from roboarena.shared.types import BlockPosition, Position, TilePosition
+from roboarena.shared.util import (
+    enumerate2d_vec,
+    neighbours_4,
+    neighbours_horiz,
+    neighbours_vert,
+    search_connected,
+)
+from roboarena.shared.utils.perlin_nose import perlin_noise_tiles
 from roboarena.shared.utils.vector import Vector
 
 if TYPE_CHECKING:
@@ -18,6 +36,9 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(f"{__name__}")
 
+FLOOR_ROOM = block_id(floor_room)
+CRATE = block_id(crate)
+
 
 @dataclass(frozen=True)
 class Edge:
@@ -46,6 +67,30 @@ class Tile:
     edges: tuple[Edge, Edge, Edge, Edge]
     """(top, right, bottom, left) specifies which tiles can neighbour each other"""
 
+    @cached_property
+    def rooms(self) -> tuple[RoomLayout, ...]:
+        """The rooms of the tile relative to its top left, one per spawn block.
+        Rooms do not cross the edges of their tile."""
+        blocks = {pos.mirror(): block for pos, block in enumerate2d_vec(self.blocks)}
+        rooms = list[RoomLayout]()
+        for pos, block in blocks.items():
+            if block is not floor_room_spawn:
+                continue
+            room = search_connected(
+                pos,
+                blocks,
+                lambda b: b if b in room_blocks else None,
+                neighbours_4,
+            )
+            rooms.append(
+                RoomLayout.from_blocks(
+                    pos,
+                    (p for p, b in room.items() if b is not floor_door),
+                    (p for p, b in room.items() if b is floor_door),
+                )
+            )
+        return tuple(rooms)
+
 
 def is_tile(x: Any) -> TypeGuard[Tile]:
     return isinstance(x, Tile)
@@ -76,9 +121,9 @@ class Tileset:
     """The tile placed when no other one is possible"""
     init: Tile
     """The tile placed at position 0,0"""
-    rules_horiz: Iterable[tuple[Tile, Tile]]
+    rules_horiz: Collection[tuple[Tile, Tile]]
     """Possible horizontal patterns as (left, right)"""
-    rules_vert: Iterable[tuple[Tile, Tile]]
+    rules_vert: Collection[tuple[Tile, Tile]]
     """Possible vertical patterns as (top, bottom)"""
 
     @staticmethod
@@ -101,8 +146,16 @@ class Tileset:
             list(filter(is_tile, tiles.values())),
             fallback,
             init,
-            filter(both_tile, ((tiles[a], tiles[b]) for a, b in neighbours_horiz(mat))),
-            filter(both_tile, ((tiles[a], tiles[b]) for a, b in neighbours_vert(mat))),
+            [
+                (tiles[a], tiles[b])
+                for a, b in neighbours_horiz(mat)
+                if both_tile((tiles[a], tiles[b]))
+            ],
+            [
+                (tiles[a], tiles[b])
+                for a, b in neighbours_vert(mat)
+                if both_tile((tiles[a], tiles[b]))
+            ],
         )
 
     @staticmethod
@@ -119,8 +172,8 @@ class Tileset:
             tiles,
             fallback,
             init,
-            ((a, b) for a in tiles for b in tiles if a.edges[1] is b.edges[3]),
-            ((a, b) for a in tiles for b in tiles if a.edges[2] is b.edges[0]),
+            [(a, b) for a in tiles for b in tiles if a.edges[1] is b.edges[3]],
+            [(a, b) for a in tiles for b in tiles if a.edges[2] is b.edges[0]],
         )
 
     def to_wfc(self) -> wfc.Tileset:
@@ -133,42 +186,134 @@ class Tileset:
 
 
 class LevelGenerator:
-    """An adapter between the game core and the wfc algorithm"""
+    """An adapter between the game core and the wfc algorithm.
 
-    _tileset: Tileset
-    _wfc: wfc.WFC
-    level: Level
+    The level is reproducible for a seed and the same sequence of requests,
+    see `wfc.WFC`, the crates are a pure function of seed and position.
+    """
 
-    def __init__(self, tileset: Tileset) -> None:
+    _tileset: Tileset
+    seed: int
+    _wfc: wfc.WFCEngine
+    tiles: set[TilePosition]
+    """Tiles whose blocks are generated"""
+    _windows: set[tuple[TilePosition, TilePosition]]
+    """Tile ranges covered by `generate_around` before"""
+    _tile_blocks: list[NDArray[np.uint8]]
+    """The block ids of each wfc tile, indexed [y, x]"""
+    _tile_rooms: list[tuple[RoomLayout, ...]]
+    """The rooms of each wfc tile"""
+
+    def __init__(
+        self,
+        tileset: Tileset,
+        engine: wfc.WFCFactory = wfc.WFC.from_map,
+        seed: int | None = None,
+    ) -> None:
         self._tileset = tileset
+        self.seed = random.getrandbits(64) if seed is None else seed
+        logger.info(f"generating level with seed {self.seed}")
         collapsed = {Vector(0, 0): tileset.tiles.index(tileset.init) + 1}
-        self._wfc = wfc.WFC.from_map(tileset.to_wfc(), collapsed)
-        self.level = {}
-
-    def generate(self, positions: Iterable[BlockPosition]) -> LevelUpdate:
-        collapsed = self._wfc.collapse(self._tile_pos(pos) for pos in positions)
-        level_update = list[tuple[BlockPosition, "Block"]]()
-        for tile_pos, tile_idx in collapsed:
-            tile = (
-                self._tileset.fallback
-                if tile_idx == 0
-                else self._tileset.tiles[tile_idx - 1]
+        self._wfc = engine(tileset.to_wfc(), collapsed, self.seed)
+        self.tiles = set()
+        self._windows = set()
+        self._tile_blocks = [
+            np.array(
+                [[block_id(block) for block in row] for row in tile.blocks],
+                dtype=np.uint8,
             )
-            for block_pos, block in enumerate2d_vec(tile.blocks):
-                pos = tile_pos * self._tileset.blocks_per_tile + block_pos.mirror()
-                if (
-                    block == floor_room
-                    and perlin_noise_spot(
-                        pos + PerlinNoiseConstants.offset,
-                        PerlinNoiseConstants.gridsize,
-                        PerlinNoiseConstants.num_octaves,
-                    )
-                    > PerlinNoiseConstants.threshold
-                ):
-                    block = crate
-                self.level[pos] = block
-                level_update.append((pos, block))
-        return level_update
+            for tile in [tileset.fallback, *tileset.tiles]
+        ]
+        self._tile_rooms = [tile.rooms for tile in [tileset.fallback, *tileset.tiles]]
+
+    @property
+    def blocks_per_tile(self) -> int:
+        return self._tileset.blocks_per_tile
+
+    def generate(self, positions: Iterable[BlockPosition]) -> list[Chunk]:
+        return self._generate_tiles(self._tile_pos(pos) for pos in positions)
+
+    def generate_around(self, centers: Iterable[Position], apothem: int) -> list[Chunk]:
+        """Generate the blocks within apothem around the centers.
+
+        Each window is reduced to the range of tiles it covers, which is
+        generated only once. Centers moving within generated tiles are cheap.
+        """
+        windows = {self._window(center, apothem) for center in centers}
+        windows -= self._windows
+        if len(windows) == 0:
+            return []
+        self._windows |= windows
+        tiles = (
+            Vector(x, y)
+            for top_left, bottom_right in windows
+            for x in range(top_left.x, bottom_right.x + 1)
+            for y in range(top_left.y, bottom_right.y + 1)
+        )
+        return self._generate_tiles(tiles)
+
+    def settle(self, centers: Iterable[Position]) -> None:
+        """Free the generation state away from the centers.
+
+        Forgets the windows of other centers, their tiles are known to the
+        engine anyway, and lets the engine free its settled regions.
+        """
+        here = {self._window(center, 0) for center in centers}
+        self._windows = {
+            window
+            for window in self._windows
+            if any(self._overlaps(window, tile) for tile in here)
+        }
+        self._wfc.settle(tile for tile, _ in here)
+
+    @staticmethod
+    def _overlaps(
+        a: tuple[TilePosition, TilePosition], b: tuple[TilePosition, TilePosition]
+    ) -> bool:
+        return (
+            a[0].x <= b[1].x
+            and b[0].x <= a[1].x
+            and a[0].y <= b[1].y
+            and b[0].y <= a[1].y
+        )
+
+    def _generate_tiles(self, tiles: Iterable[TilePosition]) -> list[Chunk]:
+        collapsed = self._wfc.collapse(tiles)
+        size = self._tileset.blocks_per_tile
+        # the noise of all tiles at once, a crate is where it exceeds the threshold
+        noise = perlin_noise_tiles(
+            [
+                tile_pos * size + PerlinNoiseConstants.offset
+                for tile_pos, _ in collapsed
+            ],
+            size,
+            PerlinNoiseConstants.gridsize,
+            PerlinNoiseConstants.num_octaves,
+            self.seed,
+        )
+        chunks = list[Chunk]()
+        for (tile_pos, tile_idx), tile_noise in zip(collapsed, noise):
+            blocks = self._tile_blocks[tile_idx]
+            crates = (blocks == FLOOR_ROOM) & (
+                tile_noise > PerlinNoiseConstants.threshold
+            )
+            blocks = np.where(crates, CRATE, blocks).astype(np.uint8)
+            rooms = self._tile_rooms[tile_idx]
+            if len(rooms) > 0:
+                # crates are no floors of their room
+                placed = {Vector(int(x), int(y)) for y, x in zip(*np.nonzero(crates))}
+                origin = Vector(int(tile_pos.x), int(tile_pos.y)) * size
+                rooms = tuple(room.translate(origin, placed) for room in rooms)
+            chunks.append(Chunk(tile_pos, size, blocks.tobytes(), rooms))
+            self.tiles.add(tile_pos)
+        return chunks
 
     def _tile_pos(self, block_pos: BlockPosition) -> wfc.TilePosition:
         return block_pos // self._tileset.blocks_per_tile
+
+    def _window(
+        self, center: Position, apothem: int
+    ) -> tuple[TilePosition, TilePosition]:
+        top_left = self._tile_pos((center - apothem).round())
+        bottom_right = self._tile_pos((center + apothem).round())
+        return top_left, bottom_right
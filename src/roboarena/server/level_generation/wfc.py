@@ -1,13 +1,15 @@
 import logging
 import math
-import random
+import sys
 import traceback
-from collections import defaultdict, deque
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter, deque
 from dataclasses import dataclass
 from enum import Enum
-from functools import cache
+from heapq import heapify, heappop, heappush
 from math import ceil, sqrt
-from typing import Iterable, Sequence
+from typing import Callable, Iterable, Sequence
 
 from attr import define, field
 
@@ -16,7 +18,6 @@ from roboarena.shared.types import (
     PossibleTiles,
     Tile,
     TilePosition,
-    Ts,
     WFCMap,
     WFCUpdate,
 )
@@ -24,6 +25,7 @@ from roboarena.shared.util import (
     Color,
     EventTarget,
     color,
+    hash_position,
     is_one_at,
     nonzero,
     nonzero_count,
@@ -43,10 +45,6 @@ logger = logging.getLogger(__file__)
 # stdout_handler.setLevel(logging.DEBUG)
 # logger.addHandler(stdout_handler)
 
-# seed = 24
-# np.random.seed(seed)
-# random.seed(seed)
-
 # Wave Function Collapse implementation
 
 
@@ -83,6 +81,87 @@ class Tileset:
     def __eq__(self, other: object) -> bool:
         return self is other
 
+    def compile(self) -> "CompiledTileset":
+        """Compiled once per process for the same rules, as each shard of
+        `ShardedWFC` receives a copy of the tileset"""
+        key = (self.tiles, self.rules_horiz, self.rules_vert)
+        compiled = _compiled_tilesets.get(key)
+        if compiled is None:
+            compiled = CompiledTileset.from_tileset(self)
+            _compiled_tilesets[key] = compiled
+        return compiled
+
+
+LUT_BITS = 8
+"""Bits of a possibility mask resolved by one table lookup"""
+
+
+@dataclass(frozen=True)
+class CompiledTileset:
+    """Possible neighbours of any possibility mask in a fixed number of lookups.
+
+    The mask is split into chunks of `LUT_BITS`, each chunk indexes its own
+    table holding the union of the rules of the tiles set in that chunk.
+    Memory is fixed per tileset instead of growing with the masks seen.
+    """
+
+    tileset: Tileset
+    tables: dict[Direction, list[list[PossibleTiles]]]
+    """Per direction and chunk of the mask, indexed by the chunk value"""
+
+    @staticmethod
+    def from_tileset(ts: Tileset) -> "CompiledTileset":
+        chunks = ceil(ts.tiles / LUT_BITS)
+        tables = dict[Direction, list[list[PossibleTiles]]]()
+        for dir in Direction:
+            by_tile = [_propagation_by_tile(tile, dir, ts) for tile in range(ts.tiles)]
+            tables[dir] = []
+            for chunk in range(chunks):
+                table = [0] * (1 << LUT_BITS)
+                for value in range(1, 1 << LUT_BITS):
+                    # extend the entry of the value without its highest bit
+                    high = value.bit_length() - 1
+                    tile = chunk * LUT_BITS + high
+                    rule = by_tile[tile] if tile < ts.tiles else 0
+                    table[value] = table[value ^ (1 << high)] | rule
+                tables[dir].append(table)
+        compiled = CompiledTileset(ts, tables)
+        logger.info(f"compiled tileset of {ts.tiles} tiles: {compiled.nbytes()} bytes")
+        return compiled
+
+    def possible(self, tiles: PossibleTiles, dir: Direction) -> PossibleTiles:
+        """Possible neighbours in direction for all possible tiles"""
+        prop = 0
+        for table in self.tables[dir]:
+            prop |= table[tiles & ((1 << LUT_BITS) - 1)]
+            tiles >>= LUT_BITS
+        return prop
+
+    def entries(self) -> int:
+        return sum(len(table) for tables in self.tables.values() for table in tables)
+
+    def nbytes(self) -> int:
+        """Memory held by the tables"""
+        return sum(
+            sys.getsizeof(table) + sum(sys.getsizeof(mask) for mask in table)
+            for tables in self.tables.values()
+            for table in tables
+        )
+
+
+_compiled_tilesets: dict[
+    tuple[int, frozenset[tuple[Tile, Tile]], frozenset[tuple[Tile, Tile]]],
+    CompiledTileset,
+] = {}
+"""By the rules of the tilesets, see `Tileset.compile`"""
+
+
+def _propagation_by_tile(tile: Tile, dir: Direction, ts: Tileset) -> PossibleTiles:
+    """Possible neighbours in direction for one tile"""
+    rules = ts.rules_horiz if dir.is_horizontal() else ts.rules_vert
+    index = 0 if dir.is_bottom_right() else 1
+    return nonzero_inv(rule[1 - index] for rule in rules if rule[index] == tile) | 1
+
 
 entropy = nonzero_count
 
@@ -110,47 +189,176 @@ def print_trace() -> None:
         traceback.print_exc()
 
 
+type _Entry = tuple[int, int, int, TilePosition]
+"""Priority of the position, its x and y, the position"""
+
+
 @define
 class MinEntropyStore:
-    _entropies: dict[int, set[TilePosition]] = field(factory=lambda: defaultdict(set))
+    _buckets: list[list[_Entry]] = field(factory=list)
     """
-    Invariant: Untion of all values is subset of not_collapsed
+    Positions by entropy, each bucket a heap by the priority of the positions.
+    Invariant: Union of all buckets is subset of not_collapsed
 
     Positions are added initially and updated when changed by propagation.
     Positions are removed when they are collapsed.
     Used for speeding up the computations of wfc
+
+    Entries of positions updated or removed since stay in their bucket until
+    popped or compacted, they are stale if the entropy of the position differs.
     """
+    _entropies: dict[TilePosition, int] = field(factory=dict)
+    _sizes: list[int] = field(factory=list)
+    """Positions per bucket, without the stale entries"""
+    _min: int = 0
+    """No bucket below is occupied"""
+    seed: int = 0
+    """Breaks ties between the positions of lowest entropy by position, so the
+    order does not depend on the order the positions were added in"""
 
     def add(self, position: TilePosition, entropy: int) -> None:
-        self._entropies[entropy].add(position)
+        while len(self._buckets) <= entropy:
+            self._buckets.append([])
+            self._sizes.append(0)
+        priority = hash_position(self.seed, position)
+        heappush(self._buckets[entropy], (priority, position.x, position.y, position))
+        self._entropies[position] = entropy
+        self._sizes[entropy] += 1
+        self._min = min(self._min, entropy)
 
     def update(self, position: TilePosition, old_entropy: int, new_entropy: int):
-        self._entropies[old_entropy].remove(position)
-        self._entropies[new_entropy].add(position)
+        if self._entropies.get(position) != old_entropy:
+            raise KeyError(position)
+        self.discard(position)
+        self.add(position, new_entropy)
+
+    def discard(self, position: TilePosition) -> None:
+        entropy = self._entropies.pop(position, None)
+        if entropy is None:
+            return
+        self._sizes[entropy] -= 1
+        bucket = self._buckets[entropy]
+        # compact, so stale entries are at most half of the entries
+        if len(bucket) > 2 * self._sizes[entropy] + 16:
+            live = {e for e in bucket if self._entropies.get(e[3]) == entropy}
+            bucket[:] = live
+            heapify(bucket)
 
     def pop_min(self) -> TilePosition:
-        for _, ps in sorted(self._entropies.items(), key=lambda _: _[0]):
-            if len(ps) == 0:
-                continue
-            selected = random.choice(tuple(ps))
-            ps.remove(selected)
-            return selected
+        """Remove and return the position of the lowest entropy and priority"""
+        # there are as many buckets as tiles, few compared to positions
+        while self._min < len(self._buckets):
+            bucket = self._buckets[self._min]
+            while len(bucket) > 0:
+                position = heappop(bucket)[3]
+                if self._entropies.get(position) == self._min:
+                    del self._entropies[position]
+                    self._sizes[self._min] -= 1
+                    return position
+            self._min += 1
         raise Exception("Cannot pop from Empty store.")
 
-    def _all_positions(self) -> set[TilePosition]:
-        all: set[TilePosition] = set()
-        for ps in self._entropies.values():
-            assert all.intersection(ps) == set()
-            all = all.union(ps)
-        return all
-
     def __contains__(self, position: TilePosition) -> bool:
-        return position in self._all_positions()
+        return position in self._entropies
+
+
+class WFCEngine(ABC):
+    """An implementation of the wave function collapse, see `WFC`"""
+
+    @abstractmethod
+    def collapse(self, positions: Iterable[TilePosition]) -> WFCUpdate:
+        """Guarantee positions to be collapsed and return newly collapsed"""
+
+    @abstractmethod
+    def settle(self, active: Iterable[TilePosition]) -> None:
+        """Free the state no longer needed away from the active positions"""
+
+
+type WFCFactory = Callable[[Tileset, dict[TilePosition, Tile], int], WFCEngine]
+"""Creates an engine where tiles are placed according to the map, seeded"""
+
+
+def alloc_apothem(ts: Tileset) -> int:
+    """Positions around requested ones added to the map before collapsing,
+    so contradictions at the border rarely reach them"""
+    return ceil(4 * math.log(ts.tiles, 2))  # works empirically
+
+
+def select_possible(seed: int, pos: TilePosition, possible: PossibleTiles) -> Tile:
+    """A possible tile drawn by the position, the fallback tile if none is"""
+    if possible == 0:
+        return 0
+    options = nonzero(possible)
+    return options[hash_position(seed, pos) % len(options)]
+
+
+@define
+class WFCStats:
+    """Counters over all `collapse` calls of an engine"""
+
+    collapses: int = 0
+    """Tiles selected, including the ones undone"""
+    contradictions: int = 0
+    """Selections which left a position without possible tiles"""
+    backtracks: int = 0
+    """Selections undone"""
+    max_depth: int = 0
+    """Most selections undone for one contradiction"""
+    fallbacks: int = 0
+    """Fallback tiles placed, as nothing else was possible"""
+
+    @property
+    def contradiction_rate(self) -> float:
+        return self.contradictions / max(1, self.collapses)
+
+    def merge(self, other: "WFCStats") -> None:
+        """Add the counters of another engine, e.g. of a shard"""
+        self.collapses += other.collapses
+        self.contradictions += other.contradictions
+        self.backtracks += other.backtracks
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.fallbacks += other.fallbacks
+
+
+@dataclass
+class _Decision:
+    position: TilePosition
+    tile: Tile
+    possible: PossibleTiles
+    """Possible tiles at the position before the decision"""
+    trail: list[tuple[TilePosition, PossibleTiles]]
+    """Positions changed by the propagation and their previous possible tiles"""
+
+
+REGION_SIZE = 4
+"""Edge length in tiles of the regions `WFC.settle` frees"""
+
+
+def region_positions(region: TilePosition) -> list[TilePosition]:
+    origin = region * REGION_SIZE
+    return [
+        origin + Vector(x, y) for y in range(REGION_SIZE) for x in range(REGION_SIZE)
+    ]
 
 
 @define
-class WFC:
+class WFC(WFCEngine):
+    """Wave function collapse on a dict of possibility masks.
+
+    Reproducible for a seed: the tile selected at a position is a pure
+    function of the seed, the position and its possible tiles, ties between
+    the positions of lowest entropy are broken by a hash of the seed and the
+    position. Calls collapsing positions whose maps do not overlap do not
+    affect each other, in any order.
+    """
+
     tileset: Tileset
+    seed: int = 0
+    backtrack_budget: int = 0
+    """Selections undone at most per `collapse` call on contradictions,
+    the fallback tile is placed after. 0 never backtracks"""
+    apothem: int | None = None
+    """Positions allocated around the requested ones, see `alloc_apothem`"""
     map: WFCMap = field(init=False, factory=dict)
     events: EventTarget[CollapsedOneEvent | CollapsedAllEvent | PropagatedOneEvent] = (
         field(init=False, factory=EventTarget)
@@ -161,81 +369,174 @@ class WFC:
     _not_collapsed: set[TilePosition] = field(init=False, factory=set)
     _args: set[TilePosition] = field(init=False, factory=set)
     """Positions explicitly requested as arguments to `collapse`."""
-    _entropy_store: MinEntropyStore = field(init=False, factory=MinEntropyStore)
+    _entropy_store: MinEntropyStore = field(init=False)
+    _compiled: CompiledTileset = field(init=False)
+    _region_collapsed: Counter[TilePosition] = field(init=False, factory=Counter)
+    """Collapsed positions per region not settled"""
+    _complete: set[TilePosition] = field(init=False, factory=set)
+    """Regions with all positions collapsed, not settled"""
+    _settled: dict[TilePosition, array[int]] = field(init=False, factory=dict)
+    """Tiles of the settled regions row by row, their positions left the map"""
+    stats: WFCStats = field(init=False, factory=WFCStats)
+
+    def __attrs_post_init__(self) -> None:
+        if self.apothem is None:
+            self.apothem = alloc_apothem(self.tileset)
+        self._entropy_store = MinEntropyStore(seed=self.seed)
+        self._compiled = self.tileset.compile()
 
     @staticmethod
-    def from_map(tileset: Tileset, map: dict[TilePosition, Tile]) -> "WFC":
+    def from_map(
+        tileset: Tileset,
+        map: dict[TilePosition, Tile],
+        seed: int = 0,
+        backtrack_budget: int = 0,
+        apothem: int | None = None,
+    ) -> "WFC":
         """Initializes a WFC instance where tiles are placed according to the map"""
-        wfc = WFC(tileset)
-        for p, t in map.items():
-            wfc.map[p] = one_hot(t)
-            wfc._not_collapsed.add(p)
-            wfc._entropy_store.add(p, 1)
+        wfc = WFC(tileset, seed, backtrack_budget, apothem)
+        wfc._place(map)
         return wfc
 
+    def _place(self, map: dict[TilePosition, Tile]) -> None:
+        for p, t in map.items():
+            self.map[p] = one_hot(t)
+            self._not_collapsed.add(p)
+            self._entropy_store.add(p, 1)
+
     def collapse(self, positions: Iterable[TilePosition]) -> WFCUpdate:
         """Guarantee positions to be collapsed and return newly collapsed"""
         positions = set(positions)
         positions = positions.difference(self._args)  # already handled before
+        if len(self._settled) > 0:
+            positions = {p for p in positions if not self._is_settled(p)}
         # _args contain the positions that were already passed as arguments
-        self._args = self._args.union(positions)
+        self._args |= positions
 
         # calculate the values that need to be placed on map expansions
         init_possible = ones_except(self.tileset.tiles, 0)
         init_entropy = entropy(init_possible)
 
         # Initialization of new positions into the map
-        alloc_apothem = ceil(4 * math.log(self.tileset.tiles, 2))  # works empirically
+        assert self.apothem is not None
+        allocated = set[TilePosition]()
         for pos in positions:
-            for sur in gen_square_space_wfc_fast(pos, alloc_apothem):
-                if sur in self.map:
+            for sur in gen_square_space_wfc_fast(pos, self.apothem):
+                if sur in self.map or self._is_settled(sur):
                     continue
                 self.map[sur] = init_possible
                 self._not_collapsed.add(sur)
                 self._entropy_store.add(sur, init_entropy)
+                allocated.add(sur)
+        # constrain them by the tiles collapsed next to them before,
+        # except the fallback tile, which does not constrain
+        for pos in {
+            sur + dir.value for sur in allocated for dir in Direction
+        } - allocated:
+            if pos in self._collapsed and self.map[pos] > 1:
+                self._propagate(pos)
 
         # Collapse
         map_update: WFCUpdate = list()
+        requested = positions
         positions = positions.difference(self._collapsed)
+        budget = self.backtrack_budget
+        # recent decisions of this call, the ones that can be undone
+        decisions = deque[_Decision](maxlen=budget)
         while len(positions) > 0:
             # select tile with lowest entropy
             pos = self._entropy_store.pop_min()
+            possible = self.map[pos]
             # select random tiletype from the possible tiletypes
-            selected = self._select_possible(self.map[pos])
+            selected = self._select_possible(pos, possible)
             # Update the map with the selected tile
             self.map[pos] = one_hot(selected)
+            self.stats.collapses += 1
+            self.stats.fallbacks += possible == 0
 
             # If we select the impossible tile we dont want to propagate theinformation
-            if selected != 0:
-                self._propagate(pos)
+            trail = None if budget == 0 else list[tuple[TilePosition, int]]()
+            consistent = selected == 0 or self._propagate(pos, trail)
 
             # Update all tracking variables
-            self._collapsed.add(pos)
-            self._not_collapsed.remove(pos)
+            self._mark_collapsed(pos)
             positions.discard(pos)
-            self._collapsed.add(pos)
             # Add the selection to the map update
             map_update.append((pos, selected))
 
             # DEBUG dispach a Event for testing
             self.events.dispatch(CollapsedOneEvent(pos))
+
+            if trail is not None:
+                decisions.append(_Decision(pos, selected, possible, trail))
+            if not consistent:
+                self.stats.contradictions += 1
+                if budget > 0:
+                    budget -= self._backtrack(decisions, budget, map_update)
+                    positions |= requested.intersection(self._not_collapsed)
         # DEBUG dispach a Event for testing
         self.events.dispatch(CollapsedAllEvent(list(p for p, _ in map_update)))
         return map_update
 
-    def _select_possible(self, possible: PossibleTiles) -> Tile:
-        if possible == 0:
-            return 0
-        return random.choice(nonzero(possible))
-
-    def _propagate(self, start: TilePosition) -> None:
+    def _mark_collapsed(self, pos: TilePosition) -> None:
+        self._collapsed.add(pos)
+        self._not_collapsed.remove(pos)
+        region = pos // REGION_SIZE
+        self._region_collapsed[region] += 1
+        if self._region_collapsed[region] == REGION_SIZE**2:
+            self._complete.add(region)
+
+    def _backtrack(
+        self, decisions: deque[_Decision], budget: int, map_update: WFCUpdate
+    ) -> int:
+        """Undo the last decision and exclude its tile. While that leaves no
+        tile possible, undo the decision before too. Returns the undone."""
+        depth = 0
+        while len(decisions) > 0 and depth < budget:
+            decision = decisions.pop()
+            pos = decision.position
+            for changed, old in reversed(decision.trail):
+                self._set_possible(changed, old)
+            self._collapsed.remove(pos)
+            self._not_collapsed.add(pos)
+            self._region_collapsed[pos // REGION_SIZE] -= 1
+            self._complete.discard(pos // REGION_SIZE)
+            # the decisions are the last ones of this call
+            map_update.pop()
+            depth += 1
+            remaining = decision.possible & ~one_hot(decision.tile)
+            if remaining != 0:
+                self._set_possible(pos, remaining)
+                break
+            # the tile is only excluded given the decisions before, undone next
+            self._set_possible(pos, decision.possible)
+        self.stats.backtracks += depth
+        self.stats.max_depth = max(self.stats.max_depth, depth)
+        return depth
+
+    def _set_possible(self, pos: TilePosition, possible: PossibleTiles) -> None:
+        self._entropy_store.discard(pos)
+        self.map[pos] = possible
+        self._entropy_store.add(pos, entropy(possible))
+
+    def _select_possible(self, pos: TilePosition, possible: PossibleTiles) -> Tile:
+        return select_possible(self.seed, pos, possible)
+
+    def _propagate(
+        self,
+        start: TilePosition,
+        trail: list[tuple[TilePosition, PossibleTiles]] | None = None,
+    ) -> bool:
         """Propagates the update of one position(tile selection)
         to all tiles until no more updates occur
         Args:
             start (TilePosition): The position that was changed in the map
+            trail: Records the changed positions with their previous possible
+                tiles, propagation stops at the first contradiction if given
 
+        Returns whether no position was left without possible tiles.
         """
-        ts = self.tileset
+        consistent = True
         queue = deque([start])
         while len(queue) > 0:
             pos = queue.popleft()
@@ -244,42 +545,73 @@ class WFC:
             # Update the constraints of all neighbours
             for dir in Direction:
                 neigh = pos + dir.value
-                if neigh not in self.map:
+                # Collapsed positions keep their tile
+                if neigh not in self._not_collapsed:
                     continue
                 old = self.map[neigh]
                 # Use Binary and to remove all possiblities,
                 # that are not in the neighbour and implied constraints.
-                self.map[neigh] &= self._propagation_by_poss(self.map[pos], dir, ts)
+                self.map[neigh] &= self._compiled.possible(self.map[pos], dir)
                 new = self.map[neigh]
                 # If the map for the neighbor wasnt changed the neighbour cannot
                 # propagate any new information to its neighbors
                 if old != new:
-                    if neigh not in self._not_collapsed:
-                        continue
                     self._entropy_store.update(neigh, entropy(old), entropy(new))
                     queue.append(neigh)
+                    if trail is not None:
+                        trail.append((neigh, old))
+                    if new == 0:
+                        consistent = False
+                        if trail is not None:
+                            return consistent
 
             # DEBUG dispach a Event for testing
             self.events.dispatch(PropagatedOneEvent(pos))
+        return consistent
 
-    @staticmethod
-    @cache
-    def _propagation_by_poss(
-        tiles: PossibleTiles, dir: Direction, ts: Ts
-    ) -> PossibleTiles:
-        """_propagate helper. Get possible neighbours for all possible tiles"""
-        prop = 0
-        for tile in nonzero(tiles):
-            prop |= WFC._propagation_by_tile(tile, dir, ts)
-        return prop
+    def settle(self, active: Iterable[TilePosition]) -> None:
+        """Move the complete regions, whose neighbouring regions are complete too,
+        out of the map, except the regions around the active positions.
 
-    @staticmethod
-    @cache
-    def _propagation_by_tile(tile: Tile, dir: Direction, ts: Ts) -> PossibleTiles:
-        """_propagate helper. Get possible neighbours for one tile"""
-        rules = ts.rules_horiz if dir.is_horizontal() else ts.rules_vert
-        index = 0 if dir.is_bottom_right() else 1
-        return nonzero_inv(rule[1 - index] for rule in rules if rule[index] == tile) | 1
+        No propagation reaches such a region again, so only its tiles are kept.
+        """
+        near = {
+            pos // REGION_SIZE + Vector(x, y)
+            for pos in active
+            for x in range(-1, 2)
+            for y in range(-1, 2)
+        }
+        settled = [
+            region
+            for region in self._complete - near
+            if all(
+                region + dir.value in self._complete
+                or region + dir.value in self._settled
+                for dir in Direction
+            )
+        ]
+        for region in settled:
+            tiles = array("H")
+            for pos in region_positions(region):
+                tiles.append(self.map.pop(pos).bit_length() - 1)
+                self._collapsed.remove(pos)
+                self._args.discard(pos)
+            self._settled[region] = tiles
+            self._complete.remove(region)
+            del self._region_collapsed[region]
+
+    def tile(self, pos: TilePosition) -> Tile | None:
+        """The tile collapsed at the position, None if not collapsed yet"""
+        region = pos // REGION_SIZE
+        if region in self._settled:
+            offset = pos - region * REGION_SIZE
+            return self._settled[region][offset.y * REGION_SIZE + offset.x]
+        if pos not in self._collapsed:
+            return None
+        return self.map[pos].bit_length() - 1
+
+    def _is_settled(self, pos: TilePosition) -> bool:
+        return len(self._settled) > 0 and pos // REGION_SIZE in self._settled
 
 
 def print_wfc(
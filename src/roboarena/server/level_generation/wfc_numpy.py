@@ -0,0 +1,233 @@
+from collections.abc import Iterable
+
+import numpy as np
+from numpy.typing import NDArray
+
+from roboarena.server.level_generation.wfc import (
+    LUT_BITS,
+    Direction,
+    MinEntropyStore,
+    Tileset,
+    WFCEngine,
+    alloc_apothem,
+    select_possible,
+)
+from roboarena.shared.types import Tile, TilePosition, WFCUpdate
+from roboarena.shared.util import ones_except
+from roboarena.shared.utils.vector import Vector
+
+type Masks = NDArray[np.uint64]
+type Indices = NDArray[np.intp]
+
+MAX_TILES = 64
+"""Possibilities are stored as one uint64 per position"""
+MIN_GROWTH = 16
+"""Positions the array grows at least by on each side it grows on"""
+
+
+class NumpyWFC(WFCEngine):
+    """Wave function collapse on a dense array of possibility masks.
+
+    Same algorithm and contract as `WFC`, but the map is one array over the
+    bounding box of the allocated positions, grown on demand. Propagation
+    handles one wavefront of changed positions at a time, vectorized over the
+    positions and the per-direction compatibility tables.
+
+    Does not backtrack, contradictions place the fallback tile as `WFC` with
+    a `backtrack_budget` of 0. Settling keeps all state.
+    """
+
+    tileset: Tileset
+    seed: int
+    apothem: int
+    """Positions allocated around the requested ones, see `alloc_apothem`"""
+    _lut: Masks
+    """`CompiledTileset.tables`, indexed by direction, chunk and chunk value"""
+    _init_possible: np.uint64
+    _origin: Vector[int]
+    """Tile position of index [0, 0], arrays are indexed by [y, x]"""
+    _masks: Masks
+    _allocated: NDArray[np.bool_]
+    _collapsed: NDArray[np.bool_]
+    _args: set[TilePosition]
+    """Positions explicitly requested as arguments to `collapse`."""
+    _entropy_store: MinEntropyStore
+
+    def __init__(
+        self,
+        tileset: Tileset,
+        seed: int = 0,
+        backtrack_budget: int = 0,
+        apothem: int | None = None,
+    ) -> None:
+        if tileset.tiles > MAX_TILES:
+            raise ValueError(f"at most {MAX_TILES} tiles, got {tileset.tiles}")
+        if backtrack_budget != 0:
+            raise ValueError("NumpyWFC does not backtrack, use WFC")
+        self.tileset = tileset
+        self.seed = seed
+        self.apothem = alloc_apothem(tileset) if apothem is None else apothem
+        tables = tileset.compile().tables
+        self._lut = np.array([tables[dir] for dir in Direction], dtype=np.uint64)
+        self._init_possible = np.uint64(ones_except(tileset.tiles, 0))
+        self._origin = Vector(0, 0)
+        self._masks = np.zeros((0, 0), dtype=np.uint64)
+        self._allocated = np.zeros((0, 0), dtype=np.bool_)
+        self._collapsed = np.zeros((0, 0), dtype=np.bool_)
+        self._args = set()
+        self._entropy_store = MinEntropyStore(seed=seed)
+
+    @staticmethod
+    def from_map(
+        tileset: Tileset,
+        map: dict[TilePosition, Tile],
+        seed: int = 0,
+        backtrack_budget: int = 0,
+        apothem: int | None = None,
+    ) -> "NumpyWFC":
+        """Initializes an instance where tiles are placed according to the map"""
+        wfc = NumpyWFC(tileset, seed, backtrack_budget, apothem)
+        for p, t in map.items():
+            wfc._grow(p, p)
+            y, x = wfc._index(p)
+            wfc._masks[y, x] = 1 << t
+            wfc._allocated[y, x] = True
+            wfc._entropy_store.add(p, 1)
+        return wfc
+
+    def collapse(self, positions: Iterable[TilePosition]) -> WFCUpdate:
+        """Guarantee positions to be collapsed and return newly collapsed"""
+        positions = set(positions) - self._args
+        self._args |= positions
+
+        for pos in positions:
+            self._allocate(pos - self.apothem, pos + self.apothem)
+
+        pending = {pos for pos in positions if not self._collapsed[self._index(pos)]}
+        map_update = list[tuple[TilePosition, int]]()
+        while len(pending) > 0:
+            pos = self._entropy_store.pop_min()
+            y, x = self._index(pos)
+            selected = select_possible(self.seed, pos, int(self._masks[y, x]))
+            self._masks[y, x] = 1 << selected
+            self._collapsed[y, x] = True
+            # fallback tile 0 does not constrain its neighbours
+            if selected != 0:
+                self._propagate(y, x)
+            pending.discard(pos)
+            map_update.append((pos, selected))
+        return map_update
+
+    def settle(self, active: Iterable[TilePosition]) -> None:
+        """Keeps all state, the arrays cover the bounding box anyway"""
+
+    def _index(self, pos: TilePosition) -> tuple[int, int]:
+        return pos.y - self._origin.y, pos.x - self._origin.x
+
+    def _allocate(self, top_left: TilePosition, bottom_right: TilePosition) -> None:
+        """Add the positions in the rect not allocated yet as unconstrained"""
+        self._grow(top_left, bottom_right)
+        y0, x0 = self._index(top_left)
+        y1, x1 = self._index(bottom_right)
+        window = np.s_[y0 : y1 + 1, x0 : x1 + 1]
+        new = ~self._allocated[window]
+        if not new.any():
+            return
+        self._masks[window][new] = self._init_possible
+        self._allocated[window] = True
+        entropy = int(self._init_possible).bit_count()
+        for y, x in zip(*np.nonzero(new)):
+            pos = Vector(x0 + int(x), y0 + int(y)) + self._origin
+            self._entropy_store.add(pos, entropy)
+
+        # constrain them by the tiles collapsed next to them before,
+        # except the fallback tile, which does not constrain
+        h, w = self._masks.shape
+        top, left = max(y0 - 1, 0), max(x0 - 1, 0)
+        around = np.s_[top : min(y1 + 2, h), left : min(x1 + 2, w)]
+        fresh = np.zeros(self._masks[around].shape, dtype=np.bool_)
+        fresh[y0 - top : y1 - top + 1, x0 - left : x1 - left + 1] = new
+        near = np.zeros_like(fresh)
+        near[1:] |= fresh[:-1]
+        near[:-1] |= fresh[1:]
+        near[:, 1:] |= fresh[:, :-1]
+        near[:, :-1] |= fresh[:, 1:]
+        sources = near & self._collapsed[around] & (self._masks[around] > 1)
+        for y, x in zip(*np.nonzero(sources)):
+            self._propagate(top + int(y), left + int(x))
+
+    def _grow(self, top_left: TilePosition, bottom_right: TilePosition) -> None:
+        """Resize the arrays to contain the rect"""
+        h, w = self._masks.shape
+        old_top_left = self._origin
+        old_bottom_right = self._origin + Vector(w - 1, h - 1)
+        if w > 0 and (
+            old_top_left.x <= top_left.x
+            and old_top_left.y <= top_left.y
+            and bottom_right.x <= old_bottom_right.x
+            and bottom_right.y <= old_bottom_right.y
+        ):
+            return
+        if w == 0:
+            old_top_left, old_bottom_right = top_left, bottom_right
+        # grow geometrically, so the copies amortize while exploring
+        grow = Vector(max(MIN_GROWTH, w // 2), max(MIN_GROWTH, h // 2))
+        new_top_left = Vector(
+            min(old_top_left.x, top_left.x - grow.x),
+            min(old_top_left.y, top_left.y - grow.y),
+        )
+        new_bottom_right = Vector(
+            max(old_bottom_right.x, bottom_right.x + grow.x),
+            max(old_bottom_right.y, bottom_right.y + grow.y),
+        )
+        size = new_bottom_right - new_top_left + 1
+        offset = self._origin - new_top_left
+        window = np.s_[offset.y : offset.y + h, offset.x : offset.x + w]
+
+        masks = np.zeros((size.y, size.x), dtype=np.uint64)
+        allocated = np.zeros((size.y, size.x), dtype=np.bool_)
+        collapsed = np.zeros((size.y, size.x), dtype=np.bool_)
+        masks[window] = self._masks
+        allocated[window] = self._allocated
+        collapsed[window] = self._collapsed
+        self._masks, self._allocated, self._collapsed = masks, allocated, collapsed
+        self._origin = new_top_left
+
+    def _propagate(self, y: int, x: int) -> None:
+        """Propagates the update of one position to all positions until no more
+        updates occur, one wavefront of changed positions at a time"""
+        h, w = self._masks.shape
+        masks = self._masks.reshape(-1)
+        allocated = self._allocated.reshape(-1)
+        collapsed = self._collapsed.reshape(-1)
+        front: Indices = np.array([y * w + x], dtype=np.intp)
+        while len(front) > 0:
+            sources = masks[front]
+            # nothing possible, nothing to propagate
+            front, sources = front[sources != 0], sources[sources != 0]
+            ys, xs = np.divmod(front, w)
+            possible = np.zeros((len(Direction), len(front)), dtype=np.uint64)
+            for chunk in range(self._lut.shape[1]):
+                values = sources >> np.uint64(chunk * LUT_BITS)
+                values &= np.uint64((1 << LUT_BITS) - 1)
+                possible |= self._lut[:, chunk, values.astype(np.intp)]
+
+            targets, allowed = list[Indices](), list[Masks]()
+            for d, dir in enumerate(Direction):
+                ny, nx = ys + dir.value.y, xs + dir.value.x
+                inside = (ny >= 0) & (ny < h) & (nx >= 0) & (nx < w)
+                neighbours = ny[inside] * w + nx[inside]
+                # collapsed positions keep their tile
+                pending = allocated[neighbours] & ~collapsed[neighbours]
+                targets.append(neighbours[pending])
+                allowed.append(possible[d][inside][pending])
+            target = np.concatenate(targets)
+            unique = np.unique(target)
+            old = masks[unique]
+            np.bitwise_and.at(masks, target, np.concatenate(allowed))
+            new = masks[unique]
+            changed = new != old
+            front = unique[changed]
+            for i, o, n in zip(front, old[changed], new[changed]):
+                pos = Vector(int(i) % w, int(i) // w) + self._origin
+                self._entropy_store.update(pos, int(o).bit_count(), int(n).bit_count())
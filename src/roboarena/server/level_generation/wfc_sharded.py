@@ -0,0 +1,179 @@
+from collections.abc import Iterable
+from concurrent.futures import Executor
+from dataclasses import dataclass
+
+from attr import define, field
+
+from roboarena.server.level_generation.wfc import (
+    WFC,
+    Tileset,
+    WFCFactory,
+    WFCStats,
+    entropy,
+)
+from roboarena.shared.types import Tile, TilePosition, WFCMap, WFCUpdate
+from roboarena.shared.util import one_hot
+from roboarena.shared.utils.vector import Vector
+
+
+@dataclass(frozen=True)
+class Shard:
+    """The part of the map around a group of requested positions"""
+
+    tileset: Tileset
+    seed: int
+    backtrack_budget: int
+    apothem: int
+    top_left: TilePosition
+    bottom_right: TilePosition
+    map: WFCMap
+    collapsed: set[TilePosition]
+    positions: set[TilePosition]
+    """Requested positions to collapse"""
+
+    def border(self) -> Iterable[TilePosition]:
+        left, top = self.top_left.x, self.top_left.y
+        right, bottom = self.bottom_right.x, self.bottom_right.y
+        for x in range(left, right + 1):
+            yield Vector(x, top)
+            yield Vector(x, bottom)
+        for y in range(top + 1, bottom):
+            yield Vector(left, y)
+            yield Vector(right, y)
+
+
+def collapse_shard(shard: Shard) -> tuple[WFCMap, WFCUpdate, WFCStats]:
+    """Collapse the shard on its own, returns its map, the update and stats"""
+    wfc = WFC(shard.tileset, shard.seed, shard.backtrack_budget, shard.apothem)
+    for pos, possible in shard.map.items():
+        wfc.map[pos] = possible
+        if pos in shard.collapsed:
+            wfc._collapsed.add(pos)
+        else:
+            wfc._not_collapsed.add(pos)
+            wfc._entropy_store.add(pos, entropy(possible))
+    update = wfc.collapse(shard.positions)
+    return wfc.map, update, wfc.stats
+
+
+@define
+class ShardedWFC(WFC):
+    """Collapses groups of requested positions far apart in parallel.
+
+    The requested positions are grouped such that the shards, the positions
+    allocated around each group plus a margin, do not overlap. Each shard is
+    collapsed on its own in the executor and merged back into the map. Changes
+    at the border of the shards are propagated into the map outside serially
+    afterwards, the margin itself is never allocated by a shard.
+    """
+
+    executor: Executor | None = field(default=None, kw_only=True)
+
+    @staticmethod
+    def factory(
+        executor: Executor, backtrack_budget: int = 0, apothem: int | None = None
+    ) -> WFCFactory:
+        def create(
+            tileset: Tileset, map: dict[TilePosition, Tile], seed: int
+        ) -> ShardedWFC:
+            wfc = ShardedWFC(
+                tileset, seed, backtrack_budget, apothem, executor=executor
+            )
+            wfc._place(map)
+            return wfc
+
+        return create
+
+    def collapse(self, positions: Iterable[TilePosition]) -> WFCUpdate:
+        """Guarantee positions to be collapsed and return newly collapsed"""
+        positions = set(positions) - self._args - self._collapsed
+        positions = {p for p in positions if not self._is_settled(p)}
+        assert self.apothem is not None
+        margin = self.apothem + 1
+        groups = self._groups(positions, 2 * margin)
+        if self.executor is None or len(groups) <= 1:
+            return super().collapse(positions)
+
+        self._args |= positions
+        shards = [self._shard(group, margin) for group in groups]
+        update: WFCUpdate = list()
+        for map, shard_update, stats in self.executor.map(collapse_shard, shards):
+            self._merge(map, shard_update)
+            self.stats.merge(stats)
+            update += shard_update
+        for shard in shards:
+            self._reconcile(shard)
+        return update
+
+    @staticmethod
+    def _groups(positions: set[TilePosition], size: int) -> list[set[TilePosition]]:
+        """Group positions by connected cells of size, positions in different
+        groups are further apart than size"""
+        cells = dict[TilePosition, set[TilePosition]]()
+        for pos in positions:
+            cells.setdefault(pos // size, set()).add(pos)
+        groups = list[set[TilePosition]]()
+        unvisited = set(cells)
+        while len(unvisited) > 0:
+            stack = [unvisited.pop()]
+            group = set[TilePosition]()
+            while len(stack) > 0:
+                cell = stack.pop()
+                group |= cells[cell]
+                for neighbour in (
+                    cell + Vector(x, y) for x in range(-1, 2) for y in range(-1, 2)
+                ):
+                    if neighbour in unvisited:
+                        unvisited.remove(neighbour)
+                        stack.append(neighbour)
+            groups.append(group)
+        # the order of the shards does not depend on the order of the sets
+        return sorted(groups, key=lambda g: min((p.y, p.x) for p in g))
+
+    def _shard(self, group: set[TilePosition], margin: int) -> Shard:
+        top_left = Vector(min(p.x for p in group), min(p.y for p in group)) - margin
+        bottom_right = Vector(max(p.x for p in group), max(p.y for p in group)) + margin
+        map: WFCMap = {}
+        collapsed = set[TilePosition]()
+        for y in range(top_left.y, bottom_right.y + 1):
+            for x in range(top_left.x, bottom_right.x + 1):
+                pos = Vector(x, y)
+                if pos in self.map:
+                    map[pos] = self.map[pos]
+                    if pos in self._collapsed:
+                        collapsed.add(pos)
+                elif (tile := self.tile(pos)) is not None:
+                    map[pos] = one_hot(tile)
+                    collapsed.add(pos)
+        assert self.apothem is not None
+        return Shard(
+            self.tileset,
+            self.seed,
+            self.backtrack_budget,
+            self.apothem,
+            top_left,
+            bottom_right,
+            map,
+            collapsed,
+            group,
+        )
+
+    def _merge(self, map: WFCMap, update: WFCUpdate) -> None:
+        collapsed = {pos for pos, _ in update}
+        for pos, possible in map.items():
+            if pos in self._collapsed or self._is_settled(pos):
+                continue
+            self.map[pos] = possible
+            self._not_collapsed.add(pos)
+            self._entropy_store.discard(pos)
+            if pos in collapsed:
+                self._mark_collapsed(pos)
+            else:
+                self._entropy_store.add(pos, entropy(possible))
+
+    def _reconcile(self, shard: Shard) -> None:
+        """Propagate the border of the shard into the map outside"""
+        for pos in shard.border():
+            # nothing or the fallback tile, which does not constrain
+            if self.map.get(pos, 0) > 1:
+                self._propagate(pos)
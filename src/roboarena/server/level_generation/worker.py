@@ -0,0 +1,84 @@
+import logging
+from collections.abc import Iterable
+from threading import Condition
+from typing import Optional
+
+from roboarena.server.level_generation.level_generator import LevelGenerator
+from roboarena.shared.constants import LevelGenerationConstants
+from roboarena.shared.chunk import Chunk
+from roboarena.shared.types import Position, Time
+from roboarena.shared.util import Stoppable, Stopped
+
+
+class LevelGenerationWorker(Stoppable):
+    """Generates the level in a background thread.
+
+    The worker owns the `LevelGenerator` and with it the WFC state.
+    The game loop requests the windows to generate and merges the finished
+    updates, so a burst of new tiles does not stall the tick.
+    """
+
+    _logger = logging.getLogger(f"{__name__}.LevelGenerationWorker")
+    _level_gen: LevelGenerator
+    _cond: Condition
+    _requested: list[Position]
+    """Centers of the windows to generate next, only the latest request counts"""
+    _finished: list[list[Chunk]]
+    _error: Optional[Exception]
+    _stopped: bool
+
+    def __init__(self, level_gen: LevelGenerator) -> None:
+        self._level_gen = level_gen
+        self._cond = Condition()
+        self._requested = []
+        self._finished = []
+        self._error = None
+        self._stopped = False
+
+    def request(self, centers: Iterable[Position]) -> None:
+        """Generate the windows around the centers, replaces previous requests"""
+        with self._cond:
+            self._requested = list(centers)
+            self._cond.notify_all()
+
+    def poll(self, timeout: Optional[Time] = None) -> list[list[Chunk]]:
+        """Take the finished updates, waiting up to timeout if there are none"""
+        with self._cond:
+            if timeout is not None:
+                self._cond.wait_for(
+                    lambda: len(self._finished) > 0 or self._error is not None,
+                    timeout,
+                )
+            if self._error is not None:
+                raise RuntimeError("level generation failed") from self._error
+            finished, self._finished = self._finished, []
+        return finished
+
+    def loop(self) -> Stopped:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or len(self._requested) > 0)
+                if self._stopped:
+                    return Stopped()
+                centers, self._requested = self._requested, []
+            try:
+                update = self._level_gen.generate_around(
+                    centers, LevelGenerationConstants.APOTHEM
+                )
+            except Exception as e:
+                self._logger.exception("level generation failed")
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return Stopped()
+            if len(update) == 0:
+                continue
+            self._level_gen.settle(centers)
+            with self._cond:
+                self._finished.append(update)
+                self._cond.notify_all()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
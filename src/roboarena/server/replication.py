@@ -0,0 +1,120 @@
+from collections import deque
+from collections.abc import Iterable
+
+from roboarena.shared.constants import NetworkConstants
+from roboarena.shared.replication import delta, replicated_fields
+from roboarena.shared.types import (
+    Acknoledgement,
+    EntityId,
+    EventName,
+    Quantized,
+    ServerDeleteEntityEvent,
+    ServerEntityDeltaEvent,
+    ServerEntityEvent,
+    ServerGameEventType,
+    ServerSnapshotEvent,
+    SnapshotId,
+)
+
+type FieldValues = dict[EntityId, dict[EventName, Quantized]]
+
+
+def _merge(into: FieldValues, values: FieldValues) -> None:
+    for entity, fields in values.items():
+        into.setdefault(entity, {}).update(fields)
+
+
+class Replication:
+    """Delta compression of the replicated entity fields sent to one client.
+
+    The baseline holds the field values of the last snapshot the client
+    acknowledged. Fields are sent as delta to the baseline, or omitted if
+    neither changed since nor sent differently after it. Fields without
+    baseline, and all fields while the client lags behind too far,
+    are sent as full value.
+    """
+
+    _own_entity: EntityId
+    """Always sent, as the client reconciles its prediction on each update"""
+    _last_snapshot: SnapshotId
+    _acked: SnapshotId
+    _baseline: FieldValues
+    _pending: deque[tuple[SnapshotId, FieldValues]]
+    """Values sent in snapshots not acknowledged yet, oldest first"""
+    _latest: FieldValues
+    """Values last sent, i.e. known to the client once all arrived"""
+
+    def __init__(self, own_entity: EntityId) -> None:
+        self._own_entity = own_entity
+        self._last_snapshot = NetworkConstants.INITIAL_ACKNOLEDGEMENT
+        self._acked = NetworkConstants.INITIAL_ACKNOLEDGEMENT
+        self._baseline = {}
+        self._pending = deque()
+        self._latest = {}
+
+    def on_ack(self, snapshot: SnapshotId) -> None:
+        if snapshot <= self._acked:
+            return
+        self._acked = snapshot
+        while len(self._pending) > 0 and self._pending[0][0] <= snapshot:
+            _merge(self._baseline, self._pending.popleft()[1])
+
+    def snapshot(
+        self, last_ack: Acknoledgement, events: Iterable[ServerGameEventType]
+    ) -> ServerSnapshotEvent | None:
+        """Compress the events of one update, or None if nothing is to be sent"""
+        snapshot = self._last_snapshot + 1
+        lagging = snapshot - self._acked > NetworkConstants.MAX_UNACKNOLEDGED_SNAPSHOTS
+        baseline = NetworkConstants.INITIAL_ACKNOLEDGEMENT if lagging else self._acked
+        sent: FieldValues = {}
+        compressed = list[ServerGameEventType]()
+        for event in events:
+            match event:
+                case ServerEntityEvent(entity, name, value) if (
+                    name in replicated_fields
+                ):
+                    field = replicated_fields[name]
+                    new = field.quantize(value)
+                    old = None if lagging else self._get(self._baseline, entity, name)
+                    if old is None:
+                        full = field.dequantize(new)
+                        compressed.append(ServerEntityEvent(entity, name, full))
+                    elif (
+                        new == old
+                        and entity != self._own_entity
+                        and self._get(self._latest, entity, name) == old
+                    ):
+                        continue
+                    else:
+                        diff = delta(new, old)
+                        compressed.append(ServerEntityDeltaEvent(entity, name, diff))
+                    sent.setdefault(entity, {})[name] = new
+                case ServerDeleteEntityEvent(entity):
+                    self._forget(entity)
+                    sent.pop(entity, None)
+                    compressed.append(event)
+                case _:
+                    compressed.append(event)
+        if len(compressed) == 0:
+            return None
+        self._last_snapshot = snapshot
+        self._pending.append((snapshot, sent))
+        _merge(self._latest, sent)
+        if len(self._pending) > 2 * NetworkConstants.MAX_UNACKNOLEDGED_SNAPSHOTS:
+            # bound memory while the client does not acknowledge,
+            # the dropped values can no longer be a baseline
+            for entity, fields in self._pending.popleft()[1].items():
+                for name in fields:
+                    self._baseline.get(entity, {}).pop(name, None)
+        return ServerSnapshotEvent(last_ack, snapshot, baseline, compressed)
+
+    @staticmethod
+    def _get(values: FieldValues, entity: EntityId, name: EventName):
+        fields = values.get(entity)
+        return None if fields is None else fields.get(name)
+
+    def _forget(self, entity: EntityId) -> None:
+        self._baseline.pop(entity, None)
+        self._latest.pop(entity, None)
+        for _, values in self._pending:
+            values.pop(entity, None)
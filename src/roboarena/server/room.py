@@ -16,6 +16,7 @@ from roboarena.server.level_generation.level_generator import BlockPosition
 from roboarena.shared.constants import DIFFICULTY, EnemyConstants, WeaponConstants
 from roboarena.shared.types import CloseEvent, DeathEvent, OpenEvent, Weapon
 from roboarena.shared.util import EventTarget, frame_cache_method
+from roboarena.shared.utils.rect import Rect
 from roboarena.shared.utils.vector import Vector
 
 if TYPE_CHECKING:
@@ -38,6 +39,8 @@ class Room:
     _game: "GameState"
     _floors: set[BlockPosition]
     _doors: set[BlockPosition]
+    _bounds: Rect
+    """Covers floors and doors"""
     _door_entities: list[ServerDoorEntity] = field(init=False)
     events: EventTarget[CloseEvent | OpenEvent] = field(factory=EventTarget, init=False)
 
@@ -74,6 +77,14 @@ class Room:
     def room_entities(self) -> Iterable["Entity"]:
         return [ent for ent in self._game.entities.values() if self._is_in_room(ent)]
 
+    @property
+    @frame_cache_method
+    def friendly_bullets(self) -> list[Vector[float]]:
+        """Positions of the bullets shot by players in the room"""
+        bullets = self._game.bullets
+        positions = map(bullets.position, bullets.in_area(self._bounds, True))
+        return [p for p in positions if p.floor() in self._floors]
+
     def __attrs_post_init__(self) -> None:
         self._door_entities = list(
             ServerDoorEntity(self._game, pos + 0.5, True) for pos in self._doors
@@ -160,4 +171,6 @@ class Room:
 
     @frame_cache_method
     def _is_in_room(self, entity: "Entity") -> bool:
+        if not self._bounds.overlaps(entity.collision.hitbox):
+            return False
         return self._floors.issuperset(self._game.colliding_blocks(entity).keys())
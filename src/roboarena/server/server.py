@@ -1,26 +1,38 @@
 import logging
+import multiprocessing
 from collections import deque
 from collections.abc import Collection, Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Optional
+from functools import partial
+from threading import Thread
+from typing import Callable, Optional
 from uuid import uuid4
 
 from bidict import bidict
 from pygame import Color
 from pygame.time import Clock
 
+from roboarena.server.bullets import BulletSystem
 from roboarena.server.entity import ServerPlayerRobot
 from roboarena.server.events import EventBuffer, EventName
-from roboarena.server.level_generation.level_generator import (
-    LevelGenerator,
-    LevelUpdate,
-)
+from roboarena.server.interest import Interest
+from roboarena.server.level_generation.level_generator import LevelGenerator
 from roboarena.server.level_generation.tileset import tileset
+from roboarena.server.level_generation.wfc import WFC, WFCFactory
+from roboarena.server.level_generation.wfc_sharded import ShardedWFC
+from roboarena.server.level_generation.worker import LevelGenerationWorker
+from roboarena.server.replication import Replication
 from roboarena.server.room import Room
-from roboarena.shared.block import floor_door, floor_room_spawn, room_blocks
-from roboarena.shared.constants import NetworkConstants, PlayerConstants
+from roboarena.shared.chunk import Chunk, ChunkedLevel, chunks_overlapping
+from roboarena.shared.constants import (
+    LevelGenerationConstants,
+    NetworkConstants,
+    PlayerConstants,
+)
 from roboarena.shared.custom_threading import Atom
 from roboarena.shared.game import GameState as SharedGameState
+from roboarena.shared.interest import interest_area
 from roboarena.shared.network import IpV4, Network, Receiver
 from roboarena.shared.time import get_time
 from roboarena.shared.types import (
@@ -29,41 +41,40 @@ from roboarena.shared.types import (
     ClientGameEvent,
     ClientId,
     ClientInputEvent,
+    ClientLevelRequestEvent,
     ClientLobbyReadyEvent,
+    Counter,
     Dispatch,
     EntityId,
     EventType,
     Marker,
     MarkerVect,
+    Position,
     ServerConnectionConfirmEvent,
     ServerDeleteEntityEvent,
     ServerEntityEvent,
     ServerEntityType,
     ServerGameEndEvent,
-    ServerGameEvent,
     ServerGameEventType,
     ServerGameStartEvent,
-    ServerLevelUpdateEvent,
+    ServerLevelChunkEvent,
     ServerMarkerEvent,
     ServerMarkVectEvent,
+    ServerSpawnEventType,
     StartFrameEvent,
+    TilePosition,
     Time,
 )
 from roboarena.shared.util import (
     EventTarget,
     Stoppable,
     Stopped,
+    counter,
     flatten,
     gen_id,
-    neighbours_4,
-    search_connected,
-    square_space_around,
 )
 from roboarena.shared.utils.vector import Vector
 
-if TYPE_CHECKING:
-    from roboarena.server.level_generation.level_generator import Level
-
 logger = logging.getLogger(__name__)
 
 
@@ -104,7 +115,8 @@ class LobbyState:
         ):
             if self._server.stopped.get():
                 return Stopped()
-            for t_msg, msg in self._server.receiver.receive():
+            timeout = NetworkConstants.WAIT_TIMEOUT
+            for t_msg, msg in self._server.receiver.receive_blocking(timeout=timeout):
                 self.handle(t_msg, msg)
         self._logger.debug(f"close lobby with clients {self._clients}")
         return {client_id: client.ip for client_id, client in self._clients.items()}
@@ -120,29 +132,63 @@ class GameState(SharedGameState):
         events: EventBuffer[ServerGameEventType] = field(
             default_factory=EventBuffer, init=False
         )
+        replication: Replication = field(init=False)
+        interest: Interest = field(init=False)
+
+        def __post_init__(self) -> None:
+            self.replication = Replication(self.entity_id)
+            self.interest = Interest(interest_area(self.entity.position))
 
     _logger = logging.getLogger(f"{__name__}.GameState")
     _server: "Server"
     _clients: dict[ClientId, ClientInfo]
     env = "server"
     entities: bidict[EntityId, ServerEntityType]
+    _entity_ids: Counter
+    """Ids are never reused, small ids keep the wire format compact"""
+    bullets: BulletSystem
+    """The bullets, which are not in `entities` but share their ids"""
     _rooms: list[Room]
     markers: deque[Marker]
     markers_vect: deque[MarkerVect]
     _deleted_entities: list[ServerEntityType]
     _created_entities: list[ServerEntityType]
 
-    _level_gen: LevelGenerator
+    _level: ChunkedLevel
+    """The generated level merged into the game, see `_generate_level`"""
+    _tiles: set[TilePosition]
+    _chunk_size: int
+    _level_worker: LevelGenerationWorker
+    _shard_executor: Optional[Executor]
 
     def __init__(self, server: "Server", clients: dict[ClientId, IpV4]) -> None:
         self._server = server
         self._clients = {}
         self.entities = bidict()  # type: ignore
+        self._entity_ids = counter()
+        self.bullets = BulletSystem(self, self._entity_ids)
         self._rooms = list()
 
         self._logger.debug(f"initialize with clients: {clients}")
 
-        self._level_gen = LevelGenerator(tileset)
+        self._shard_executor = None
+        budget = LevelGenerationConstants.BACKTRACK_BUDGET
+        apothem = LevelGenerationConstants.WFC_APOTHEM
+        engine: WFCFactory = partial(
+            WFC.from_map, backtrack_budget=budget, apothem=apothem
+        )
+        if LevelGenerationConstants.SHARD_WORKERS > 0:
+            self._shard_executor = ProcessPoolExecutor(
+                LevelGenerationConstants.SHARD_WORKERS,
+                multiprocessing.get_context("spawn"),
+            )
+            engine = ShardedWFC.factory(self._shard_executor, budget, apothem)
+        level_gen = LevelGenerator(tileset, engine)
+        self._chunk_size = level_gen.blocks_per_tile
+        self._level = ChunkedLevel(self._chunk_size)
+        self._tiles = set()
+        self._level_worker = LevelGenerationWorker(level_gen)
+        Thread(target=self._level_worker.loop, daemon=True).start()
         self.markers = deque(maxlen=1000)
         self.markers_vect = deque(maxlen=1000)
         self.events = EventTarget()
@@ -154,17 +200,30 @@ class GameState(SharedGameState):
             )
             self.entities[entity_id] = entity
 
+        # the clients start with the level around them, further chunks on request
+        self._created_entities = list()
+        self._generate_level()
+        for entity in self._created_entities:
+            self._create_entity(entity)
+        del self._created_entities
+
         self._logger.debug(f"initialized entities: {self.entities}")
 
-        spawn_events = [e.to_event(i) for i, e in self.entities.items()]
+        size = self._chunk_size
         for client in self._clients.values():
-            level = self._level_gen.level
-            event = ServerGameStartEvent(client.entity_id, spawn_events, dict(level))
+            client.interest.entities = self._entities_of_interest(client)
+            spawn_events = [self._spawn_event(i) for i in client.interest.entities]
+            chunks = [
+                self._level_chunk(chunk)
+                for chunk in chunks_overlapping(client.interest.area, size)
+                if chunk in self._tiles
+            ]
+            event = ServerGameStartEvent(client.entity_id, spawn_events, size, chunks)
             self._server.network.send(client.ip, event)
 
     @property
-    def level(self) -> "Level":  # type: ignore
-        return self._level_gen.level
+    def level(self) -> ChunkedLevel:  # type: ignore
+        return self._level
 
     @property
     def players(self) -> Iterable[tuple[EntityId, ServerPlayerRobot]]:
@@ -178,9 +237,10 @@ class GameState(SharedGameState):
         self._created_entities.append(entity)
 
     def _create_entity(self, entity: ServerEntityType) -> None:
-        entity_id = gen_id(self.entities.keys())
+        """Clients are notified in `_update_interest` if they are interested"""
+        entity_id = next(self._entity_ids)
         self.entities[entity_id] = entity
-        self._dispatch(None, f"create-entity/{entity_id}", entity.to_event(entity_id))
+        self.index_entity(entity)
 
     def delete_entity(self, entity: ServerEntityType) -> None:
         self._deleted_entities.append(entity)
@@ -188,28 +248,29 @@ class GameState(SharedGameState):
     def _delete_entity(self, entity: ServerEntityType) -> None:
         entity_id = self.entities.inverse[entity]
         del self.entities[entity_id]
+        self.unindex_entity(entity)
+        self._deleted(entity_id)
+
+    def _deleted(self, entity_id: EntityId) -> None:
+        """Delete the entity or bullet on the clients"""
         event = ServerDeleteEntityEvent(entity_id)
-        self._dispatch(None, f"delete-entity/{entity_id}", event)
+        self._dispatch(None, f"delete-entity/{entity_id}", event, entity_id)
+        for client in self._clients.values():
+            client.interest.entities.discard(entity_id)
 
-    def create_rooms(self, update: LevelUpdate) -> None:
-        for pos, block in update:
-            if block is not floor_room_spawn:
-                continue
-            room = search_connected(
-                pos,
-                self._level_gen.level,
-                lambda b: b if b in room_blocks else None,
-                neighbours_4,
+    def create_rooms(self, chunks: Iterable[Chunk]) -> None:
+        for room in flatten(chunk.rooms for chunk in chunks):
+            self._rooms.append(
+                Room(self, set(room.floors), set(room.doors), room.bounds)
             )
-            floors = {p for p, b in room.items() if b is not floor_door}
-            doors = {p for p, b in room.items() if b is floor_door}
-            self._rooms.append(Room(self, floors, doors))
 
     def dispatch_factory(
         self, client: Optional[ClientId], entity: EntityId
     ) -> Dispatch[object]:
         SEE = ServerEntityEvent
-        return lambda n, e: self._dispatch(client, f"{entity}/{n}", SEE(entity, n, e))
+        return lambda n, e: self._dispatch(
+            client, f"{entity}/{n}", SEE(entity, n, e), entity
+        )
 
     def dispatch(self, entity: ServerEntityType, event_name: EventName, event: object):
         """Method for entities to call directly
@@ -219,32 +280,151 @@ class GameState(SharedGameState):
         """
         entity_id = self.entities.inverse[entity]
         see = ServerEntityEvent(entity_id, event_name, event)
-        self._dispatch(None, f"{entity_id}/{event_name}", see)
+        self._dispatch(None, f"{entity_id}/{event_name}", see, entity_id)
 
     def _dispatch(
         self,
         client: Optional[ClientId],
         event_name: EventName,
         event: ServerGameEventType,
+        entity: Optional[EntityId] = None,
     ):
+        """Send an event to a client or all clients.
+
+        Events of an entity are only sent to clients interested in the entity.
+        """
         targets_ids = [client] if client is not None else self._clients.keys()
         for target_id in targets_ids:
             target = self._clients[target_id]
+            if entity is not None and entity not in target.interest.entities:
+                continue
             target.events.dispatch(event_name, event)
 
+    def _dispatch_in_area[
+        T
+    ](
+        self,
+        event_name: EventName,
+        items: Collection[T],
+        position: Callable[[T], Position],
+        event: Callable[[list[T]], ServerGameEventType],
+    ):
+        """Send each client an event of the items in its area of interest"""
+        for client_id, client in self._clients.items():
+            area = client.interest.area
+            items_in_area = [item for item in items if area.contains(position(item))]
+            if len(items_in_area) > 0:
+                self._dispatch(client_id, event_name, event(items_in_area))
+
+    def _entities_of_interest(self, client: ClientInfo) -> set[EntityId]:
+        area = client.interest.area
+        return {
+            entity_id
+            for entity_id, entity in self.entities.items()
+            if entity_id == client.entity_id or area.contains(entity.position)
+        } | set(self.bullets.in_area(area))
+
+    def _spawn_event(self, entity_id: EntityId) -> ServerSpawnEventType:
+        entity = self.entities.get(entity_id)
+        if entity is None:
+            return self.bullets.to_event(entity_id)
+        return entity.to_event(entity_id)
+
+    def _update_interest(self) -> None:
+        """Spawn and delete entities on the clients as they enter or leave their
+        areas of interest, send the requested level chunks and freeze those
+        no client visited for a while"""
+        t = get_time()
+        for client_id, client in self._clients.items():
+            interest = client.interest
+            interest.area = interest_area(client.entity.position)
+            chunks = chunks_overlapping(interest.area, self._chunk_size)
+            self._level.visit(chunks, t)
+
+            entities = self._entities_of_interest(client)
+            for entity_id in entities - interest.entities:
+                spawn = self._spawn_event(entity_id)
+                self._dispatch(client_id, f"create-entity/{entity_id}", spawn)
+            for entity_id in interest.entities - entities:
+                delete = ServerDeleteEntityEvent(entity_id)
+                self._dispatch(client_id, f"delete-entity/{entity_id}", delete)
+            interest.entities = entities
+
+            self._send_chunks(client_id, client)
+        self._level.freeze(t - LevelGenerationConstants.FREEZE_AFTER)
+
+    def _send_chunks(self, client_id: ClientId, client: ClientInfo) -> None:
+        """Send the generated of the requested chunks, nearest first"""
+        interest = client.interest
+        generated = interest.requested_chunks & self._tiles
+        if len(generated) == 0:
+            return
+        size = self._chunk_size
+        # distance to the chunk centers
+        center = client.entity.position / size - 0.5
+        nearest = sorted(generated, key=lambda chunk: center.distance_to(chunk))
+        for chunk in nearest[: NetworkConstants.MAX_CHUNKS_PER_UPDATE]:
+            interest.requested_chunks.remove(chunk)
+            event = self._level_chunk(chunk)
+            self._dispatch(client_id, f"level-chunk/{chunk}", event)
+
+    def _level_chunk(self, chunk: TilePosition) -> ServerLevelChunkEvent:
+        return ServerLevelChunkEvent(chunk, self._level.chunk_blocks(chunk))
+
+    def _generate_level(self) -> None:
+        """Request the level around and ahead of the players and merge the
+        generated updates. Only waits if a player reaches ungenerated level."""
+        lookahead = LevelGenerationConstants.LOOKAHEAD
+        self._level_worker.request(
+            flatten(
+                (position, position + velocity * lookahead)
+                for position, velocity in (
+                    c.entity.motion.get() for c in self._clients.values()
+                )
+            )
+        )
+        for chunks in self._level_worker.poll():
+            self._merge_level(chunks)
+        while not all(self._level_ready(c.entity) for c in self._clients.values()):
+            self._logger.debug("waiting for level generation")
+            timeout = NetworkConstants.WAIT_TIMEOUT
+            for chunks in self._level_worker.poll(timeout):
+                self._merge_level(chunks)
+
+    def _merge_level(self, chunks: list[Chunk]) -> None:
+        for chunk in chunks:
+            self._level.stamp(chunk)
+        positions = {chunk.position for chunk in chunks}
+        self._tiles |= positions
+        self._level.visit(positions, get_time())
+        self.create_rooms(chunks)
+
+    def _level_ready(self, entity: ServerPlayerRobot) -> bool:
+        """Whether the level is generated where the entity can move next"""
+        area = entity.collision.hitbox.expand(1)
+        return all(
+            chunk in self._tiles for chunk in chunks_overlapping(area, self._chunk_size)
+        )
+
     def handle(self, t_msg: Time, msg: EventType) -> None:
         match msg:
-            case ClientGameEvent(client_id, ack, event):
+            case ClientGameEvent(client_id, ack, event, snapshot_ack):
                 self._clients[client_id].last_ack = ack
+                self._clients[client_id].replication.on_ack(snapshot_ack)
                 match event:
                     case ClientInputEvent(input, dt):
-                        self._clients[client_id].entity.on_input(input, dt, t_msg)
+                        entity = self._clients[client_id].entity
+                        entity.on_input(input, dt, t_msg)
+                        self.index_entity(entity)
+                    case ClientLevelRequestEvent(chunks):
+                        interest = self._clients[client_id].interest
+                        interest.requested_chunks.update(chunks)
             case _:
                 self._logger.error(f"Unexpected event: {msg}")
                 raise ValueError(f"Unexpected event: {msg}")
 
     def gen_client_entity(self) -> tuple[EntityId, ServerPlayerRobot]:
-        entity_id = gen_id(self.entities.keys())
+        entity_id = next(self._entity_ids)
         entity = ServerPlayerRobot(
             self,
             PlayerConstants.START_HEALTH,
@@ -257,14 +437,26 @@ class GameState(SharedGameState):
     def mark(self, markers: Marker | Collection[Marker]):
         markers = markers if isinstance(markers, Collection) else [markers]
         self.markers += markers
-        self._dispatch(None, f"marker/{uuid4()}", ServerMarkerEvent(markers))
+        self._dispatch_in_area(
+            f"marker/{uuid4()}", markers, lambda m: m.position, ServerMarkerEvent
+        )
 
     def markvect(self, markers: MarkerVect | Collection[MarkerVect]):
         markers = markers if isinstance(markers, Collection) else [markers]
         self.markers_vect += markers
-        self._dispatch(None, f"markvect/{uuid4()}", ServerMarkVectEvent(markers))
+        self._dispatch_in_area(
+            f"markvect/{uuid4()}", markers, lambda m: m.start, ServerMarkVectEvent
+        )
 
     def loop(self) -> Stopped | Ended:
+        try:
+            return self._loop()
+        finally:
+            self._level_worker.stop()
+            if self._shard_executor is not None:
+                self._shard_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _loop(self) -> Stopped | Ended:
         last_t = get_time()
         clock = Clock()
 
@@ -283,7 +475,8 @@ class GameState(SharedGameState):
 
             self.events.dispatch(StartFrameEvent())
 
-            # Each update is split into 3 frames to get more precise results
+            # Each update is split into 3 frames to get more precise results,
+            # except for the bullets moving in one swept step per update
             for i in range(NetworkConstants.SERVER_FRAMES_PER_TIMESTEP):
                 t_frame = last_t + i * dt_frame
 
@@ -291,19 +484,18 @@ class GameState(SharedGameState):
                 self._created_entities = list()
                 self._deleted_entities = list()
 
-                # generate level
-                players = (c.entity.position for c in self._clients.values())
-                near_players = flatten(square_space_around(p, 10) for p in players)
-                level_update = self._level_gen.generate(near_players)
-                level_update_evt = ServerLevelUpdateEvent(level_update)
-                self._dispatch(None, f"level-update/{t_frame}", level_update_evt)
-                self.create_rooms(level_update)
+                self._generate_level()
+                self.index_entities()
 
                 for t_msg, msg in self._server.receiver.receive(until=t_frame):
                     self.handle(t_msg, msg)
 
                 for entity in self.entities.values():
                     entity.tick(dt_frame, t_frame)
+                    self.index_entity(entity)
+                if i == NetworkConstants.SERVER_FRAMES_PER_TIMESTEP - 1:
+                    for bullet_id in self.bullets.tick(dt_update):
+                        self._deleted(bullet_id)
 
                 for room in self._rooms:
                     room.tick()
@@ -316,11 +508,15 @@ class GameState(SharedGameState):
                 del self._created_entities
                 del self._deleted_entities
 
-            # send events to clients
+            self._update_interest()
+
+            # send events to clients, all events of this update in one message
             for client in self._clients.values():
-                for evt in client.events.collect():
-                    game_evt = ServerGameEvent(client.last_ack, evt)
-                    self._server.network.send(client.ip, game_evt)
+                events = client.events.collect()
+                snapshot = client.replication.snapshot(client.last_ack, events)
+                if snapshot is None:
+                    continue
+                self._server.network.send(client.ip, snapshot)
 
             # cleanup udpate
             last_t = t_update
@@ -357,3 +553,4 @@ class Server(Stoppable):
 
     def stop(self) -> None:
         self.stopped.set(True)
+        self.receiver.interrupt()
@@ -2,6 +2,7 @@ import logging
 from abc import ABC
 from dataclasses import dataclass
 from functools import cached_property
+from typing import Callable
 
 from pygame import Surface
 
@@ -31,6 +32,10 @@ class Block(ABC):
         """In game units"""
         return size_from_texture_width(self.texture, width=TextureSize.BLOCK_WIDTH)
 
+    def __reduce__(self) -> tuple[Callable[[int], "Block"], tuple[int]]:
+        """Pickle by id, as textures cannot be pickled and instances are unique"""
+        return (block_by_id, (block_id(self),))
+
 
 floor = Block(
     Graphics.FLOOR_1,
@@ -77,3 +82,23 @@ void = Block(
 
 room_blocks = set([floor_room, floor_room_spawn, floor_door])
 """Blocks that are part of a room structure"""
+
+all_blocks: tuple[Block, ...] = (
+    floor,
+    floor_room,
+    floor_room_spawn,
+    floor_door,
+    crate,
+    wall,
+    void,
+)
+"""All blocks. The index is used as id, e.g. when sending blocks over the network"""
+_block_ids = {block: id for id, block in enumerate(all_blocks)}
+
+
+def block_id(block: Block) -> int:
+    return _block_ids[block]
+
+
+def block_by_id(id: int) -> Block:
+    return all_blocks[id]
@@ -0,0 +1,373 @@
+"""The level is sent in chunks, one per generated tile, as arrays of block ids.
+
+Block ids are stored row by row, i.e. the block at (x, y) relative to the
+top left of the chunk has the index `y * size + x`.
+"""
+
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from functools import cache
+from math import floor, inf
+from typing import Literal
+
+from roboarena.shared.block import Block, all_blocks, block_by_id, block_id
+from roboarena.shared.types import (
+    BlockPosition,
+    Level,
+    LevelUpdate,
+    Time,
+    TilePosition,
+)
+from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.vector import Vector
+
+
+@cache
+def _offsets(size: int) -> list[tuple[int, int]]:
+    return [(x, y) for y in range(size) for x in range(size)]
+
+
+def chunk_positions(chunk: TilePosition, size: int) -> list[BlockPosition]:
+    left, top = int(chunk.x) * size, int(chunk.y) * size
+    return [Vector(left + x, top + y) for x, y in _offsets(size)]
+
+
+def encode_chunk(level: Level, chunk: TilePosition, size: int) -> bytes:
+    return bytes(block_id(level[pos]) for pos in chunk_positions(chunk, size))
+
+
+def decode_chunk(chunk: TilePosition, size: int, blocks: bytes) -> LevelUpdate:
+    if len(blocks) != size * size:
+        raise ValueError(f"chunk of {len(blocks)} blocks, expected {size * size}")
+    return zip(chunk_positions(chunk, size), map(block_by_id, blocks))
+
+
+@dataclass(frozen=True)
+class RoomLayout:
+    """The floors and doors of a room, the room blocks connected to its spawn"""
+
+    spawn: BlockPosition
+    floors: frozenset[BlockPosition]
+    doors: frozenset[BlockPosition]
+    bounds: Rect
+    """Covers all blocks of the room"""
+
+    @staticmethod
+    def from_blocks(
+        spawn: BlockPosition,
+        floors: Iterable[BlockPosition],
+        doors: Iterable[BlockPosition],
+    ) -> "RoomLayout":
+        floors, doors = frozenset(floors), frozenset(doors)
+        xs = [p.x for p in floors | doors]
+        ys = [p.y for p in floors | doors]
+        top_left = Vector(min(xs), min(ys))
+        size = Vector(max(xs), max(ys)) + 1 - top_left
+        return RoomLayout(
+            spawn, floors, doors, Rect(top_left.to_float(), size.to_float())
+        )
+
+    def translate(
+        self, offset: Vector[int], excluded: Collection[BlockPosition] = ()
+    ) -> "RoomLayout":
+        """The layout moved by offset, without the excluded floors and the
+        blocks they disconnect from the spawn"""
+        floors, doors = self.floors, self.doors
+        if any(p in floors for p in excluded):
+            connected = self._connected(floors - frozenset(excluded) | doors)
+            floors = frozenset(p for p in floors if (p.x, p.y) in connected)
+            doors = frozenset(p for p in doors if (p.x, p.y) in connected)
+        x, y = offset.x, offset.y
+        return RoomLayout(
+            self.spawn + offset,
+            frozenset(Vector(p.x + x, p.y + y) for p in floors),
+            frozenset(Vector(p.x + x, p.y + y) for p in doors),
+            self.bounds.tramslate(offset.to_float()),
+        )
+
+    def _connected(self, blocks: Iterable[BlockPosition]) -> set[tuple[int, int]]:
+        """The blocks connected to the spawn, as tuples as this runs per room"""
+        unvisited = {(p.x, p.y) for p in blocks}
+        stack = [(self.spawn.x, self.spawn.y)]
+        connected = set[tuple[int, int]]()
+        while len(stack) > 0:
+            x, y = stack.pop()
+            if (x, y) not in unvisited:
+                continue
+            unvisited.remove((x, y))
+            connected.add((x, y))
+            stack += [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+        return connected
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """The blocks of one chunk as block ids, a `LevelUpdate` of its blocks"""
+
+    position: TilePosition
+    size: int
+    blocks: bytes
+    rooms: tuple[RoomLayout, ...] = ()
+    """The rooms within the chunk, only known where it is generated"""
+
+    def __post_init__(self) -> None:
+        if len(self.blocks) != self.size * self.size:
+            raise ValueError(
+                f"chunk of {len(self.blocks)} blocks, expected {self.size**2}"
+            )
+
+    def __iter__(self) -> Iterator[tuple[BlockPosition, Block]]:
+        return iter(decode_chunk(self.position, self.size, self.blocks))
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+
+def _occupancy_table(blocks: Callable[[Block], bool]) -> bytes:
+    """Translates block ids to the ASCII digit of whether the block blocks"""
+    return bytes(
+        ord("1") if id < len(all_blocks) and blocks(all_blocks[id]) else ord("0")
+        for id in range(256)
+    )
+
+
+_ROBOT_TABLE = _occupancy_table(lambda b: b.blocks_robot)
+_BULLET_TABLE = _occupancy_table(lambda b: b.blocks_bullet)
+
+type Occupancy = tuple[int, int]
+"""Bitmaps of the blocks blocking robots and bullets in a chunk, the bit
+of a block is its index in the chunk"""
+
+
+def occupancy(blocks: bytes) -> Occupancy:
+    # the first block is the last digit, i.e. the lowest bit
+    return (
+        int(blocks.translate(_ROBOT_TABLE)[::-1], 2),
+        int(blocks.translate(_BULLET_TABLE)[::-1], 2),
+    )
+
+
+def _entering(lo: float, hi: float, lead: int, d: float) -> float:
+    """Fraction of the motion d after which the edges lo, hi moving along it
+    enter the block after lead, the last block the leading edge entered"""
+    if d > 0:
+        return (lead + 1 - hi) / d
+    if d < 0:
+        return (lead - lo) / d
+    return inf
+
+
+def _span(lo: float, hi: float, offset: float, lead: int, d: float) -> tuple[int, int]:
+    """The blocks spanned by the edges lo, hi moved by offset"""
+    if d > 0:
+        return floor(lo + offset), lead
+    if d < 0:
+        return lead, floor(hi + offset)
+    return floor(lo), floor(hi)
+
+
+def chunks_overlapping(area: Rect, size: int) -> Iterable[TilePosition]:
+    left, top = floor(area.left / size), floor(area.top / size)
+    right, bottom = floor(area.right / size), floor(area.bottom / size)
+    return (
+        Vector(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)
+    )
+
+
+class ChunkedLevel(dict[BlockPosition, Block]):
+    """A level which freezes the chunks not visited for a while into block ids.
+
+    Frozen chunks leave the dict and are restored transparently when one of
+    their blocks is read, by index, `get` or `in`. Iteration and `len` only
+    cover the chunks not frozen. Only complete chunks are frozen.
+
+    Which blocks block robots and bullets is kept as bitmaps per chunk, see
+    `blocked`, also for frozen chunks.
+    """
+
+    _size: int
+    _frozen: dict[TilePosition, bytes]
+    _occupancy: dict[tuple[int, int], Occupancy]
+    """By chunk, dropped when a block of the chunk is set"""
+    _visited: dict[TilePosition, Time]
+    """Last visit of the chunks not frozen"""
+    _now: Time
+    """Time of the latest visit, restored chunks count as visited then"""
+
+    def __init__(self, size: int) -> None:
+        super().__init__()
+        self._size = size
+        self._frozen = {}
+        self._occupancy = {}
+        self._visited = {}
+        self._now = 0
+
+    @property
+    def size(self) -> int:
+        """Edge length of the chunks"""
+        return self._size
+
+    def __missing__(self, pos: BlockPosition) -> Block:
+        if not self._restore(pos // self._size):
+            raise KeyError(pos)
+        return dict.__getitem__(self, pos)
+
+    def __contains__(self, pos: object) -> bool:
+        return dict.__contains__(self, pos) or (
+            isinstance(pos, Vector) and self._restore(pos // self._size)
+        )
+
+    def __setitem__(self, pos: BlockPosition, block: Block) -> None:
+        super().__setitem__(pos, block)
+        self._occupancy.pop((pos.x // self._size, pos.y // self._size), None)
+
+    def update(  # type: ignore
+        self,
+        blocks: Mapping[BlockPosition, Block] | LevelUpdate = (),
+        /,
+    ) -> None:
+        items = blocks.items() if isinstance(blocks, Mapping) else blocks
+        for pos, block in items:
+            self[pos] = block
+
+    def __ior__(self, blocks: Mapping[BlockPosition, Block] | LevelUpdate):  # type: ignore
+        self.update(blocks)
+        return self
+
+    def get(self, pos: BlockPosition, default: Block | None = None):  # type: ignore
+        try:
+            return self[pos]
+        except KeyError:
+            return default
+
+    def visit(self, chunks: Iterable[TilePosition], t: Time) -> None:
+        self._now = max(self._now, t)
+        for chunk in chunks:
+            self._visited[chunk] = t
+
+    def stamp(self, chunk: Chunk) -> None:
+        """Add the blocks of the chunk at once"""
+        positions = chunk_positions(chunk.position, chunk.size)
+        dict.update(self, zip(positions, map(all_blocks.__getitem__, chunk.blocks)))
+        self._occupancy[(chunk.position.x, chunk.position.y)] = occupancy(chunk.blocks)
+
+    def blocked(self, area: Rect, mode: Literal["robot"] | Literal["bullet"]) -> bool:
+        """Whether a block overlapping the area blocks robots/bullets.
+
+        Raises KeyError if one of the blocks is not in the level.
+        """
+        # not the cached properties of the rect, it is usually new
+        top_left, width_height = area.top_left, area.width_height
+        return self.blocked_cells(
+            floor(top_left.x),
+            floor(top_left.y),
+            floor(top_left.x + width_height.x),
+            floor(top_left.y + width_height.y),
+            mode,
+        )
+
+    def blocked_cells(
+        self,
+        left: int,
+        top: int,
+        right: int,
+        bottom: int,
+        mode: Literal["robot"] | Literal["bullet"],
+    ) -> bool:
+        """`blocked` for the blocks from left, top to right, bottom inclusive"""
+        size = self._size
+        index = 0 if mode == "robot" else 1
+        for chunk_y in range(top // size, bottom // size + 1):
+            y0 = chunk_y * size
+            first_row = max(top - y0, 0)
+            last_row = min(bottom - y0, size - 1)
+            for chunk_x in range(left // size, right // size + 1):
+                x0 = chunk_x * size
+                first, last = max(left - x0, 0), min(right - x0, size - 1)
+                row = ((1 << (last - first + 1)) - 1) << first
+                bitmap = self._occupancy.get((chunk_x, chunk_y))
+                if bitmap is None:
+                    bitmap = self.chunk_occupancy(chunk_x, chunk_y)
+                rows = bitmap[index] >> (first_row * size)
+                for _ in range(last_row - first_row + 1):
+                    if rows & row:
+                        return True
+                    rows >>= size
+        return False
+
+    def sweep(
+        self,
+        area: Rect,
+        motion: Vector[float],
+        mode: Literal["robot"] | Literal["bullet"],
+    ) -> float | None:
+        """Fraction of the motion at which the area moving along it first
+        overlaps a block blocking robots/bullets, None if it does not.
+
+        Walks the columns and rows of blocks the edges of the area enter in
+        order (DDA), so only the blocks newly overlapped are checked.
+        """
+        left, top = floor(area.left), floor(area.top)
+        right, bottom = floor(area.right), floor(area.bottom)
+        if self.blocked_cells(left, top, right, bottom, mode):
+            return 0.0
+        dx, dy = motion.x, motion.y
+        # the last column/row the leading edges entered
+        lead_x = right if dx > 0 else left
+        lead_y = bottom if dy > 0 else top
+        while True:
+            tx = _entering(area.left, area.right, lead_x, dx)
+            ty = _entering(area.top, area.bottom, lead_y, dy)
+            t = min(tx, ty)
+            if t > 1:
+                return None
+            lead_x += (dx > 0) - (dx < 0) if tx == t else 0
+            lead_y += (dy > 0) - (dy < 0) if ty == t else 0
+            # both spans include the column/row entered, i.e. the corner
+            left, right = _span(area.left, area.right, dx * t, lead_x, dx)
+            top, bottom = _span(area.top, area.bottom, dy * t, lead_y, dy)
+            if tx == t and self.blocked_cells(lead_x, top, lead_x, bottom, mode):
+                return t
+            if ty == t and self.blocked_cells(left, lead_y, right, lead_y, mode):
+                return t
+
+    def chunk_blocks(self, chunk: TilePosition) -> bytes:
+        """The chunk as sent, see `encode_chunk`, without restoring it"""
+        blocks = self._frozen.get(chunk)
+        if blocks is None:
+            blocks = encode_chunk(self, chunk, self._size)
+        return blocks
+
+    def freeze(self, before: Time) -> int:
+        """Freeze the chunks last visited before, returns how many were frozen"""
+        frozen = 0
+        for chunk in [c for c, t in self._visited.items() if t < before]:
+            del self._visited[chunk]
+            positions = chunk_positions(chunk, self._size)
+            if not all(dict.__contains__(self, pos) for pos in positions):
+                continue  # visited again once complete
+            self._frozen[chunk] = encode_chunk(self, chunk, self._size)
+            for pos in positions:
+                dict.__delitem__(self, pos)
+            frozen += 1
+        return frozen
+
+    def chunk_occupancy(self, x: int, y: int) -> Occupancy:
+        """The bitmaps of the chunk at x, y, raises KeyError if not in the level"""
+        bitmaps = self._occupancy.get((x, y))
+        if bitmaps is None:
+            chunk = Vector(x, y)
+            blocks = self._frozen.get(chunk)
+            if blocks is None:
+                positions = chunk_positions(chunk, self._size)
+                blocks = bytes(block_id(self[pos]) for pos in positions)
+            bitmaps = self._occupancy[(x, y)] = occupancy(blocks)
+        return bitmaps
+
+    def _restore(self, chunk: TilePosition) -> bool:
+        blocks = self._frozen.pop(chunk, None)
+        if blocks is None:
+            return False
+        dict.update(self, decode_chunk(chunk, self._size, blocks))
+        self._visited[chunk] = self._now
+        return True
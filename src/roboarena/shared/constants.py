@@ -331,6 +331,38 @@ class NetworkConstants:
     SERVER_IP = 0x00000000
     VSYNC = True
     INITIAL_ACKNOLEDGEMENT: Acknoledgement = -1
+    WAIT_TIMEOUT = 1.0
+    """Upper bound for blocking waits, which are interrupted on stop anyways"""
+    DEFAULT_HOST = "localhost"
+    """Host of --serve and --connect when they only give a port"""
+    REPLICATION_PRECISION = 1024
+    """Steps per game unit of replicated positions and velocities"""
+    MAX_UNACKNOLEDGED_SNAPSHOTS = 20
+    """Send full state instead of deltas when the client lags behind further"""
+    INTEREST_MARGIN = 5.0
+    """Game units around the field of view a client receives events for"""
+    MAX_CHUNKS_PER_UPDATE = 8
+    """Level chunks sent to a client per update, so moving into unknown
+    territory does not delay the entity updates"""
+
+
+class LevelGenerationConstants:
+    APOTHEM = 10
+    """Blocks around the players which are generated"""
+    LOOKAHEAD = 2.0
+    """Seconds of movement the level is generated ahead of the players"""
+    BACKTRACK_BUDGET = 64
+    """Recent collapses the WFC may undo per `collapse` on a contradiction,
+    instead of placing the fallback tile"""
+    WFC_APOTHEM = 6
+    """Tiles allocated around requested positions, with backtracking much
+    smaller than `alloc_apothem` suffices"""
+    SHARD_WORKERS = 0
+    """Processes collapsing the level around players far apart in parallel,
+    see `ShardedWFC`, 0 collapses serially"""
+    FREEZE_AFTER = 30.0
+    """Seconds after which level chunks no player visited are frozen,
+    see `shared.chunk.ChunkedLevel`"""
 
 
 class GraphicConstants:
@@ -341,7 +373,8 @@ class PerlinNoiseConstants:
     threshold = 0.650
     gridsize = 4
     num_octaves = 3
-    offset = Vector.random_unif(0, 1000000).to_int()
+    offset = Vector(500000, 500000)
+    """Keeps the coordinates positive, `perlin` truncates towards zero"""
 
 
 class SettingPathConstants:
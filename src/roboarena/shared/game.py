@@ -14,10 +14,12 @@ from roboarena.shared.util import (
     rect_space_at,
 )
 from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.spatial_grid import SpatialGrid
 
 if TYPE_CHECKING:
-    from roboarena.server.level_generation.level_generator import BlockPosition, Level
+    from roboarena.shared.types import BlockPosition
     from roboarena.shared.block import Block
+    from roboarena.shared.chunk import ChunkedLevel
 
 logger = logging.getLogger(f"{__name__}")
 
@@ -40,7 +42,7 @@ class GameState(ABC):
     ONLY intended for conditional debug logging.
     """
     entities: dict[EntityId, Entity]
-    level: "Level"
+    level: "ChunkedLevel"
     events: EventTarget[QuitEvent | StartFrameEvent]
     game_ui: GameUI
 
@@ -49,6 +51,31 @@ class GameState(ABC):
         """Required for `frame_cache_method`"""
         return self
 
+    @cached_property
+    def entity_grid(self) -> SpatialGrid[Entity]:
+        """The hitboxes of the entities by block, see `index_entity`"""
+        return SpatialGrid()
+
+    def index_entity(self, entity: Entity) -> None:
+        """Update the position of an entity created or moved for collisions.
+
+        Entities are indexed again at the start of each frame, see
+        `index_entities`, so only the moves within a frame must be indexed.
+        """
+        self.entity_grid.update(entity, entity.collision.hitbox)
+
+    def unindex_entity(self, entity: Entity) -> None:
+        self.entity_grid.remove(entity)
+
+    def index_entities(self) -> None:
+        """Index all entities and forget deleted ones"""
+        grid = self.entity_grid
+        entities = set(self.entities.values())
+        for entity in [e for e in grid if e not in entities]:
+            grid.remove(entity)
+        for entity in entities:
+            grid.update(entity, entity.collision.hitbox)
+
     def blocking(
         self, collider: Rect | Entity, mode: Literal["robot"] | Literal["bullet"]
     ) -> bool:
@@ -61,15 +88,15 @@ class GameState(ABC):
         mode:
             whether collider is an robot or bullet
         """
-        return any(
+        rect = collider.collision.hitbox if isinstance(collider, Entity) else collider
+        if any(
             (mode == "robot" and e.blocks_robot)
             or (mode == "bullet" and e.blocks_bullet)
             for e in self.collidingEntities(collider)
-        ) or any(
-            (mode == "robot" and b.blocks_robot)
-            or (mode == "bullet" and b.blocks_bullet)
-            for b in self.colliding_blocks(collider).values()
-        )
+        ):
+            return True
+        with change_exception(KeyError, OutOfLevelError):
+            return self.level.blocked(rect, mode)
 
     @overload
     def collidingEntities(self, collider: Entity) -> Iterable[Entity]: ...
@@ -80,7 +107,7 @@ class GameState(ABC):
     def collidingEntities(self, collider: Rect | Entity) -> Iterable[Entity]:
         """Entites another entity/a rect collides with."""
         rect = collider.collision.hitbox if isinstance(collider, Entity) else collider
-        entities = self.entities.values()
+        entities = self.entity_grid.query(rect)
         return (
             _
             for _ in entities
@@ -0,0 +1,14 @@
+from roboarena.shared.constants import GraphicConstants, NetworkConstants
+from roboarena.shared.types import Position
+from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.vector import Vector
+
+VIEW_SIZE = Vector(GraphicConstants.GU_PER_SCREEN, GraphicConstants.GU_PER_SCREEN)
+"""Upper bound of the field of view of a client, which the server does not know"""
+
+
+def interest_area(center: Position) -> Rect:
+    """The field of view around center plus a margin, so that entities and level
+    chunks arrive before they become visible"""
+    view = Rect.from_size(VIEW_SIZE).centerAround(center)
+    return view.expand(NetworkConstants.INTEREST_MARGIN)
@@ -1,20 +1,90 @@
 import logging
 from collections.abc import Iterable
-from queue import Empty, Queue
-from threading import Lock
+from threading import Condition, Lock
 from typing import Optional
 
 from roboarena.shared.time import add_seconds, get_time
-from roboarena.shared.types import Arrived, IpV4, Packet, Time
+from roboarena.shared.types import Arrived, Counter, IpV4, Time
+from roboarena.shared.util import Heap, counter
 
 logger = logging.getLogger(__name__)
 
 
+class DeliveryQueue[Message]:
+    """Thread-safe queue of packets ordered by their time of arrival.
+
+    Packets arriving at the same time are delivered in the order they were put.
+    """
+
+    _heap: Heap[tuple[Time, int, Message]]
+    """Time of arrival, sequence number and message"""
+    _seq: Counter
+    _cond: Condition
+    _interrupted: bool
+
+    def __init__(self) -> None:
+        self._heap = Heap()
+        self._seq = counter()
+        self._cond = Condition()
+        self._interrupted = False
+
+    def put(self, t_arrive: Time, msg: Message) -> None:
+        with self._cond:
+            self._heap.push((t_arrive, next(self._seq), msg))
+            self._cond.notify_all()
+
+    def pop_until(self, t: Time) -> list[Arrived[Message]]:
+        """Pop all packets arrived until t, oldest first"""
+        arrived = list[Arrived[Message]]()
+        with self._cond:
+            while len(self._heap) > 0 and self._heap.smallest()[0] <= t:
+                t_arrive, _, msg = self._heap.pop()
+                arrived.append((t_arrive, msg))
+        return arrived
+
+    def pop_one(self, t: Time) -> None | Arrived[Message]:
+        """Pop the oldest packet if arrived until t"""
+        with self._cond:
+            if len(self._heap) == 0 or self._heap.smallest()[0] > t:
+                return None
+            t_arrive, _, msg = self._heap.pop()
+            return (t_arrive, msg)
+
+    def wait(self, timeout: Optional[Time] = None) -> bool:
+        """Block until a packet has arrived, the timeout passed or interrupted.
+
+        Returns whether a packet has arrived.
+        """
+        deadline = None if timeout is None else add_seconds(get_time(), timeout)
+        with self._cond:
+            while True:
+                t = get_time()
+                t_next = self._heap.smallest()[0] if len(self._heap) > 0 else None
+                if t_next is not None and t_next <= t:
+                    return True
+                if self._interrupted:
+                    self._interrupted = False
+                    return False
+                if deadline is not None and deadline <= t:
+                    return False
+                # wake up when the next packet arrives at the latest
+                t_wake = deadline
+                if t_next is not None and (t_wake is None or t_next < t_wake):
+                    t_wake = t_next
+                self._cond.wait(None if t_wake is None else t_wake - t)
+
+    def interrupt(self) -> None:
+        """Wake up the current or, if none, the next call to `wait`"""
+        with self._cond:
+            self._interrupted = True
+            self._cond.notify_all()
+
+
 class Network[Message]:
     """Thread-safe Network emulator"""
 
     _add_client_lock: Lock = Lock()
-    _clients: dict[IpV4, Queue[Packet[Message]]] = {}
+    _clients: dict[IpV4, DeliveryQueue[Message]] = {}
     _delay: float
 
     def __init__(self, delay: float) -> None:
@@ -23,48 +93,45 @@ class Network[Message]:
     def add_client_if_missing(self, ip: IpV4):
         with Network._add_client_lock:
             if ip not in self._clients:
-                self._clients[ip] = Queue()
+                self._clients[ip] = DeliveryQueue()
 
     def send(self, ip: IpV4, msg: Message):
         self.add_client_if_missing(ip)
         t_arrive = add_seconds(get_time(), self._delay)
         # logger.debug(f"sending message {(t_arrive, msg)}")
-        self._clients[ip].put((t_arrive, msg))
+        self._clients[ip].put(t_arrive, msg)
 
     def receive(
         self, ip: IpV4, *, until: Optional[Time] = None
     ) -> list[Arrived[Message]]:
         """receive a list of messages for this ip, sorted oldest first"""
         self.add_client_if_missing(ip)
-        t = until or get_time()
-        arrived = list[Packet[Message]]()
-        not_arrived = list[Packet[Message]]()
-        while True:
-            try:
-                packet = self._clients[ip].get_nowait()
-                t_arrive, _ = packet
-                if t_arrive > t:
-                    not_arrived.append(packet)
-                else:
-                    arrived.append(packet)
-            except Empty:
-                break
-        for packet in not_arrived:
-            self._clients[ip].put(packet)
-
-        # for t_arrive, msg in sorted(arrived, key=lambda _: _[0]):
-        #     logger.debug(f"receiving message {(t_arrive, msg)}")
-        return sorted(arrived, key=lambda _: _[0])
+        return self._clients[ip].pop_until(until or get_time())
 
     def receive_one(self, ip: IpV4) -> None | Arrived[Message]:
         """receive the oldest message for this ip"""
-        arrived = self.receive(ip)
-        if len(arrived) == 0:
-            return None
-        oldest, *other = arrived
-        for packet in other:
-            self._clients[ip].put(packet)
-        return oldest
+        self.add_client_if_missing(ip)
+        return self._clients[ip].pop_one(get_time())
+
+    def wait(self, ip: IpV4, *, timeout: Optional[Time] = None) -> bool:
+        """Block until a message for this ip has arrived.
+
+        Returns early with False on timeout or when interrupted.
+        """
+        self.add_client_if_missing(ip)
+        return self._clients[ip].wait(timeout)
+
+    def interrupt(self, ip: IpV4) -> None:
+        """Wake up a thread waiting for messages for this ip, e.g. to stop it"""
+        self.add_client_if_missing(ip)
+        self._clients[ip].interrupt()
+
+    def receive_blocking(
+        self, ip: IpV4, *, timeout: Optional[Time] = None
+    ) -> list[Arrived[Message]]:
+        """Like `receive`, but wait for at least one message using `wait`"""
+        self.wait(ip, timeout=timeout)
+        return self.receive(ip)
 
 
 class Receiver[T]:
@@ -81,3 +148,12 @@ class Receiver[T]:
 
     def receive(self, *, until: Optional[Time] = None) -> list[Arrived[T]]:
         return self._network.receive(self._ip, until=until)
+
+    def receive_blocking(self, *, timeout: Optional[Time] = None) -> list[Arrived[T]]:
+        return self._network.receive_blocking(self._ip, timeout=timeout)
+
+    def wait(self, *, timeout: Optional[Time] = None) -> bool:
+        return self._network.wait(self._ip, timeout=timeout)
+
+    def interrupt(self) -> None:
+        self._network.interrupt(self._ip)
@@ -0,0 +1,52 @@
+"""Quantization of entity fields replicated as deltas.
+
+Server and client both hold the last acknowledged value of each replicated
+field in integer steps, so that deltas between them are exact.
+See `server.replication` and `client.replication`.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from roboarena.shared.constants import NetworkConstants
+from roboarena.shared.types import EventName, Motion, Quantized
+from roboarena.shared.utils.vector import Vector
+
+STEPS = NetworkConstants.REPLICATION_PRECISION
+
+
+@dataclass(frozen=True)
+class ReplicatedField[T]:
+    quantize: Callable[[T], Quantized]
+    dequantize: Callable[[Quantized], T]
+    """Inverse of quantize, i.e. quantize(dequantize(q)) == q"""
+
+
+def _quantize_vector(v: Vector[float]) -> Quantized:
+    return (round(v.x * STEPS), round(v.y * STEPS))
+
+
+def _dequantize_vector(q: Quantized) -> Vector[float]:
+    return Vector(q[0] / STEPS, q[1] / STEPS)
+
+
+def _quantize_motion(m: Motion) -> Quantized:
+    return _quantize_vector(m[0]) + _quantize_vector(m[1])
+
+
+def _dequantize_motion(q: Quantized) -> Motion:
+    return (_dequantize_vector(q[:2]), _dequantize_vector(q[2:]))
+
+
+replicated_fields: dict[EventName, ReplicatedField[Any]] = {
+    "motion": ReplicatedField(_quantize_motion, _dequantize_motion),
+}
+"""Entity events sent every tick, which are delta compressed"""
+
+
+def delta(new: Quantized, old: Quantized) -> Quantized:
+    return tuple(n - o for n, o in zip(new, old, strict=True))
+
+
+def patch(old: Quantized, delta: Quantized) -> Quantized:
+    return tuple(o + d for o, d in zip(old, delta, strict=True))
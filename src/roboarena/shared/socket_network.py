@@ -0,0 +1,188 @@
+import logging
+import socket
+import struct
+from threading import Lock, Thread
+from typing import Any, Callable
+
+from roboarena.shared.network import Network
+from roboarena.shared.time import get_time
+from roboarena.shared.types import IpV4
+
+logger = logging.getLogger(__name__)
+
+type Address = tuple[str, int]
+type Encode[Message] = Callable[[Message], bytes]
+type Decode[Message] = Callable[[bytes], Message]
+
+_header = struct.Struct("!I")
+"""Length prefix of each frame"""
+_handshake = struct.Struct("!I")
+"""Ip of the peer, exchanged once after connecting"""
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes | None:
+    """Receive exactly n bytes, or None if the connection was closed"""
+    chunks = list[bytes]()
+    while n > 0:
+        chunk = sock.recv(n)
+        if len(chunk) == 0:
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+class _Connection:
+    """A TCP connection sending and receiving length-prefixed frames"""
+
+    sock: socket.socket
+    _send_lock: Lock
+
+    def __init__(self, sock: socket.socket) -> None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self._send_lock = Lock()
+
+    def send(self, frame: bytes) -> None:
+        with self._send_lock:
+            self.sock.sendall(_header.pack(len(frame)) + frame)
+
+    def recv(self) -> bytes | None:
+        header = _recv_exact(self.sock, _header.size)
+        if header is None:
+            return None
+        (length,) = _header.unpack(header)
+        return _recv_exact(self.sock, length)
+
+    def close(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class SocketNetwork[Message](Network[Message]):
+    """Network over TCP sockets, so that server and clients can run in
+    separate processes.
+
+    Each instance owns one ip. Messages sent to the own ip are delivered
+    locally, all others are sent over the connection to the peer with this ip.
+    Received messages are stamped with the local time of arrival.
+
+    TCP is used as the game protocol relies on reliable, ordered delivery.
+    Messages are serialized with `encode` and `decode`, for game events
+    use the binary format of `shared.wire`.
+    """
+
+    _ip: IpV4
+    _encode: Encode[Message]
+    _decode: Decode[Message]
+    _connections: dict[IpV4, _Connection]
+    _connections_lock: Lock
+    _listener: socket.socket | None
+    _closed: bool
+
+    def __init__(
+        self,
+        ip: IpV4,
+        encode: Encode[Message],
+        decode: Decode[Message],
+    ) -> None:
+        super().__init__(0)
+        # do not share the queues of the emulator
+        self._clients = {}
+        self._ip = ip
+        self._encode = encode
+        self._decode = decode
+        self._connections = {}
+        self._connections_lock = Lock()
+        self._listener = None
+        self._closed = False
+        self.add_client_if_missing(ip)
+
+    def listen(self, address: Address) -> Address:
+        """Accept connections of peers in the background.
+
+        Returns the bound address, useful when binding to port 0.
+        """
+        listener = socket.create_server(address)
+        self._listener = listener
+        Thread(target=self._accept_loop, args=(listener,), daemon=True).start()
+        return listener.getsockname()[:2]
+
+    def connect(self, address: Address) -> IpV4:
+        """Connect to a listening peer and return its ip"""
+        return self._add_connection(socket.create_connection(address))
+
+    def send(self, ip: IpV4, msg: Message):
+        if ip == self._ip:
+            return super().send(ip, msg)
+        connection = self._connections.get(ip)
+        if connection is None:
+            logger.warning(f"dropping message to unknown ip {ip}: {msg}")
+            return
+        try:
+            connection.send(self._encode(msg))
+        except OSError as e:
+            logger.warning(f"connection to ip {ip} lost: {e}")
+            self._remove_connection(ip, connection)
+
+    def close(self) -> None:
+        self._closed = True
+        if self._listener is not None:
+            self._listener.close()
+        with self._connections_lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+
+    def _accept_loop(self, listener: socket.socket) -> None:
+        while not self._closed:
+            try:
+                sock, _ = listener.accept()
+            except OSError:
+                return
+            Thread(target=self._add_connection, args=(sock,), daemon=True).start()
+
+    def _add_connection(self, sock: socket.socket) -> IpV4:
+        connection = _Connection(sock)
+        connection.sock.sendall(_handshake.pack(self._ip))
+        handshake = _recv_exact(connection.sock, _handshake.size)
+        if handshake is None:
+            connection.close()
+            raise ConnectionError("connection closed during handshake")
+        (ip,) = _handshake.unpack(handshake)
+        with self._connections_lock:
+            if ip in self._connections:
+                logger.warning(f"replacing connection of ip {ip}")
+            self._connections[ip] = connection
+        logger.info(f"connected to ip {ip}")
+        Thread(target=self._receive_loop, args=(ip, connection), daemon=True).start()
+        return ip
+
+    def _remove_connection(self, ip: IpV4, connection: _Connection) -> None:
+        with self._connections_lock:
+            if self._connections.get(ip) is connection:
+                del self._connections[ip]
+        connection.close()
+
+    def _receive_loop(self, ip: IpV4, connection: _Connection) -> None:
+        queue = self._clients[self._ip]
+        while True:
+            try:
+                frame = connection.recv()
+            except OSError:
+                frame = None
+            if frame is None:
+                if not self._closed:
+                    logger.info(f"connection to ip {ip} closed")
+                self._remove_connection(ip, connection)
+                return
+            try:
+                msg: Any = self._decode(frame)
+            except Exception:
+                logger.exception(f"dropping undecodable message from ip {ip}")
+                continue
+            queue.put(get_time(), msg)
@@ -24,7 +24,6 @@ if TYPE_CHECKING:
         ClientPlayerRobot,
     )
     from roboarena.server.entity import (
-        ServerBullet,
         ServerDoorEntity,
         ServerEnemyRobot,
         ServerPlayerRobot,
@@ -35,6 +34,7 @@ if TYPE_CHECKING:
 
 
 type Acknoledgement = int
+type SnapshotId = int
 type EntityId = int
 type ClientId = int
 
@@ -80,15 +80,15 @@ type Path = str
 type ClientEntityType = (
     "ClientPlayerRobot | ClientEnemyRobot | ClientBullet | ClientDoorEntity"
 )
-type ServerEntityType = (
-    "ServerPlayerRobot | ServerEnemyRobot | ServerBullet | ServerDoorEntity"
-)
+type ServerEntityType = ("ServerPlayerRobot | ServerEnemyRobot | ServerDoorEntity")
 
 type BulletMoveCtx = tuple[Time]
 type PlayerRobotMoveCtx = tuple[Input, Time]
 type EnemyRobotMoveCtx = tuple[Time]
 
 type EventName = str
+type Quantized = tuple[int, ...]
+"""Value of a replicated entity field in integer steps"""
 type Dispatch[Evt] = Callable[[EventName, Evt], None]
 type SimpleDispatch[Evt] = Callable[[Evt], None]
 
@@ -199,6 +199,8 @@ type ServerGameEventType = (
     | ServerLevelUpdateEvent
     | ServerMarkerEvent
     | ServerMarkVectEvent
+    | ServerEntityDeltaEvent
+    | ServerLevelChunkEvent
 )
 type ServerSpawnEventType = (
     ServerSpawnRobotEvent | ServerSpawnDoorEvent | ServerSpawnBulletEvent
@@ -207,13 +209,14 @@ type ServerEventType = (
     ServerConnectionConfirmEvent
     | ServerGameStartEvent
     | ServerGameEvent[ServerGameEventType]
+    | ServerSnapshotEvent
     | ServerGameEndEvent
 )
-type ClientGameEventType = ClientInputEvent
+type ClientGameEventType = ClientInputEvent | ClientLevelRequestEvent
 type ClientEventType = (
     ClientConnectionRequestEvent
     | ClientLobbyReadyEvent
-    | ClientGameEvent[ClientInputEvent]
+    | ClientGameEvent[ClientGameEventType]
 )
 type EventType = ServerEventType | ClientEventType
 
@@ -244,7 +247,10 @@ class ServerConnectionConfirmEvent:
 class ServerGameStartEvent:
     client_entity: EntityId
     entities: Iterable[ServerSpawnEventType]
-    level: "Level"
+    chunk_size: int
+    """Edge length of the level chunks in blocks, see `shared.chunk`"""
+    chunks: Iterable["ServerLevelChunkEvent"]
+    """The level around the client, further chunks are sent on request"""
 
 
 @dataclass(frozen=True)
@@ -253,6 +259,17 @@ class ServerGameEvent[Evt]:
     event: Evt
 
 
+@dataclass(frozen=True)
+class ServerSnapshotEvent:
+    """All game events of one server update for a client, sent as one message"""
+
+    last_ack: Acknoledgement
+    id: SnapshotId
+    baseline: SnapshotId
+    """Snapshot the contained deltas are relative to"""
+    events: Collection["ServerGameEventType"]
+
+
 @dataclass(frozen=True)
 class ServerGameEndEvent:
     pass
@@ -265,6 +282,15 @@ class ServerEntityEvent:
     payload: object
 
 
+@dataclass(frozen=True)
+class ServerEntityDeltaEvent:
+    """Change of a replicated entity field relative to the snapshot baseline"""
+
+    entity: EntityId
+    type: str
+    delta: Quantized
+
+
 @dataclass(frozen=True)
 class ServerSpawnRobotEvent:
     id: EntityId
@@ -286,6 +312,13 @@ class ServerLevelUpdateEvent:
     update: "LevelUpdate"
 
 
+@dataclass(frozen=True)
+class ServerLevelChunkEvent:
+    chunk: TilePosition
+    blocks: bytes
+    """Block ids of the chunk, see `shared.chunk`"""
+
+
 @dataclass(frozen=True)
 class Marker:
     position: Vector[float]
@@ -340,9 +373,17 @@ class ClientGameEvent[Evt]:
     client_id: ClientId
     ack: Acknoledgement
     event: Evt
+    snapshot_ack: SnapshotId
+    """Last snapshot received from the server"""
 
 
 @dataclass(frozen=True)
 class ClientInputEvent:
     input: Input
     dt: Time
+
+
+@dataclass(frozen=True)
+class ClientLevelRequestEvent:
+    chunks: Collection[TilePosition]
+    """Chunks the server sends once generated"""
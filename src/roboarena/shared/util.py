@@ -607,3 +607,16 @@ def is_one_at(value: int, k: int) -> bool:
         is_one_at(0b1101, 1) == False
     """
     return (value >> k) & 1 == 1
+
+
+def hash_position(seed: int, position: Vector[int]) -> int:
+    """
+    Returns a 64 bit hash of seed and position, uniform enough to draw
+    random numbers from. Pure, unlike a random number generator.
+    """
+    mask = (1 << 64) - 1
+    h = seed ^ (int(position.x) * 0x9E3779B97F4A7C15) ^ (int(position.y) << 32)
+    # splitmix64 finalizer
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & mask
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & mask
+    return h ^ (h >> 31)
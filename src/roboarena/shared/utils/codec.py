@@ -0,0 +1,362 @@
+"""Combinators for schema-driven binary codecs.
+
+A codec appends the encoding of a value to a `bytearray` and reads it back
+from a position in a buffer. Compound codecs are built from smaller ones, so a
+schema reads like the type it encodes, e.g. `ListOf(Record(Marker, ...))`.
+"""
+
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from collections.abc import Collection, Iterable, Mapping
+from dataclasses import fields
+from typing import Any, Callable
+
+
+class CodecError(Exception):
+    """Raised when a value cannot be encoded or a buffer cannot be decoded"""
+
+
+class Codec[T](ABC):
+    """Binary encoding of values of type T"""
+
+    @abstractmethod
+    def write(self, out: bytearray, value: T) -> None:
+        """Append the encoding of value to out"""
+
+    @abstractmethod
+    def read(self, data: bytes, pos: int) -> tuple[T, int]:
+        """Read a value starting at pos and return it with the position after it"""
+
+    def encode(self, value: T) -> bytes:
+        out = bytearray()
+        self.write(out, value)
+        return bytes(out)
+
+    def decode(self, data: bytes) -> T:
+        try:
+            value, pos = self.read(data, 0)
+        except (IndexError, struct.error, UnicodeDecodeError) as e:
+            raise CodecError(f"truncated or malformed data: {e}") from e
+        if pos != len(data):
+            raise CodecError(f"{len(data) - pos} trailing bytes")
+        return value
+
+
+class VarUInt(Codec[int]):
+    """Unsigned integer in 7 bit groups, small values take a single byte"""
+
+    def write(self, out: bytearray, value: int) -> None:
+        if value < 0:
+            raise CodecError(f"negative value {value} for unsigned varint")
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    def read(self, data: bytes, pos: int) -> tuple[int, int]:
+        value = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, pos
+            shift += 7
+
+
+class VarInt(Codec[int]):
+    """Signed integer as zigzag encoded varint, small magnitudes take one byte"""
+
+    def write(self, out: bytearray, value: int) -> None:
+        var_uint.write(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+
+    def read(self, data: bytes, pos: int) -> tuple[int, int]:
+        value, pos = var_uint.read(data, pos)
+        return (value >> 1) if value & 1 == 0 else -((value + 1) >> 1), pos
+
+
+var_uint = VarUInt()
+var_int = VarInt()
+
+
+class Fixed[T](Codec[T]):
+    """Fixed size layout packed with `struct`
+
+    `pack` turns a value into the tuple of fields of the format,
+    `unpack` builds the value back from these fields.
+    """
+
+    _struct: struct.Struct
+    _pack: Callable[[T], tuple[Any, ...]]
+    _unpack: Callable[..., T]
+
+    def __init__(
+        self,
+        format: str,
+        pack: Callable[[T], tuple[Any, ...]],
+        unpack: Callable[..., T],
+    ) -> None:
+        self._struct = struct.Struct(format)
+        self._pack = pack
+        self._unpack = unpack
+
+    @property
+    def size(self) -> int:
+        return self._struct.size
+
+    def write(self, out: bytearray, value: T) -> None:
+        out += self._struct.pack(*self._pack(value))
+
+    def read(self, data: bytes, pos: int) -> tuple[T, int]:
+        values = self._struct.unpack_from(data, pos)
+        return self._unpack(*values), pos + self._struct.size
+
+
+boolean = Fixed[bool]("<?", lambda b: (b,), bool)
+float32 = Fixed[float]("<f", lambda f: (f,), float)
+float64 = Fixed[float]("<d", lambda f: (f,), float)
+
+
+class Const[T](Codec[T]):
+    """Value without data, e.g. an event without fields. Takes no bytes."""
+
+    _value: T
+
+    def __init__(self, value: T) -> None:
+        self._value = value
+
+    def write(self, out: bytearray, value: T) -> None:
+        pass
+
+    def read(self, data: bytes, pos: int) -> tuple[T, int]:
+        return self._value, pos
+
+
+class Mapped[T, U](Codec[T]):
+    """Encode T by converting it to U, e.g. an instance to its id"""
+
+    _codec: Codec[U]
+    _to: Callable[[T], U]
+    _from: Callable[[U], T]
+
+    def __init__(
+        self, codec: Codec[U], to: Callable[[T], U], from_: Callable[[U], T]
+    ) -> None:
+        self._codec = codec
+        self._to = to
+        self._from = from_
+
+    def write(self, out: bytearray, value: T) -> None:
+        self._codec.write(out, self._to(value))
+
+    def read(self, data: bytes, pos: int) -> tuple[T, int]:
+        value, pos = self._codec.read(data, pos)
+        return self._from(value), pos
+
+
+class Bytes(Codec[bytes]):
+    """Bytes prefixed by their length"""
+
+    def write(self, out: bytearray, value: bytes) -> None:
+        var_uint.write(out, len(value))
+        out += value
+
+    def read(self, data: bytes, pos: int) -> tuple[bytes, int]:
+        length, pos = var_uint.read(data, pos)
+        end = pos + length
+        if end > len(data):
+            raise IndexError("bytes exceed data")
+        return bytes(data[pos:end]), end
+
+
+byte_string = Bytes()
+
+
+class Compressed(Codec[bytes]):
+    """Bytes compressed with zlib, for large and repetitive payloads"""
+
+    def write(self, out: bytearray, value: bytes) -> None:
+        byte_string.write(out, zlib.compress(value))
+
+    def read(self, data: bytes, pos: int) -> tuple[bytes, int]:
+        compressed, pos = byte_string.read(data, pos)
+        try:
+            return zlib.decompress(compressed), pos
+        except zlib.error as e:
+            raise CodecError(f"malformed compressed data: {e}") from e
+
+
+class Str(Codec[str]):
+    """UTF-8 string prefixed by its length in bytes"""
+
+    def write(self, out: bytearray, value: str) -> None:
+        byte_string.write(out, value.encode())
+
+    def read(self, data: bytes, pos: int) -> tuple[str, int]:
+        encoded, pos = byte_string.read(data, pos)
+        return encoded.decode(), pos
+
+
+string = Str()
+
+
+class ListOf[T](Codec[Iterable[T]]):
+    """Items prefixed by their count, always decoded as list"""
+
+    _item: Codec[T]
+
+    def __init__(self, item: Codec[T]) -> None:
+        self._item = item
+
+    def write(self, out: bytearray, value: Iterable[T]) -> None:
+        items = value if isinstance(value, Collection) else list(value)
+        var_uint.write(out, len(items))
+        write = self._item.write
+        for item in items:
+            write(out, item)
+
+    def read(self, data: bytes, pos: int) -> tuple[Iterable[T], int]:
+        count, pos = var_uint.read(data, pos)
+        items = list[T]()
+        read = self._item.read
+        for _ in range(count):
+            item, pos = read(data, pos)
+            items.append(item)
+        return items, pos
+
+
+class DictOf[K, V](Codec[Mapping[K, V]]):
+    """Key value pairs prefixed by their count, decoded as dict"""
+
+    _key: Codec[K]
+    _value: Codec[V]
+
+    def __init__(self, key: Codec[K], value: Codec[V]) -> None:
+        self._key = key
+        self._value = value
+
+    def write(self, out: bytearray, value: Mapping[K, V]) -> None:
+        var_uint.write(out, len(value))
+        for k, v in value.items():
+            self._key.write(out, k)
+            self._value.write(out, v)
+
+    def read(self, data: bytes, pos: int) -> tuple[Mapping[K, V], int]:
+        count, pos = var_uint.read(data, pos)
+        items = dict[K, V]()
+        for _ in range(count):
+            k, pos = self._key.read(data, pos)
+            v, pos = self._value.read(data, pos)
+            items[k] = v
+        return items, pos
+
+
+class TupleOf(Codec[tuple[Any, ...]]):
+    """Fixed number of items each with its own codec"""
+
+    _items: tuple[Codec[Any], ...]
+
+    def __init__(self, *items: Codec[Any]) -> None:
+        self._items = items
+
+    def write(self, out: bytearray, value: tuple[Any, ...]) -> None:
+        for codec, item in zip(self._items, value, strict=True):
+            codec.write(out, item)
+
+    def read(self, data: bytes, pos: int) -> tuple[tuple[Any, ...], int]:
+        items = list[Any]()
+        for codec in self._items:
+            item, pos = codec.read(data, pos)
+            items.append(item)
+        return tuple(items), pos
+
+
+class Record[T](Codec[T]):
+    """Dataclass encoded field by field in declaration order.
+
+    All fields of the dataclass must be given a codec, so that adding a field
+    without extending the schema fails at import instead of on the wire.
+    """
+
+    _cls: Callable[..., T]
+    _fields: list[tuple[str, Codec[Any]]]
+
+    def __init__(self, cls: type[T], **codecs: Codec[Any]) -> None:
+        names = [f.name for f in fields(cls)]  # type: ignore
+        if set(names) != set(codecs):
+            raise CodecError(
+                f"schema of {cls.__name__} has fields {sorted(codecs)},"
+                f" expected {sorted(names)}"
+            )
+        self._cls = cls
+        self._fields = [(name, codecs[name]) for name in names]
+
+    def write(self, out: bytearray, value: T) -> None:
+        for name, codec in self._fields:
+            codec.write(out, getattr(value, name))
+
+    def read(self, data: bytes, pos: int) -> tuple[T, int]:
+        values = list[Any]()
+        for _, codec in self._fields:
+            value, pos = codec.read(data, pos)
+            values.append(value)
+        return self._cls(*values), pos
+
+
+class Tagged[T](Codec[T]):
+    """Union of types, prefixed by a one byte tag.
+
+    The tag is the index of the type in `variants`,
+    so new variants must be appended to stay compatible.
+    """
+
+    _variants: list[Codec[Any]]
+    _tags: dict[type, int]
+
+    def __init__(self, variants: Iterable[tuple[type, Codec[Any]]]) -> None:
+        self._variants = []
+        self._tags = {}
+        for tag, (cls, codec) in enumerate(variants):
+            if tag > 0xFF:
+                raise CodecError("too many variants for a one byte tag")
+            self._variants.append(codec)
+            self._tags[cls] = tag
+
+    def write(self, out: bytearray, value: T) -> None:
+        tag = self._tags.get(type(value))
+        if tag is None:
+            raise CodecError(f"no variant for type {type(value).__name__}")
+        out.append(tag)
+        self._variants[tag].write(out, value)
+
+    def read(self, data: bytes, pos: int) -> tuple[T, int]:
+        tag = data[pos]
+        if tag >= len(self._variants):
+            raise CodecError(f"unknown tag {tag}")
+        return self._variants[tag].read(data, pos + 1)
+
+
+class Interned(Codec[str]):
+    """String out of a fixed set, encoded as its one byte index"""
+
+    _names: list[str]
+    _tags: dict[str, int]
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self._names = list(names)
+        if len(self._names) > 0x100:
+            raise CodecError("too many names for a one byte tag")
+        self._tags = {name: tag for tag, name in enumerate(self._names)}
+
+    def write(self, out: bytearray, value: str) -> None:
+        tag = self._tags.get(value)
+        if tag is None:
+            raise CodecError(f"name {value!r} is not interned")
+        out.append(tag)
+
+    def read(self, data: bytes, pos: int) -> tuple[str, int]:
+        tag = data[pos]
+        if tag >= len(self._names):
+            raise CodecError(f"unknown tag {tag}")
+        return self._names[tag], pos + 1
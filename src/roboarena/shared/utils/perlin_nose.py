@@ -1,5 +1,6 @@
 import math
 import random
+from collections.abc import Sequence
 from multiprocessing import Pool
 from typing import Tuple
 
@@ -14,12 +15,12 @@ TupleVector = Tuple[float, float]
 TupleVectorInt = Tuple[int, int]
 
 
-def random_gradient(ix: int, iy: int) -> TupleVector:
+def random_gradient(ix: int, iy: int, seed: int = 0) -> TupleVector:
     """Function to generate a random gradient, the function is pure"""
     # No precomputed gradients mean this works for any number of grid coordinates
     w: int = 32
     s: int = w // 2
-    a: int = ix * 3284157443
+    a: int = (ix ^ seed) * 3284157443
     b: int = iy
     b ^= ((a << s) | (a >> (w - s))) & 0xFFFFFFFF
     b = (b * 1911520717) & 0xFFFFFFFF
@@ -29,8 +30,8 @@ def random_gradient(ix: int, iy: int) -> TupleVector:
     return (math.sin(random), math.cos(random))
 
 
-def dot_grid_gradient(ix: int, iy: int, x: float, y: float) -> float:
-    gradient: TupleVector = random_gradient(ix, iy)
+def dot_grid_gradient(ix: int, iy: int, x: float, y: float, seed: int = 0) -> float:
+    gradient: TupleVector = random_gradient(ix, iy, seed)
     dx: float = x - float(ix)
     dy: float = y - float(iy)
 
@@ -42,7 +43,7 @@ def interpolate(a0: float, a1: float, w: float) -> float:
     return (a1 - a0) * (3.0 - w * 2.0) * w * w + a0
 
 
-def perlin(x: float, y: float) -> float:
+def perlin(x: float, y: float, seed: int = 0) -> float:
     """Generates perlin noise for one positions"""
     x0: int = int(x)
     y0: int = int(y)
@@ -53,18 +54,18 @@ def perlin(x: float, y: float) -> float:
     sx: float = x - float(x0)
     sy: float = y - float(y0)
 
-    n0: float = dot_grid_gradient(x0, y0, x, y)
-    n1: float = dot_grid_gradient(x1, y0, x, y)
+    n0: float = dot_grid_gradient(x0, y0, x, y, seed)
+    n1: float = dot_grid_gradient(x1, y0, x, y, seed)
     ix0: float = interpolate(n0, n1, sx)
-    n0 = dot_grid_gradient(x0, y1, x, y)
-    n1 = dot_grid_gradient(x1, y1, x, y)
+    n0 = dot_grid_gradient(x0, y1, x, y, seed)
+    n1 = dot_grid_gradient(x1, y1, x, y, seed)
     ix1: float = interpolate(n0, n1, sx)
     value: float = interpolate(ix0, ix1, sy)
     return value
 
 
 def perline_noise_spot_patial(
-    part_coordx: float, part_coordy: float, num_octaves: int
+    part_coordx: float, part_coordy: float, num_octaves: int, seed: int = 0
 ) -> float:
     """Calulate the stacked perlin noise for one spot based on partial coordinate"""
     val: float = 0
@@ -73,7 +74,7 @@ def perline_noise_spot_patial(
     for _ in range(num_octaves):
         sample_x: float = part_coordx * freq
         sample_y: float = part_coordy * freq
-        val += perlin(sample_x, sample_y) * amp
+        val += perlin(sample_x, sample_y, seed) * amp
         freq *= 2
         amp /= 2
     # val *= 1.2
@@ -81,13 +82,100 @@ def perline_noise_spot_patial(
     return val
 
 
-def perlin_noise_spot(pos: Vector[int], gridsize: int, num_octaves: int):
+def perlin_noise_spot(pos: Vector[int], gridsize: int, num_octaves: int, seed: int = 0):
     """Generate perlin noise value for a spot based on coordinates"""
     return (
-        perline_noise_spot_patial(pos.x / gridsize, pos.y / gridsize, num_octaves) + 1
+        perline_noise_spot_patial(pos.x / gridsize, pos.y / gridsize, num_octaves, seed)
+        + 1
     ) * 0.5
 
 
+type IntArray = NDArray[np.int64]
+type FloatArray = NDArray[np.double]
+
+U32 = np.uint64(0xFFFFFFFF)
+
+
+def random_gradients(
+    ix: IntArray, iy: IntArray, seed: int = 0
+) -> tuple[FloatArray, FloatArray]:
+    """`random_gradient` for arrays of grid coordinates.
+
+    The hash is computed modulo 2**64, only the lower 48 bits of the
+    intermediate values contribute to the result of `random_gradient`.
+    """
+    s = np.uint64(16)
+    a = ix.astype(np.uint64) ^ np.uint64(seed & 0xFFFFFFFFFFFFFFFF)
+    a *= np.uint64(3284157443)
+    b = iy.astype(np.uint64)
+    b ^= ((a << s) | (a >> s)) & U32
+    b = (b * np.uint64(1911520717)) & U32
+    a ^= ((b << s) | (b >> s)) & U32
+    a = (a * np.uint64(2048419325)) & U32
+    random = a / 0xFFFFFFFF * 2 * math.pi
+    return np.sin(random), np.cos(random)
+
+
+def dot_grid_gradients(
+    ix: IntArray, iy: IntArray, x: FloatArray, y: FloatArray, seed: int = 0
+) -> FloatArray:
+    gx, gy = random_gradients(ix, iy, seed)
+    return (x - ix) * gx + (y - iy) * gy
+
+
+def perlin_array(x: FloatArray, y: FloatArray, seed: int = 0) -> FloatArray:
+    """`perlin` for arrays of positions"""
+    x0 = np.trunc(x).astype(np.int64)
+    y0 = np.trunc(y).astype(np.int64)
+    x1 = x0 + 1
+    y1 = y0 + 1
+
+    sx = x - x0
+    sy = y - y0
+
+    n0 = dot_grid_gradients(x0, y0, x, y, seed)
+    n1 = dot_grid_gradients(x1, y0, x, y, seed)
+    ix0 = interpolate(n0, n1, sx)  # type: ignore
+    n0 = dot_grid_gradients(x0, y1, x, y, seed)
+    n1 = dot_grid_gradients(x1, y1, x, y, seed)
+    ix1 = interpolate(n0, n1, sx)  # type: ignore
+    return interpolate(ix0, ix1, sy)  # type: ignore
+
+
+def perlin_noise_spots(
+    xs: IntArray, ys: IntArray, gridsize: int, num_octaves: int, seed: int = 0
+) -> FloatArray:
+    """`perlin_noise_spot` for arrays of coordinates, evaluated in one pass"""
+    xs, ys = np.broadcast_arrays(xs, ys)
+    part_x = xs / gridsize
+    part_y = ys / gridsize
+    val = np.zeros(xs.shape)
+    freq: float = 1
+    amp: float = 1
+    for _ in range(num_octaves):
+        val += perlin_array(part_x * freq, part_y * freq, seed) * amp
+        freq *= 2
+        amp /= 2
+    return (np.clip(val, -1.0, 1.0) + 1) * 0.5
+
+
+def perlin_noise_tiles(
+    top_lefts: Sequence[Vector[int]],
+    size: int,
+    gridsize: int,
+    num_octaves: int,
+    seed: int = 0,
+) -> FloatArray:
+    """Noise of the squares of edge length size at the top left positions,
+    indexed [square, y, x], the same values as `perlin_noise_spot`"""
+    corners = np.array([(p.x, p.y) for p in top_lefts], dtype=np.int64)
+    corners = corners.reshape(-1, 2)
+    offsets = np.arange(size, dtype=np.int64)
+    xs = corners[:, 0, None, None] + offsets[None, None, :]
+    ys = corners[:, 1, None, None] + offsets[None, :, None]
+    return perlin_noise_spots(xs, ys, gridsize, num_octaves, seed)
+
+
 def perlin_noise(
     width: int, height: int, gridsize: int, num_octaves: int, center: TupleVector
 ) -> NDArray[np.double]:
@@ -41,6 +41,26 @@ class Rect:
         y_ok = self.top <= rect.bottom and self.bottom >= rect.top
         return x_ok and y_ok
 
+    def sweep(self, motion: Vector[float], rect: "Rect") -> float | None:
+        """Fraction of the motion at which this rect moving along it first
+        overlaps rect, None if it does not within the motion"""
+        enter, leave = 0.0, 1.0
+        for start, end, d, lo, hi in (
+            (self.left, self.right, motion.x, rect.left, rect.right),
+            (self.top, self.bottom, motion.y, rect.top, rect.bottom),
+        ):
+            if d == 0:
+                if start > hi or end < lo:
+                    return None
+                continue
+            t0, t1 = (lo - end) / d, (hi - start) / d
+            if t0 > t1:
+                t0, t1 = t1, t0
+            enter, leave = max(enter, t0), min(leave, t1)
+            if enter > leave:
+                return None
+        return enter
+
     def expand(self, n: float) -> "Rect":
         """Expand the rectangle by n in each direction."""
         return Rect(self.top_left - n, self.width_height + 2 * n)
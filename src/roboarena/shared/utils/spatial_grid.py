@@ -0,0 +1,92 @@
+from collections.abc import Hashable, Iterable, Iterator
+from math import floor
+
+from roboarena.shared.utils.rect import Rect
+
+type Cell = tuple[int, int]
+type CellRange = tuple[int, int, int, int]
+"""left, top, right, bottom cell, inclusive"""
+
+
+class SpatialGrid[T: Hashable]:
+    """A uniform grid over the rects of items, the broad phase of collisions.
+
+    Each item is stored in all cells its rect overlaps, a query only visits
+    the cells the queried rect overlaps. The candidates may not overlap the
+    queried rect themselves, the caller checks the exact rects.
+    """
+
+    _cell_size: float
+    _cells: dict[Cell, set[T]]
+    _ranges: dict[T, CellRange]
+    """The cells each item is stored in"""
+
+    def __init__(self, cell_size: float = 1.0) -> None:
+        self._cell_size = cell_size
+        self._cells = {}
+        self._ranges = {}
+
+    def __len__(self) -> int:
+        return len(self._ranges)
+
+    def __contains__(self, item: T) -> bool:
+        return item in self._ranges
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._ranges)
+
+    @property
+    def cell_size(self) -> float:
+        return self._cell_size
+
+    def update(self, item: T, rect: Rect) -> None:
+        """Insert the item or move it to the cells of its rect"""
+        cells = self._range(rect)
+        old = self._ranges.get(item)
+        if old == cells:
+            return
+        if old is not None:
+            self._discard(item, old)
+        self._ranges[item] = cells
+        left, top, right, bottom = cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                self._cells.setdefault((x, y), set()).add(item)
+
+    def remove(self, item: T) -> None:
+        old = self._ranges.pop(item, None)
+        if old is not None:
+            self._discard(item, old)
+
+    def query(self, rect: Rect) -> Iterable[T]:
+        """Items stored in the cells the rect overlaps, each once"""
+        return self.query_cells(self._range(rect))
+
+    def query_cells(self, cells: CellRange) -> Iterable[T]:
+        """Items stored in the range of cells, each once"""
+        left, top, right, bottom = cells
+        if left == right and top == bottom:
+            return tuple(self._cells.get((left, top), ()))
+        found = set[T]()
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                found |= self._cells.get((x, y), set())
+        return found
+
+    def _range(self, rect: Rect) -> CellRange:
+        size = self._cell_size
+        return (
+            floor(rect.left / size),
+            floor(rect.top / size),
+            floor(rect.right / size),
+            floor(rect.bottom / size),
+        )
+
+    def _discard(self, item: T, cells: CellRange) -> None:
+        left, top, right, bottom = cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = self._cells[(x, y)]
+                cell.discard(item)
+                if len(cell) == 0:
+                    del self._cells[(x, y)]
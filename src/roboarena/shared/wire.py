@@ -0,0 +1,316 @@
+"""Binary wire format of the communication protocol in `shared.types`.
+
+Used to serialize events for transports between processes, e.g. `SocketNetwork`.
+The emulated `Network` passes the event objects directly.
+
+Floats of positions and velocities are sent with single precision,
+entity ids and acknowledgements as varints and event types as one byte tags.
+"""
+
+from typing import Any, Callable
+
+import pygame
+
+from roboarena.shared.block import Block, block_by_id, block_id
+from roboarena.shared.types import (
+    ClientConnectionRequestEvent,
+    ClientGameEvent,
+    ClientInputEvent,
+    ClientLevelRequestEvent,
+    ClientLobbyReadyEvent,
+    EntityId,
+    EventType,
+    Input,
+    Marker,
+    MarkerVect,
+    Motion,
+    PygameColor,
+    ServerConnectionConfirmEvent,
+    ServerDeleteEntityEvent,
+    ServerEntityDeltaEvent,
+    ServerEntityEvent,
+    ServerGameEndEvent,
+    ServerGameEvent,
+    ServerGameStartEvent,
+    ServerLevelChunkEvent,
+    ServerLevelUpdateEvent,
+    ServerMarkerEvent,
+    ServerMarkVectEvent,
+    ServerSnapshotEvent,
+    ServerSpawnBulletEvent,
+    ServerSpawnDoorEvent,
+    ServerSpawnRobotEvent,
+    ShotEvent,
+    Weapon,
+)
+from roboarena.shared.utils.codec import (
+    Codec,
+    Compressed,
+    Const,
+    Fixed,
+    Interned,
+    ListOf,
+    Mapped,
+    Record,
+    Tagged,
+    TupleOf,
+    boolean,
+    float64,
+    var_int,
+    var_uint,
+)
+from roboarena.shared.utils.vector import Vector
+
+vector = Fixed[Vector[float]]("<ff", lambda v: (v.x, v.y), Vector)
+
+
+class BlockPositionCodec(Codec[Vector[int]]):
+    """Coordinates as zigzag varints, small near the spawn at the origin"""
+
+    def write(self, out: bytearray, value: Vector[int]) -> None:
+        var_int.write(out, value.x)
+        var_int.write(out, value.y)
+
+    def read(self, data: bytes, pos: int) -> tuple[Vector[int], int]:
+        x, pos = var_int.read(data, pos)
+        y, pos = var_int.read(data, pos)
+        return Vector(x, y), pos
+
+
+block_position = BlockPositionCodec()
+motion = Fixed[Motion](
+    "<ffff",
+    lambda m: (m[0].x, m[0].y, m[1].x, m[1].y),
+    lambda x, y, vx, vy: (Vector(x, y), Vector(vx, vy)),
+)
+color = Fixed[pygame.Color]("<BBBB", lambda c: (c.r, c.g, c.b, c.a), pygame.Color)
+marker_color = Fixed[PygameColor]("<BBBB", PygameColor.to_tuple, PygameColor)
+weapon = Fixed[Weapon](
+    "<ffi",
+    lambda w: (w.weapon_speed, w.bullet_speed, w.bullet_strength),
+    Weapon,
+)
+block = Mapped[Block, int](var_uint, block_id, block_by_id)
+
+
+def _pack_input(i: Input) -> tuple[Any, ...]:
+    flags = (
+        i.move_right
+        | i.move_down << 1
+        | i.move_left << 2
+        | i.move_up << 3
+        | i.primary << 4
+        | i.secondary << 5
+    )
+    return (i.dt, flags, i.mouse.x, i.mouse.y)
+
+
+def _unpack_input(dt: float, flags: int, x: float, y: float) -> Input:
+    return Input(
+        dt,
+        bool(flags & 1),
+        bool(flags & 1 << 1),
+        bool(flags & 1 << 2),
+        bool(flags & 1 << 3),
+        bool(flags & 1 << 4),
+        bool(flags & 1 << 5),
+        Vector(x, y),
+    )
+
+
+player_input = Fixed[Input]("<dBff", _pack_input, _unpack_input)
+"""Key states packed into a bitfield"""
+
+
+entity_payloads: dict[str, Codec[Any]] = {
+    "position": vector,
+    "velocity": vector,
+    "motion": motion,
+    "color": color,
+    "health": var_int,
+    "weapon": weapon,
+    "weapon_shot": Const(ShotEvent()),
+    "open": boolean,
+}
+"""Payload of each event name dispatched by server entities.
+Append new names only, as the index is used as tag."""
+
+
+entity_deltas: dict[str, Codec[Any]] = {
+    "position": TupleOf(var_int, var_int),
+    "motion": TupleOf(var_int, var_int, var_int, var_int),
+}
+"""Quantized deltas of the fields in `shared.replication`"""
+
+
+class EntityEventCodec[Evt: ServerEntityEvent | ServerEntityDeltaEvent](Codec[Evt]):
+    """Entity id as varint, the interned event name and its payload"""
+
+    _cls: Callable[[EntityId, str, Any], Evt]
+    _payloads: dict[str, Codec[Any]]
+    _names: Interned
+
+    def __init__(
+        self, cls: Callable[[EntityId, str, Any], Evt], payloads: dict[str, Codec[Any]]
+    ) -> None:
+        self._cls = cls
+        self._payloads = payloads
+        self._names = Interned(payloads.keys())
+
+    def write(self, out: bytearray, value: Evt) -> None:
+        var_uint.write(out, value.entity)
+        self._names.write(out, value.type)
+        payload = value.payload if isinstance(value, ServerEntityEvent) else value.delta
+        self._payloads[value.type].write(out, payload)
+
+    def read(self, data: bytes, pos: int) -> tuple[Evt, int]:
+        entity, pos = var_uint.read(data, pos)
+        name, pos = self._names.read(data, pos)
+        payload, pos = self._payloads[name].read(data, pos)
+        return self._cls(entity, name, payload), pos
+
+
+spawn_robot = Record(
+    ServerSpawnRobotEvent,
+    id=var_uint,
+    health=var_int,
+    motion=motion,
+    color=color,
+    weapon=weapon,
+)
+spawn_door = Record(ServerSpawnDoorEvent, id=var_uint, position=vector, open=boolean)
+spawn_bullet = Record(
+    ServerSpawnBulletEvent,
+    id=var_uint,
+    friendly=boolean,
+    position=vector,
+    velocity=vector,
+)
+spawn_event = Tagged[Any](
+    [
+        (ServerSpawnRobotEvent, spawn_robot),
+        (ServerSpawnDoorEvent, spawn_door),
+        (ServerSpawnBulletEvent, spawn_bullet),
+    ]
+)
+
+
+class LevelEntryCodec(Codec[tuple[Vector[int], Block]]):
+    """Position and block, flattened as level updates contain many of them"""
+
+    def write(self, out: bytearray, value: tuple[Vector[int], Block]) -> None:
+        pos, block = value
+        var_int.write(out, pos.x)
+        var_int.write(out, pos.y)
+        var_uint.write(out, block_id(block))
+
+    def read(self, data: bytes, pos: int) -> tuple[tuple[Vector[int], Block], int]:
+        x, pos = var_int.read(data, pos)
+        y, pos = var_int.read(data, pos)
+        id, pos = var_uint.read(data, pos)
+        return (Vector(x, y), block_by_id(id)), pos
+
+
+level_update = ListOf(LevelEntryCodec())
+level_chunk = Record(ServerLevelChunkEvent, chunk=block_position, blocks=Compressed())
+
+server_game_event = Tagged[Any](
+    [
+        (ServerSpawnRobotEvent, spawn_robot),
+        (ServerSpawnDoorEvent, spawn_door),
+        (ServerSpawnBulletEvent, spawn_bullet),
+        (ServerDeleteEntityEvent, Record(ServerDeleteEntityEvent, id=var_uint)),
+        (ServerEntityEvent, EntityEventCodec(ServerEntityEvent, entity_payloads)),
+        (ServerLevelUpdateEvent, Record(ServerLevelUpdateEvent, update=level_update)),
+        (
+            ServerMarkerEvent,
+            Record(
+                ServerMarkerEvent,
+                markers=ListOf(Record(Marker, position=vector, color=marker_color)),
+            ),
+        ),
+        (
+            ServerMarkVectEvent,
+            Record(
+                ServerMarkVectEvent,
+                markers=ListOf(
+                    Record(MarkerVect, start=vector, end=vector, color=marker_color)
+                ),
+            ),
+        ),
+        (
+            ServerEntityDeltaEvent,
+            EntityEventCodec(ServerEntityDeltaEvent, entity_deltas),
+        ),
+        (ServerLevelChunkEvent, level_chunk),
+    ]
+)
+
+client_game_event = Tagged[Any](
+    [
+        (ClientInputEvent, Record(ClientInputEvent, input=player_input, dt=float64)),
+        (
+            ClientLevelRequestEvent,
+            Record(ClientLevelRequestEvent, chunks=ListOf(block_position)),
+        ),
+    ]
+)
+
+message = Tagged[EventType](
+    [
+        (
+            ServerConnectionConfirmEvent,
+            Record(ServerConnectionConfirmEvent, client_id=var_uint),
+        ),
+        (
+            ServerGameStartEvent,
+            Record(
+                ServerGameStartEvent,
+                client_entity=var_uint,
+                entities=ListOf(spawn_event),
+                chunk_size=var_uint,
+                chunks=ListOf(level_chunk),
+            ),
+        ),
+        (
+            ServerGameEvent,
+            Record(ServerGameEvent, last_ack=var_int, event=server_game_event),
+        ),
+        (ServerGameEndEvent, Const(ServerGameEndEvent())),
+        (
+            ClientConnectionRequestEvent,
+            Record(ClientConnectionRequestEvent, ip=var_uint),
+        ),
+        (ClientLobbyReadyEvent, Record(ClientLobbyReadyEvent, client_id=var_uint)),
+        (
+            ClientGameEvent,
+            Record(
+                ClientGameEvent,
+                client_id=var_uint,
+                ack=var_int,
+                event=client_game_event,
+                snapshot_ack=var_int,
+            ),
+        ),
+        (
+            ServerSnapshotEvent,
+            Record(
+                ServerSnapshotEvent,
+                last_ack=var_int,
+                id=var_uint,
+                baseline=var_int,
+                events=ListOf(server_game_event),
+            ),
+        ),
+    ]
+)
+"""Any message sent between server and clients.
+Append new variants only, as the index is used as tag."""
+
+
+def encode(msg: EventType) -> bytes:
+    return message.encode(msg)
+
+
+def decode(data: bytes) -> EventType:
+    return message.decode(data)
@@ -0,0 +1,136 @@
+import random
+from itertools import count
+from typing import Any
+
+import numpy as np
+from pygame import Color
+
+from roboarena.client.entity import ClientBullet
+from roboarena.server.bullets import BulletSystem, sweep_times
+from roboarena.server.entity import ServerDoorEntity, ServerPlayerRobot
+from roboarena.shared.block import block_id, floor, wall
+from roboarena.shared.chunk import Chunk, ChunkedLevel
+from roboarena.shared.constants import TextureSize
+from roboarena.shared.game import GameState
+from roboarena.shared.util import EventTarget
+from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.vector import Vector
+
+
+class Game(GameState):
+    """A level of floors with a wall at x = 10"""
+
+    def __init__(self) -> None:
+        self.env = "server"
+        self.entities = {}
+        self.events = EventTarget()
+        self.level = ChunkedLevel(5)
+        for x in range(-1, 4):
+            for y in range(-1, 2):
+                blocks = [wall if x * 5 + i % 5 == 10 else floor for i in range(25)]
+                self.level.stamp(Chunk(Vector(x, y), 5, bytes(map(block_id, blocks))))
+
+    def mark(self, markers: Any) -> None:
+        pass
+
+    def dispatch(self, *_: Any) -> None:
+        pass
+
+
+def game() -> Game:
+    return Game()
+
+
+def test_sweep_times():
+    random.seed(0)
+    for _ in range(200):
+        rect = Rect(
+            Vector(random.uniform(-2, 2), random.uniform(-2, 2)),
+            Vector(random.uniform(0, 1), random.uniform(0, 1)),
+        )
+        other = Rect(
+            Vector(random.uniform(-2, 2), random.uniform(-2, 2)),
+            Vector(random.uniform(0, 1), random.uniform(0, 1)),
+        )
+        motion = Vector(
+            random.choice([0, random.uniform(-3, 3)]), random.uniform(-3, 3)
+        )
+        expected = rect.sweep(motion, other)
+        (t,) = sweep_times(
+            np.array([[rect.left, rect.top]]),
+            np.array([[rect.right, rect.bottom]]),
+            np.array([[motion.x, motion.y]]),
+            np.array([[other.left, other.top]]),
+            np.array([[other.right, other.bottom]]),
+        )
+        if expected is None:
+            assert t == np.inf
+        else:
+            assert np.isclose(t, expected)
+
+
+def test_move_and_block():
+    bullets = BulletSystem(game(), count(7))  # type: ignore
+    bullets.create(True, Vector(2.5, 2.5), Vector(100.0, 0.0), 1)
+    bullets.create(True, Vector(2.5, 3.5), Vector(0.0, 1.0), 1)
+    assert bullets.tick(1.0) == [] and len(bullets) == 2
+    assert bullets.in_area(Rect(Vector(0.0, 0.0), Vector(5.0, 3.0))) == [7]
+    assert bullets.in_area(Rect(Vector(0.0, 0.0), Vector(5.0, 5.0)), False) == []
+
+    # through the wall within one step if it was not swept
+    assert bullets.tick(0.2) == [7]
+    assert bullets.position(8) == Vector(2.5, 3.7)
+    assert 7 not in bullets and 8 in bullets
+    event = bullets.to_event(8)
+    assert event.velocity == Vector(0.0, 1.0) and event.friendly
+
+
+def test_hit_once_per_contact():
+    bullets = BulletSystem(game(), count(1))  # type: ignore
+    player = ServerPlayerRobot(
+        bullets._game,  # type: ignore
+        10,
+        (Vector(5.0, 2.5), Vector(1.0, 0.0)),
+        Color(0, 0, 0),
+        lambda *_: None,
+    )
+    bullets._game.entities[0] = player
+    bullets._game.index_entities()
+    bullets.create(False, Vector(2.5, 2.5), Vector(1.0, 0.0), 3)
+    bullets.create(True, Vector(2.5, 2.6), Vector(1.0, 0.0), 3)
+    bullets.tick(0)
+    for _ in range(10):
+        bullets.tick(0.5)
+    # only the enemy bullet hits, once while passing through the player
+    assert player.health.get() == 7
+
+
+def test_blocked_by_door():
+    bullets = BulletSystem(game(), count(1))  # type: ignore
+    door = ServerDoorEntity(bullets._game, Vector(6.5, 2.5), True)  # type: ignore
+    bullets._game.entities[0] = door
+    bullets._game.index_entities()
+    bullets.create(True, Vector(2.5, 2.5), Vector(10.0, 0.0), 1)
+    bullets.create(True, Vector(2.5, 4.5), Vector(10.0, 0.0), 1)
+    bullets.tick(0)
+    assert bullets.tick(0.5) == [1]
+    assert bullets.position(2) == Vector(7.5, 4.5)
+
+
+def test_client_bullet_simulated_from_spawn():
+    bullet = ClientBullet(game(), True, Vector(5.0, 0.5), Vector(2.0, 0.0), 1.0)  # type: ignore
+    bullet.tick(0.5, 2.0)
+    assert bullet.position == Vector(7.0, 0.5)
+    bullet.tick(0.5, 3.0)
+    assert bullet.position == Vector(9.0, 0.5)
+    # stops at the wall at x = 10 and stays there
+    bullet.tick(0.5, 4.0)
+    assert bullet.position.x == 10 - TextureSize.BULLET_TEXTURE.x / 2
+    bullet.tick(0.5, 5.0)
+    assert bullet.position.x == 10 - TextureSize.BULLET_TEXTURE.x / 2
+
+
+def test_client_bullet_ignores_events():
+    bullet = ClientBullet(game(), True, Vector(5.0, 0.5), Vector(2.0, 0.0), 1.0)  # type: ignore
+    bullet.on_server("position", Vector(0.0, 0.0), 0, 1.5)
+    assert bullet.position == Vector(5.0, 0.5)
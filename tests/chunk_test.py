@@ -0,0 +1,162 @@
+import random
+from math import floor as floor_int
+
+import pytest
+
+from roboarena.shared.block import block_id, crate, floor, floor_door, wall
+from roboarena.shared.chunk import (
+    Chunk,
+    ChunkedLevel,
+    RoomLayout,
+    chunk_positions,
+    chunks_overlapping,
+    decode_chunk,
+    encode_chunk,
+)
+from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.vector import Vector
+
+
+def test_chunk_positions_row_major():
+    assert chunk_positions(Vector(-1, 2), 2) == [
+        Vector(-2, 4),
+        Vector(-1, 4),
+        Vector(-2, 5),
+        Vector(-1, 5),
+    ]
+
+
+def test_roundtrip():
+    chunk = Vector(1, -1)
+    blocks = [floor, wall, crate, floor, floor, wall, wall, crate, floor]
+    level = dict(zip(chunk_positions(chunk, 3), blocks))
+    level[Vector(0, 0)] = crate  # outside of the chunk
+    encoded = encode_chunk(level, chunk, 3)
+    assert len(encoded) == 9
+    assert list(decode_chunk(chunk, 3, encoded)) == list(
+        zip(chunk_positions(chunk, 3), blocks)
+    )
+
+
+def test_decode_wrong_size():
+    with pytest.raises(ValueError):
+        decode_chunk(Vector(0, 0), 3, bytes(8))
+
+
+def test_chunks_overlapping():
+    area = Rect(Vector(-1.0, 10.0), Vector(30.0, 5.0))
+    chunks = set(chunks_overlapping(area, 25))
+    assert chunks == {Vector(-1, 0), Vector(0, 0), Vector(1, 0)}
+
+
+def test_chunks_overlapping_single():
+    area = Rect(Vector(1.0, 1.0), Vector(2.0, 2.0))
+    assert list(chunks_overlapping(area, 25)) == [Vector(0, 0)]
+
+
+def test_chunk():
+    blocks = [floor, wall, crate, crate]
+    chunk = Chunk(Vector(-1, 1), 2, bytes(block_id(b) for b in blocks))
+    assert list(chunk) == list(zip(chunk_positions(Vector(-1, 1), 2), blocks))
+    level = ChunkedLevel(2)
+    level.stamp(chunk)
+    assert level == dict(chunk)
+    with pytest.raises(ValueError):
+        Chunk(Vector(0, 0), 2, bytes(3))
+
+
+def test_room_layout():
+    # a row of floors with a door at the right end, spawn at the left
+    floors = [Vector(x, 0) for x in range(4)]
+    room = RoomLayout.from_blocks(Vector(0, 0), floors, [Vector(4, 0)])
+    assert room.bounds == Rect(Vector(0.0, 0.0), Vector(5.0, 1.0))
+
+    moved = room.translate(Vector(10, -5))
+    assert moved.floors == {Vector(10 + x, -5) for x in range(4)}
+    assert moved.doors == {Vector(14, -5)}
+    assert moved.bounds == Rect(Vector(10.0, -5.0), Vector(5.0, 1.0))
+
+    # a crate cuts off the blocks behind it
+    blocked = room.translate(Vector(10, -5), {Vector(2, 0)})
+    assert blocked.floors == {Vector(10, -5), Vector(11, -5)}
+    assert blocked.doors == set()
+
+
+def test_chunked_level_freeze_and_restore():
+    level = ChunkedLevel(2)
+    first = dict(zip(chunk_positions(Vector(0, 0), 2), [floor, wall, crate, floor]))
+    level.update(first)
+    level.update(zip(chunk_positions(Vector(1, 0), 2), [wall] * 4))
+    level[Vector(0, 5)] = crate  # incomplete chunk
+    level.visit([Vector(0, 0), Vector(0, 2)], 1.0)
+    level.visit([Vector(1, 0)], 5.0)
+
+    assert level.freeze(2.0) == 1
+    assert len(level) == 5
+    assert level.chunk_blocks(Vector(0, 0)) == encode_chunk(first, Vector(0, 0), 2)
+    assert Vector(0, 5) in level
+
+    # reading restores the frozen chunk transparently
+    assert level[Vector(1, 0)] is wall
+    assert len(level) == 9
+    assert level.freeze(5.0) == 0
+    assert level.freeze(6.0) == 2
+    assert level.get(Vector(0, 1)) is crate
+    assert Vector(3, 1) in level
+    assert level.get(Vector(9, 9)) is None
+    with pytest.raises(KeyError):
+        level[Vector(9, 9)]
+
+
+def test_chunked_level_blocked():
+    random.seed(0)
+    level = ChunkedLevel(3)
+    for x in range(-2, 2):
+        for y in range(-2, 2):
+            blocks = random.choices([floor, floor_door, crate], k=9)
+            level.stamp(Chunk(Vector(x, y), 3, bytes(block_id(b) for b in blocks)))
+    level[Vector(0, 0)] = wall
+    level.visit([Vector(-1, -1)], 0.0)
+    level.freeze(1.0)
+    for _ in range(200):
+        top_left = Vector(random.uniform(-6, 4), random.uniform(-6, 4))
+        area = Rect(top_left, Vector(random.uniform(0, 2), random.uniform(0, 2)))
+        blocks = [
+            level[Vector(x, y)]
+            for x in range(floor_int(area.left), floor_int(area.right) + 1)
+            for y in range(floor_int(area.top), floor_int(area.bottom) + 1)
+        ]
+        for mode in ("robot", "bullet"):
+            assert level.blocked(area, mode) == any(b.blocks_robot for b in blocks)
+    with pytest.raises(KeyError):
+        level.blocked(Rect(Vector(7.5, 0.0), Vector(1.0, 1.0)), "robot")
+
+
+def test_chunked_level_sweep():
+    random.seed(1)
+    level = ChunkedLevel(4)
+    for x in range(-3, 3):
+        for y in range(-3, 3):
+            blocks = random.choices([floor] * 6 + [wall], k=16)
+            level.stamp(Chunk(Vector(x, y), 4, bytes(block_id(b) for b in blocks)))
+    steps = 500
+    for _ in range(200):
+        size = random.choice([0.3, 0.9, 1.7])
+        top_left = Vector(random.uniform(-8, 6), random.uniform(-8, 6))
+        area = Rect(top_left, Vector(size, size))
+        motion = Vector(
+            random.uniform(-3, 3), random.choice([0, random.uniform(-3, 3)])
+        )
+        first = next(
+            (
+                i / steps
+                for i in range(steps + 1)
+                if level.blocked(area.tramslate(motion * (i / steps)), "bullet")
+            ),
+            None,
+        )
+        t = level.sweep(area, motion, "bullet")
+        if first is None:
+            assert t is None
+        else:
+            assert t is not None and first - 1 / steps <= t <= first
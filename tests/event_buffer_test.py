@@ -0,0 +1,17 @@
+from roboarena.server.events import EventBuffer
+
+
+def test_collect_keeps_last_per_name():
+    buffer = EventBuffer[int]()
+    buffer.dispatch("a", 1)
+    buffer.dispatch("b", 2)
+    buffer.dispatch("a", 3)
+    assert list(buffer.collect()) == [3, 2]
+    assert list(buffer.collect()) == []
+
+
+def test_buffers_independent():
+    a, b = EventBuffer[int](), EventBuffer[int]()
+    a.dispatch("x", 1)
+    assert list(b.collect()) == []
+    assert list(a.collect()) == [1]
@@ -0,0 +1,10 @@
+from roboarena.shared.constants import GraphicConstants, NetworkConstants
+from roboarena.shared.interest import interest_area
+from roboarena.shared.utils.vector import Vector
+
+
+def test_interest_area_covers_view_and_margin():
+    area = interest_area(Vector(100.0, -50.0))
+    reach = GraphicConstants.GU_PER_SCREEN / 2 + NetworkConstants.INTEREST_MARGIN
+    assert area.contains(Vector(100.0 + reach, -50.0 - reach))
+    assert not area.contains(Vector(100.0 + reach + 0.1, -50.0))
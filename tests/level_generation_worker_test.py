@@ -0,0 +1,27 @@
+from threading import Thread
+
+from roboarena.server.level_generation.level_generator import LevelGenerator
+from roboarena.server.level_generation.tileset import tileset
+from roboarena.server.level_generation.worker import LevelGenerationWorker
+from roboarena.shared.util import flatten
+from roboarena.shared.utils.vector import Vector
+
+
+def test_generates_requested_in_background():
+    worker = LevelGenerationWorker(LevelGenerator(tileset))
+    thread = Thread(target=worker.loop)
+    thread.start()
+    try:
+        assert worker.poll() == []
+        worker.request([Vector(12.5, 12.5)])
+        updates = worker.poll(timeout=10.0)
+        assert len(updates) == 1
+        assert Vector(12, 12) in dict(flatten(updates[0]))
+
+        # generated windows are not generated again
+        worker.request([Vector(12.5, 12.5)])
+        assert worker.poll(timeout=0.1) == []
+    finally:
+        worker.stop()
+        thread.join(timeout=10.0)
+    assert not thread.is_alive()
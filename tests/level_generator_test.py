@@ -0,0 +1,76 @@
+from roboarena.server.level_generation.level_generator import LevelGenerator
+from roboarena.server.level_generation.tileset import tileset
+from roboarena.server.level_generation.wfc_numpy import NumpyWFC
+from roboarena.shared.block import crate, floor_door, floor_room, room_blocks
+from roboarena.shared.chunk import chunk_positions
+from roboarena.shared.util import (
+    flatten,
+    neighbours_4,
+    search_connected,
+    square_space_around,
+)
+from roboarena.shared.utils.vector import Vector
+
+
+def test_generate_around_covers_window():
+    level_gen = LevelGenerator(tileset)
+    update = dict(flatten(level_gen.generate_around([Vector(24.5, 3.0)], 10)))
+    assert all(pos in update for pos in square_space_around(Vector(24.5, 3.0), 10))
+    assert {Vector(0, -1), Vector(1, -1), Vector(0, 0), Vector(1, 0)} <= set(
+        level_gen.tiles
+    )
+
+
+def test_generate_around_generated_once():
+    level_gen = LevelGenerator(tileset)
+    assert len(list(level_gen.generate_around([Vector(12.5, 12.5)], 10))) > 0
+    assert list(level_gen.generate_around([Vector(12.0, 13.0)], 10)) == []
+    assert list(level_gen.generate_around([Vector(12.5, 12.5)] * 3, 10)) == []
+
+    tiles = set(level_gen.tiles)
+    update = dict(flatten(level_gen.generate_around([Vector(40.0, 12.5)], 10)))
+    assert Vector(50, 12) in update
+    assert not any(pos // tileset.blocks_per_tile in tiles for pos in update)
+
+
+def test_numpy_engine():
+    level_gen = LevelGenerator(tileset, NumpyWFC.from_map)
+    update = dict(flatten(level_gen.generate_around([Vector(12.5, 12.5)], 10)))
+    assert all(pos in update for pos in square_space_around(Vector(12.5, 12.5), 10))
+
+
+def test_seed_reproducible():
+    def generate(seed: int):
+        level_gen = LevelGenerator(tileset, seed=seed)
+        update = list(level_gen.generate_around([Vector(12.5, 12.5)], 10))
+        return update + list(level_gen.generate_around([Vector(40.0, 12.5)], 10))
+
+    assert generate(3) == generate(3)
+    assert generate(3) != generate(4)
+
+
+def test_chunks():
+    level_gen = LevelGenerator(tileset, seed=3)
+    chunks = level_gen.generate_around([Vector(12.5, 12.5)], 10)
+    assert {chunk.position for chunk in chunks} == level_gen.tiles
+    chunk = next(c for c in chunks if c.position == Vector(0, 0))
+    # the init tile, crates are only placed on room floors
+    assert len(chunk) == 25 * 25
+    for (pos, block), offset in zip(chunk, chunk_positions(Vector(0, 0), 25)):
+        assert pos == offset
+        expected = tileset.init.blocks[pos.y][pos.x]
+        assert block is expected or (block is crate and expected is floor_room)
+
+
+def test_rooms_connected_to_spawn():
+    level_gen = LevelGenerator(tileset, seed=0)
+    chunks = level_gen.generate_around([Vector(0.0, 0.0)], 80)
+    level = dict(flatten(chunks))
+    rooms = list(flatten(chunk.rooms for chunk in chunks))
+    assert len(rooms) > 0
+    for room in rooms:
+        connected = search_connected(
+            room.spawn, level, lambda b: b if b in room_blocks else None, neighbours_4
+        )
+        assert room.floors == {p for p, b in connected.items() if b is not floor_door}
+        assert room.doors == {p for p, b in connected.items() if b is floor_door}
@@ -0,0 +1,102 @@
+from threading import Timer
+
+from roboarena.shared.network import DeliveryQueue, Network
+from roboarena.shared.time import get_time
+
+
+def test_queue_pops_oldest_first():
+    queue = DeliveryQueue[str]()
+    queue.put(3.0, "c")
+    queue.put(1.0, "a")
+    queue.put(2.0, "b")
+    assert queue.pop_until(10.0) == [(1.0, "a"), (2.0, "b"), (3.0, "c")]
+    assert queue.pop_until(10.0) == []
+
+
+def test_queue_keeps_not_arrived():
+    queue = DeliveryQueue[str]()
+    queue.put(1.0, "a")
+    queue.put(5.0, "b")
+    queue.put(2.0, "c")
+    assert queue.pop_until(2.0) == [(1.0, "a"), (2.0, "c")]
+    assert queue.pop_until(4.0) == []
+    assert queue.pop_until(5.0) == [(5.0, "b")]
+
+
+def test_queue_same_time_fifo():
+    queue = DeliveryQueue[int]()
+    for i in range(100):
+        queue.put(1.0, i)
+    assert [msg for _, msg in queue.pop_until(1.0)] == list(range(100))
+
+
+def test_queue_pop_one():
+    queue = DeliveryQueue[str]()
+    assert queue.pop_one(10.0) is None
+    queue.put(2.0, "b")
+    queue.put(1.0, "a")
+    assert queue.pop_one(0.5) is None
+    assert queue.pop_one(10.0) == (1.0, "a")
+    assert queue.pop_one(10.0) == (2.0, "b")
+    assert queue.pop_one(10.0) is None
+
+
+def test_network_delay():
+    network = Network[str](1000)
+    network.send(0x01000001, "delayed")
+    assert network.receive(0x01000001) == []
+    assert network.receive_one(0x01000001) is None
+    arrived = network.receive(0x01000001, until=get_time() + 2000)
+    assert [msg for _, msg in arrived] == ["delayed"]
+
+
+def test_network_no_delay():
+    network = Network[str](0)
+    network.send(0x01000002, "a")
+    network.send(0x01000002, "b")
+    assert network.receive_one(0x01000002)[1] == "a"  # type: ignore
+    assert [msg for _, msg in network.receive(0x01000002)] == ["b"]
+
+
+def test_queue_wait_timeout():
+    queue = DeliveryQueue[str]()
+    t_start = get_time()
+    assert not queue.wait(0.05)
+    assert get_time() - t_start >= 0.05
+
+
+def test_queue_wait_for_delayed():
+    queue = DeliveryQueue[str]()
+    queue.put(get_time() + 0.05, "a")
+    assert queue.wait(5.0)
+    assert [msg for _, msg in queue.pop_until(get_time())] == ["a"]
+
+
+def test_queue_wait_woken_by_put():
+    queue = DeliveryQueue[str]()
+    Timer(0.05, lambda: queue.put(get_time(), "a")).start()
+    t_start = get_time()
+    assert queue.wait(5.0)
+    assert get_time() - t_start < 5.0
+
+
+def test_queue_wait_interrupt():
+    queue = DeliveryQueue[str]()
+    Timer(0.05, queue.interrupt).start()
+    t_start = get_time()
+    assert not queue.wait(5.0)
+    assert get_time() - t_start < 5.0
+
+
+def test_queue_interrupt_before_wait():
+    queue = DeliveryQueue[str]()
+    queue.interrupt()
+    assert not queue.wait()
+    assert not queue.wait(0.01)
+
+
+def test_network_receive_blocking():
+    network = Network[str](0.05)
+    network.send(0x01000003, "a")
+    arrived = network.receive_blocking(0x01000003, timeout=5.0)
+    assert [msg for _, msg in arrived] == ["a"]
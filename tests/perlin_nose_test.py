@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from roboarena.shared.utils.perlin_nose import perlin_noise_spot, perlin_noise_tiles
+from roboarena.shared.utils.vector import Vector
+
+
+@pytest.mark.parametrize("seed", [0, 2**64 - 1, -3])
+def test_perlin_noise_tiles(seed: int):
+    top_lefts = [Vector(500_000, 500_075), Vector(-30, 12)]
+    noise = perlin_noise_tiles(top_lefts, 5, 4, 3, seed)
+    assert noise.shape == (2, 5, 5)
+    expected = [
+        [
+            [perlin_noise_spot(tl + Vector(x, y), 4, 3, seed) for x in range(5)]
+            for y in range(5)
+        ]
+        for tl in top_lefts
+    ]
+    assert np.array_equal(noise, np.array(expected))
+    assert perlin_noise_tiles([], 5, 4, 3, seed).shape == (0, 5, 5)
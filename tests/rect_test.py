@@ -0,0 +1,18 @@
+from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.vector import Vector
+
+
+def test_sweep():
+    rect = Rect(Vector(0.0, 0.0), Vector(1.0, 1.0))
+    wall = Rect(Vector(3.0, -5.0), Vector(0.5, 10.0))
+    assert rect.sweep(Vector(4.0, 0.0), wall) == 0.5
+    assert rect.sweep(Vector(1.0, 0.0), wall) is None
+    # through the wall within one motion
+    assert rect.sweep(Vector(20.0, 1.0), wall) == 0.1
+    assert rect.sweep(Vector(-4.0, 0.0), wall) is None
+    assert rect.sweep(Vector(0.0, 4.0), wall) is None
+    assert rect.sweep(Vector(0.0, 0.0), rect) == 0.0
+    # diagonally past the corner
+    corner = Rect(Vector(2.0, 2.0), Vector(1.0, 1.0))
+    assert rect.sweep(Vector(4.0, 1.0), corner) is None
+    assert rect.sweep(Vector(2.0, 2.0), corner) == 0.5
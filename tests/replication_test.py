@@ -0,0 +1,106 @@
+from typing import Any
+
+from roboarena.client.replication import Replication as ClientReplication
+from roboarena.server.replication import Replication as ServerReplication
+from roboarena.shared.constants import NetworkConstants
+from roboarena.shared.types import (
+    ServerDeleteEntityEvent,
+    ServerEntityDeltaEvent,
+    ServerEntityEvent,
+    ServerSnapshotEvent,
+)
+from roboarena.shared.utils.vector import Vector
+
+OWN = 0
+ENEMY = 1
+ROBOT = 2
+
+
+def enemy_motion(x: float) -> ServerEntityEvent:
+    return ServerEntityEvent(ENEMY, "motion", (Vector(x, 1.0), Vector(0.0, 0.0)))
+
+
+def motion(x: float) -> ServerEntityEvent:
+    return ServerEntityEvent(ROBOT, "motion", (Vector(x, 0.0), Vector(1.0, 0.0)))
+
+
+def send(
+    server: ServerReplication, client: ClientReplication, events: list[Any]
+) -> tuple[ServerSnapshotEvent | None, list[Any]]:
+    snapshot = server.snapshot(0, events)
+    if snapshot is None:
+        return None, []
+    return snapshot, list(client.resolve(snapshot))
+
+
+def test_full_until_acknowledged():
+    server, client = ServerReplication(OWN), ClientReplication()
+    snapshot, resolved = send(server, client, [enemy_motion(1.0)])
+    assert snapshot is not None and snapshot.events == [enemy_motion(1.0)]
+    snapshot, resolved = send(server, client, [enemy_motion(2.0)])
+    assert snapshot is not None and snapshot.events == [enemy_motion(2.0)]
+    assert resolved == [enemy_motion(2.0)]
+
+
+def test_delta_to_acknowledged():
+    server, client = ServerReplication(OWN), ClientReplication()
+    send(server, client, [enemy_motion(1.0), motion(5.0)])
+    server.on_ack(client.last_snapshot)
+    snapshot, resolved = send(server, client, [enemy_motion(1.5), motion(5.25)])
+    assert snapshot is not None
+    assert all(isinstance(e, ServerEntityDeltaEvent) for e in snapshot.events)
+    assert resolved == [enemy_motion(1.5), motion(5.25)]
+
+    # the baseline stays the acknowledged snapshot until the next ack
+    snapshot, resolved = send(server, client, [enemy_motion(2.0)])
+    assert snapshot is not None
+    assert snapshot.events == [ServerEntityDeltaEvent(ENEMY, "motion", (1024, 0, 0, 0))]
+    assert resolved == [enemy_motion(2.0)]
+
+
+def test_omit_unchanged():
+    server, client = ServerReplication(OWN), ClientReplication()
+    send(server, client, [enemy_motion(1.0)])
+    server.on_ack(client.last_snapshot)
+    snapshot, _ = send(server, client, [enemy_motion(1.0)])
+    assert snapshot is None
+
+    # changed and back, the client has the changed value until acknowledged
+    send(server, client, [enemy_motion(2.0)])
+    snapshot, resolved = send(server, client, [enemy_motion(1.0)])
+    assert resolved == [enemy_motion(1.0)]
+
+
+def test_own_entity_always_sent():
+    server, client = ServerReplication(OWN), ClientReplication()
+    own = ServerEntityEvent(OWN, "motion", (Vector(1.0, 1.0), Vector(0.0, 0.0)))
+    send(server, client, [own])
+    server.on_ack(client.last_snapshot)
+    snapshot, resolved = send(server, client, [own])
+    assert snapshot is not None and resolved == [own]
+
+
+def test_full_when_lagging():
+    server, client = ServerReplication(OWN), ClientReplication()
+    send(server, client, [enemy_motion(1.0)])
+    server.on_ack(client.last_snapshot)
+    for i in range(NetworkConstants.MAX_UNACKNOLEDGED_SNAPSHOTS + 1):
+        snapshot, resolved = send(server, client, [enemy_motion(2.0 + i)])
+        assert resolved == [enemy_motion(2.0 + i)]
+    assert snapshot is not None and snapshot.events == [enemy_motion(2.0 + i)]
+
+
+def test_delete_forgets_entity():
+    server, client = ServerReplication(OWN), ClientReplication()
+    send(server, client, [enemy_motion(1.0)])
+    server.on_ack(client.last_snapshot)
+    send(server, client, [ServerDeleteEntityEvent(ENEMY)])
+    server.on_ack(client.last_snapshot)
+    snapshot, _ = send(server, client, [enemy_motion(3.0)])
+    assert snapshot is not None and snapshot.events == [enemy_motion(3.0)]
+
+
+def test_quantized():
+    server, client = ServerReplication(OWN), ClientReplication()
+    _, resolved = send(server, client, [enemy_motion(1.0001)])
+    assert resolved == [enemy_motion(1.0)]
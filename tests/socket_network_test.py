@@ -0,0 +1,77 @@
+import pickle
+from collections.abc import Iterator
+
+import pytest
+
+from roboarena.shared.socket_network import SocketNetwork
+
+SERVER_IP = 0x00000000
+CLIENT_A_IP = 0x00000001
+CLIENT_B_IP = 0x00000002
+
+type Nets = tuple[SocketNetwork[str], SocketNetwork[str], SocketNetwork[str]]
+
+
+@pytest.fixture
+def networks() -> Iterator[Nets]:
+    server = SocketNetwork[str](SERVER_IP, pickle.dumps, pickle.loads)
+    address = server.listen(("127.0.0.1", 0))
+    client_a = SocketNetwork[str](CLIENT_A_IP, pickle.dumps, pickle.loads)
+    client_b = SocketNetwork[str](CLIENT_B_IP, pickle.dumps, pickle.loads)
+    assert client_a.connect(address) == SERVER_IP
+    assert client_b.connect(address) == SERVER_IP
+    yield server, client_a, client_b
+    for network in (client_a, client_b, server):
+        network.close()
+
+
+def receive_all(network: SocketNetwork[str], ip: int, n: int) -> list[str]:
+    received = list[str]()
+    while len(received) < n:
+        arrived = network.receive_blocking(ip, timeout=5.0)
+        assert len(arrived) > 0, f"timeout, received only {received}"
+        received += [msg for _, msg in arrived]
+    return received
+
+
+def test_client_to_server(networks: Nets):
+    server, client_a, client_b = networks
+    client_a.send(SERVER_IP, "a1")
+    client_a.send(SERVER_IP, "a2")
+    client_b.send(SERVER_IP, "b1")
+    received = receive_all(server, SERVER_IP, 3)
+    assert sorted(received) == ["a1", "a2", "b1"]
+    assert received.index("a1") < received.index("a2")
+
+
+def test_server_to_clients(networks: Nets):
+    server, client_a, client_b = networks
+    # wait until the server knows both clients
+    client_a.send(SERVER_IP, "hello")
+    client_b.send(SERVER_IP, "hello")
+    receive_all(server, SERVER_IP, 2)
+
+    for i in range(100):
+        server.send(CLIENT_A_IP, f"a{i}")
+    server.send(CLIENT_B_IP, "b")
+    assert receive_all(client_a, CLIENT_A_IP, 100) == [f"a{i}" for i in range(100)]
+    assert receive_all(client_b, CLIENT_B_IP, 1) == ["b"]
+
+
+def test_send_to_own_ip(networks: Nets):
+    server, _, _ = networks
+    server.send(SERVER_IP, "self")
+    assert receive_all(server, SERVER_IP, 1) == ["self"]
+
+
+def test_send_to_unknown_ip(networks: Nets):
+    _, client_a, _ = networks
+    client_a.send(0x12345678, "lost")
+    assert client_a.receive(CLIENT_A_IP) == []
+
+
+def test_large_message(networks: Nets):
+    server, client_a, _ = networks
+    msg = "x" * 1_000_000
+    client_a.send(SERVER_IP, msg)
+    assert receive_all(server, SERVER_IP, 1) == [msg]
@@ -0,0 +1,41 @@
+from roboarena.shared.utils.rect import Rect
+from roboarena.shared.utils.spatial_grid import SpatialGrid
+from roboarena.shared.utils.vector import Vector
+
+
+def rect(x: float, y: float, size: float = 0.5) -> Rect:
+    return Rect(Vector(x, y), Vector(size, size))
+
+
+def test_query_nearby_cells():
+    grid = SpatialGrid[str]()
+    grid.update("a", rect(0.2, 0.2))
+    grid.update("b", rect(0.8, 0.8))  # across four cells
+    grid.update("c", rect(10.2, -5.2))
+    assert set(grid.query(rect(0.1, 0.1, 0.1))) == {"a", "b"}
+    assert set(grid.query(rect(1.5, 1.5, 0.1))) == {"b"}
+    assert set(grid.query(rect(-1.0, -1.0, 1.5))) == {"a", "b"}
+    assert set(grid.query(rect(10.0, -5.0, 0.1))) == {"c"}
+    assert list(grid.query(rect(5.0, 5.0))) == []
+    assert len(grid) == 3 and "c" in grid
+
+
+def test_move_and_remove():
+    grid = SpatialGrid[str]()
+    grid.update("a", rect(0.2, 0.2))
+    grid.update("a", rect(3.2, 0.2))
+    assert list(grid.query(rect(0.2, 0.2))) == []
+    assert list(grid.query(rect(3.2, 0.2))) == ["a"]
+    grid.remove("a")
+    grid.remove("a")
+    assert list(grid.query(rect(3.2, 0.2))) == []
+    assert len(grid) == 0 and grid._cells == {}
+
+
+def test_cell_size():
+    grid = SpatialGrid[str](4.0)
+    grid.update("a", rect(1.0, 1.0))
+    assert list(grid.query(rect(3.5, 3.5))) == ["a"]
+    assert list(grid.query(rect(4.5, 3.5))) == []
+    assert list(grid.query_cells((0, 0, 0, 0))) == ["a"]
+    assert list(grid.query_cells((1, 0, 3, 3))) == []
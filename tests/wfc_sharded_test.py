@@ -0,0 +1,55 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from roboarena.server.level_generation.wfc import Tileset
+from roboarena.server.level_generation.wfc_sharded import ShardedWFC
+from roboarena.shared.utils.vector import Vector
+
+FAR = 50
+COLORS = frozenset((a, b) for a in range(1, 5) for b in range(1, 5) if a != b)
+ts = Tileset(5, COLORS, COLORS)
+"""Neighbours differ, the grid is always 4-colorable"""
+
+
+def window(center: Vector[int]) -> list[Vector[int]]:
+    return [center + Vector(x, y) for x in range(-2, 3) for y in range(-1, 2)]
+
+
+def test_groups():
+    positions = {Vector(0, 0), Vector(5, 0), Vector(19, 3), Vector(60, 0)}
+    groups = ShardedWFC._groups(positions, 10)
+    assert groups == [{Vector(0, 0), Vector(5, 0), Vector(19, 3)}, {Vector(60, 0)}]
+
+
+def test_sharded_collapse():
+    centers = [Vector(0, 0), Vector(FAR, 0), Vector(0, FAR), Vector(FAR, 3)]
+    requested = [pos for center in centers for pos in window(center)]
+    updates = list[dict[Vector[int], int]]()
+    for workers in [1, 3]:
+        with ThreadPoolExecutor(workers) as executor:
+            wfc = ShardedWFC.factory(executor)(ts, {Vector(0, 0): 1}, 5)
+            updates.append(dict(wfc.collapse(requested)))
+            # the stats of the shards are merged
+            assert wfc.stats.collapses == len(updates[-1])
+            # the shards border on each other, positions between are allocated
+            updates[-1] |= dict(wfc.collapse(window(Vector(FAR // 2, 0))))
+    assert updates[0] == updates[1]
+
+    update = updates[0]
+    assert all(pos in update for pos in requested)
+    assert update[Vector(0, 0)] == 1
+    for pos, tile in update.items():
+        right, below = update.get(pos + Vector(1, 0)), update.get(pos + Vector(0, 1))
+        if tile != 0 and right:
+            assert (tile, right) in ts.rules_horiz
+        if tile != 0 and below:
+            assert (tile, below) in ts.rules_vert
+    assert list(wfc.collapse(requested)) == []
+
+
+def test_process_pool():
+    with ProcessPoolExecutor(2, multiprocessing.get_context("spawn")) as executor:
+        wfc = ShardedWFC.factory(executor)(ts, {}, 0)
+        update = dict(wfc.collapse(window(Vector(0, 0)) + window(Vector(FAR, 0))))
+    assert Vector(0, 0) in update and Vector(FAR, 0) in update
+    assert wfc.stats.collapses == len(update)
@@ -0,0 +1,233 @@
+import random
+
+import pytest
+
+from roboarena.server.level_generation.tileset import tileset
+from roboarena.server.level_generation.wfc import (
+    WFC,
+    Direction,
+    REGION_SIZE,
+    MinEntropyStore,
+    Tileset,
+    WFCFactory,
+)
+from roboarena.server.level_generation.wfc_numpy import NumpyWFC
+from roboarena.shared.utils.vector import Vector
+
+
+def test_pop_min():
+    store = MinEntropyStore()
+    store.add(Vector(0, 0), 5)
+    store.add(Vector(1, 0), 3)
+    store.add(Vector(2, 0), 5)
+    store.update(Vector(2, 0), 5, 1)
+    assert Vector(2, 0) in store
+    assert store.pop_min() == Vector(2, 0)
+    assert Vector(2, 0) not in store
+    assert store.pop_min() == Vector(1, 0)
+    store.add(Vector(3, 0), 0)
+    assert store.pop_min() == Vector(3, 0)
+    assert store.pop_min() == Vector(0, 0)
+    with pytest.raises(Exception, match="Empty store"):
+        store.pop_min()
+
+
+def test_pop_min_ties_by_position():
+    lowest = [Vector(i, 0) for i in range(10)]
+    orders = list[list[Vector[int]]]()
+    for positions in [lowest, lowest[::-1]]:
+        store = MinEntropyStore(seed=3)
+        for pos in positions:
+            store.add(pos, 2)
+        store.add(Vector(0, 1), 3)
+        orders.append([store.pop_min() for _ in range(10)])
+    assert set(orders[0]) == set(lowest)
+    assert orders[0] == orders[1]
+
+
+def test_compiled_tileset():
+    ts = Tileset(
+        20,
+        frozenset({(1, 2), (2, 9), (9, 17), (17, 1)}),
+        frozenset({(2, 1), (10, 19)}),
+    )
+    compiled = ts.compile()
+    assert compiled.possible(0, Direction.RIGHT) == 0
+    assert compiled.possible(1 << 1, Direction.RIGHT) == 1 << 2 | 1
+    assert compiled.possible(1 << 9 | 1 << 17, Direction.RIGHT) == 1 << 17 | 1 << 1 | 1
+    assert compiled.possible(1 << 9 | 1 << 17, Direction.LEFT) == 1 << 2 | 1 << 9 | 1
+    assert compiled.possible(1 << 19 | 1 << 3, Direction.UP) == 1 << 10 | 1
+    assert compiled.possible(1 << 10, Direction.DOWN) == 1 << 19 | 1
+    assert compiled.entries() == 4 * 3 * 256
+
+    game = tileset.to_wfc()
+    compiled = game.compile()
+    for _ in range(100):
+        mask = random.getrandbits(game.tiles)
+        for dir in Direction:
+            single = (compiled.possible(1 << t, dir) for t in range(game.tiles))
+            expected = 0
+            for tile, possible in enumerate(single):
+                expected |= possible if mask >> tile & 1 else 0
+            assert compiled.possible(mask, dir) == expected
+
+
+def test_compiled_once():
+    ts = Tileset(3, frozenset([(1, 2)]), frozenset([(2, 1)]))
+    same = Tileset(3, frozenset([(1, 2)]), frozenset([(2, 1)]))
+    other = Tileset(3, frozenset([(1, 2)]), frozenset([(1, 2)]))
+    assert ts.compile() is same.compile()
+    assert ts.compile() is not other.compile()
+
+
+@pytest.mark.parametrize("engine", [WFC.from_map, NumpyWFC.from_map])
+def test_collapse_consistent(engine: WFCFactory):
+    ts = tileset.to_wfc()
+    wfc = engine(ts, {Vector(0, 0): 1})
+    requested = [Vector(x, y) for x in range(-3, 4) for y in range(-2, 3)]
+    update = dict(wfc.collapse(requested))
+    assert all(pos in update for pos in requested)
+    assert update[Vector(0, 0)] == 1
+    for pos, tile in update.items():
+        right, below = update.get(pos + Vector(1, 0)), update.get(pos + Vector(0, 1))
+        if tile != 0 and right:
+            assert (tile, right) in ts.rules_horiz
+        if tile != 0 and below:
+            assert (tile, below) in ts.rules_vert
+
+    assert list(wfc.collapse(requested)) == []
+    far = dict(wfc.collapse([Vector(-100, 50)]))
+    assert Vector(-100, 50) in far and not far.keys() & update.keys()
+
+
+@pytest.mark.parametrize("engine", [WFC.from_map, NumpyWFC.from_map])
+def test_collapse_reproducible(engine: WFCFactory):
+    ts = tileset.to_wfc()
+    requests = [[Vector(x, 0) for x in range(5)], [Vector(3, 4), Vector(-2, 2)]]
+    updates = list[list[tuple[Vector[int], int]]]()
+    for seed in [7, 7, 8]:
+        wfc = engine(ts, {Vector(0, 0): 1}, seed)
+        updates.append([u for r in requests for u in wfc.collapse(r)])
+    assert updates[0] == updates[1]
+    assert updates[0] != updates[2]
+
+
+@pytest.mark.parametrize("engine", [WFC.from_map, NumpyWFC.from_map])
+def test_collapse_independent_of_request_order(engine: WFCFactory):
+    pairs = frozenset((a, b) for a in range(1, 5) for b in range(1, 5) if a != b)
+    ts = Tileset(5, pairs, pairs)
+    requests = [
+        [Vector(x, y) for x in range(3) for y in range(3)],
+        [Vector(100 + x, y) for x in range(3) for y in range(3)],
+    ]
+    levels = list[dict[Vector[int], int]]()
+    for order in [requests, requests[::-1]]:
+        wfc = engine(ts, {}, 7)
+        levels.append({p: t for r in order for p, t in wfc.collapse(r)})
+    # a call may collapse more positions than requested, those the same too
+    common = levels[0].keys() & levels[1].keys()
+    assert all(pos in common for request in requests for pos in request)
+    assert all(levels[0][pos] == levels[1][pos] for pos in common)
+
+
+def test_settle():
+    pairs = frozenset((a, b) for a in range(1, 3) for b in range(1, 3))
+    wfc = WFC.from_map(Tileset(3, pairs, pairs), {Vector(0, 0): 1})
+    size = 3 * REGION_SIZE
+    requested = [Vector(x, y) for x in range(size) for y in range(size)]
+    update = dict(wfc.collapse(requested))
+    map_size = len(wfc.map)
+
+    # the center region is surrounded by complete regions
+    wfc.settle([Vector(100, 100)])
+    center = Vector(REGION_SIZE + 1, REGION_SIZE + 2)
+    assert center not in wfc.map
+    settled = map_size - len(wfc.map)
+    assert settled > 0 and settled % REGION_SIZE**2 == 0
+    assert all(wfc.tile(pos) == tile for pos, tile in update.items())
+    assert list(wfc.collapse([center, Vector(0, 0)])) == []
+
+    wfc.settle([Vector(0, 0)])
+    assert len(wfc.map) == map_size - settled
+
+
+def test_backtracking():
+    # restrictive rules, which contradict without backtracking
+    ts = Tileset(
+        5,
+        frozenset([(1, 1), (2, 1), (2, 2), (2, 3), (2, 4), (3, 2), (3, 4), (4, 1)]),
+        frozenset([(1, 1), (1, 2), (1, 3), (3, 3)]),
+    )
+    requested = [Vector(x, y) for x in range(8) for y in range(8)]
+    fallbacks = list[int]()
+    for budget in [0, 32]:
+        wfc = WFC.from_map(ts, {}, 3, budget, apothem=3)
+        update = dict(wfc.collapse(requested))
+        assert all(pos in update for pos in requested)
+        fallbacks.append(sum(update[pos] == 0 for pos in requested))
+        assert wfc.stats.contradictions > 0
+        assert wfc.stats.collapses == len(update) + wfc.stats.backtracks
+        for pos, tile in update.items():
+            right = update.get(pos + Vector(1, 0))
+            below = update.get(pos + Vector(0, 1))
+            if tile != 0 and right:
+                assert (tile, right) in ts.rules_horiz
+            if tile != 0 and below:
+                assert (tile, below) in ts.rules_vert
+    assert wfc.stats.backtracks > 0 and wfc.stats.max_depth > 0
+    assert fallbacks[0] > 0 and fallbacks[1] == 0
+
+
+def test_backtracking_deep():
+    # contradictions only resolved by undoing several selections
+    ts = Tileset(
+        8,
+        frozenset(
+            [(1, 2), (1, 3), (1, 5), (1, 6), (2, 1), (2, 3), (2, 5), (3, 4), (3, 7)]
+            + [(4, 1), (5, 3), (5, 5), (6, 2), (6, 5), (6, 6), (7, 1), (7, 5)]
+        ),
+        frozenset(
+            [(1, 1), (1, 2), (1, 4), (1, 7), (2, 3), (2, 5), (2, 6), (2, 7), (3, 4)]
+            + [(3, 5), (3, 7), (4, 2), (4, 3), (4, 4), (4, 5), (4, 6), (5, 3)]
+            + [(5, 5), (5, 6), (6, 2), (6, 4), (7, 2), (7, 5)]
+        ),
+    )
+    requested = [Vector(x, y) for x in range(8) for y in range(8)]
+    wfc = WFC.from_map(ts, {}, 22, 1000, apothem=2)
+    update = dict(wfc.collapse(requested))
+    assert wfc.stats.max_depth > 1
+    assert wfc.stats.fallbacks == 0
+    assert all(update[pos] != 0 for pos in requested)
+
+
+def test_fallbacks_counted():
+    # tile 0 placed by the map is no fallback
+    ts = Tileset(2, frozenset([(1, 1)]), frozenset([(1, 1)]))
+    wfc = WFC.from_map(ts, {Vector(0, 0): 0}, apothem=0)
+    assert dict(wfc.collapse([Vector(0, 0)])) == {Vector(0, 0): 0}
+    assert wfc.stats.fallbacks == 0
+
+
+def test_numpy_wfc_max_tiles():
+    with pytest.raises(ValueError):
+        NumpyWFC(Tileset(65, frozenset(), frozenset()))
+
+
+def test_numpy_wfc_parameters():
+    ts = Tileset(3, frozenset([(1, 2), (2, 1)]), frozenset([(1, 2), (2, 1)]))
+    with pytest.raises(ValueError, match="backtrack"):
+        NumpyWFC(ts, backtrack_budget=8)
+    wfc = NumpyWFC.from_map(ts, {}, 0, 0, apothem=1)
+    assert len(wfc.collapse([Vector(0, 0)])) >= 1
+    assert wfc._allocated.sum() == 9
+
+
+def test_numpy_wfc_keeps_collapsed():
+    ts = Tileset(3, frozenset([(1, 2), (2, 1)]), frozenset([(1, 2), (2, 1)]))
+    wfc = NumpyWFC.from_map(ts, {Vector(0, 0): 1}, apothem=1)
+    assert dict(wfc.collapse([Vector(0, 0)])) == {Vector(0, 0): 1}
+    # a neighbour contradicting the collapsed tile does not narrow it
+    y, x = wfc._index(Vector(1, 0))
+    wfc._masks[y, x] = 1 << 1
+    wfc._propagate(y, x)
+    assert wfc._masks[wfc._index(Vector(0, 0))] == 1 << 1
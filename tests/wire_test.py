@@ -0,0 +1,156 @@
+import pytest
+from pygame import Color
+
+from roboarena.shared.block import crate, floor
+from roboarena.shared.types import (
+    ClientConnectionRequestEvent,
+    ClientGameEvent,
+    ClientInputEvent,
+    ClientLevelRequestEvent,
+    ClientLobbyReadyEvent,
+    EventType,
+    Input,
+    Marker,
+    MarkerVect,
+    PygameColor,
+    ServerConnectionConfirmEvent,
+    ServerDeleteEntityEvent,
+    ServerEntityDeltaEvent,
+    ServerEntityEvent,
+    ServerGameEndEvent,
+    ServerGameEvent,
+    ServerGameStartEvent,
+    ServerLevelChunkEvent,
+    ServerLevelUpdateEvent,
+    ServerMarkerEvent,
+    ServerMarkVectEvent,
+    ServerSnapshotEvent,
+    ServerSpawnBulletEvent,
+    ServerSpawnDoorEvent,
+    ServerSpawnRobotEvent,
+    ShotEvent,
+    basic_weapon,
+)
+from roboarena.shared.utils.codec import CodecError, var_int, var_uint
+from roboarena.shared.utils.vector import Vector
+from roboarena.shared.wire import decode, encode
+
+robot = ServerSpawnRobotEvent(
+    3,
+    100,
+    (Vector(12.5, -12.5), Vector(1.0, 0.0)),
+    Color(0, 255, 0),
+    basic_weapon,
+)
+
+messages: list[EventType] = [
+    ServerConnectionConfirmEvent(0xFFFFFFFF),
+    ServerGameStartEvent(
+        3,
+        [robot, ServerSpawnDoorEvent(4, Vector(2.5, 3.5), True)],
+        25,
+        [ServerLevelChunkEvent(Vector(0, -1), bytes(625))],
+    ),
+    ServerGameEvent(-1, robot),
+    ServerGameEvent(
+        7, ServerSpawnBulletEvent(5, False, Vector(1.0, 2.0), Vector(0.5, 0.25))
+    ),
+    ServerGameEvent(7, ServerDeleteEntityEvent(5)),
+    ServerGameEvent(7, ServerEntityEvent(5, "position", Vector(1.5, 2.5))),
+    ServerGameEvent(7, ServerEntityEvent(3, "motion", robot.motion)),
+    ServerGameEvent(7, ServerEntityEvent(3, "color", Color(1, 2, 3, 4))),
+    ServerGameEvent(7, ServerEntityEvent(3, "health", -10)),
+    ServerGameEvent(7, ServerEntityEvent(3, "weapon", basic_weapon)),
+    ServerGameEvent(7, ServerEntityEvent(3, "weapon_shot", ShotEvent())),
+    ServerGameEvent(7, ServerEntityEvent(4, "open", False)),
+    ServerGameEvent(7, ServerLevelUpdateEvent([(Vector(-5, 7), crate)])),
+    ServerGameEvent(7, ServerLevelChunkEvent(Vector(-1, 2), bytes(range(9)))),
+    ServerGameEvent(
+        7, ServerMarkerEvent([Marker(Vector(1.0, 1.0), PygameColor.red())])
+    ),
+    ServerGameEvent(
+        7,
+        ServerMarkVectEvent(
+            [MarkerVect(Vector(0.0, 0.0), Vector(1.0, 1.0), PygameColor.blue())]
+        ),
+    ),
+    ServerSnapshotEvent(
+        7,
+        12,
+        -1,
+        [
+            ServerEntityEvent(5, "position", Vector(1.5, 2.5)),
+            ServerEntityDeltaEvent(5, "position", (-3, 1000)),
+            ServerEntityDeltaEvent(3, "motion", (0, 0, 1, -1)),
+            ServerDeleteEntityEvent(5),
+            ServerLevelUpdateEvent([]),
+        ],
+    ),
+    ServerGameEndEvent(),
+    ClientConnectionRequestEvent(0x00000001),
+    ClientLobbyReadyEvent(42),
+    ClientGameEvent(
+        42,
+        1000,
+        ClientInputEvent(
+            Input(0.016, True, False, True, False, True, False, Vector(3.0, 4.5)),
+            0.016,
+        ),
+        11,
+    ),
+    ClientGameEvent(42, 1001, ClientLevelRequestEvent([Vector(0, -1)]), 11),
+]
+
+
+@pytest.mark.parametrize("msg", messages, ids=lambda m: type(m).__name__)
+def test_roundtrip(msg: EventType):
+    assert decode(encode(msg)) == msg
+
+
+def test_level_update_from_generator():
+    update = ((Vector(x, 0), floor) for x in range(3))
+    decoded = decode(encode(ServerGameEvent(0, ServerLevelUpdateEvent(update))))
+    assert decoded == ServerGameEvent(
+        0, ServerLevelUpdateEvent([(Vector(x, 0), floor) for x in range(3)])
+    )
+
+
+def test_level_chunk_compressed():
+    msg = ServerGameEvent(0, ServerLevelChunkEvent(Vector(0, 0), bytes(625)))
+    assert len(encode(msg)) < 625 // 10
+
+
+def test_entity_event_compact():
+    # tag, last_ack, tag, entity id, name, payload
+    msg = ServerGameEvent(7, ServerEntityEvent(5, "position", Vector(1.5, 2.5)))
+    assert len(encode(msg)) == 1 + 1 + 1 + 1 + 1 + 8
+
+
+@pytest.mark.parametrize("n", [0, 1, 127, 128, 300, 2**32, 2**70])
+def test_var_uint(n: int):
+    assert var_uint.decode(var_uint.encode(n)) == n
+
+
+@pytest.mark.parametrize("n", [0, 1, -1, 63, -64, 64, -65, 2**40, -(2**40)])
+def test_var_int(n: int):
+    assert var_int.decode(var_int.encode(n)) == n
+
+
+def test_var_int_small_magnitudes_single_byte():
+    assert all(len(var_int.encode(n)) == 1 for n in range(-64, 64))
+    assert len(var_int.encode(64)) == len(var_int.encode(-65)) == 2
+
+
+def test_unknown_entity_event():
+    with pytest.raises(CodecError):
+        encode(ServerGameEvent(0, ServerEntityEvent(0, "unknown", None)))
+
+
+def test_malformed():
+    data = encode(ServerGameEvent(7, ServerDeleteEntityEvent(5)))
+    with pytest.raises(CodecError):
+        decode(data[:-1])
+    with pytest.raises(CodecError):
+        decode(data + b"\x00")
+    with pytest.raises(CodecError):
+        decode(b"\xff")